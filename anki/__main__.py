@@ -0,0 +1,7 @@
+"""Entry point for `python -m anki`."""
+
+import sys
+
+from anki.cli import main
+
+sys.exit(main())
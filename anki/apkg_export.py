@@ -0,0 +1,287 @@
+"""Module for incremental export of Anki decks to Anki package (.apkg) files.
+
+`genanki.Package.write_to_file` rebuilds the whole collection database on every
+export. `write_incremental_package` instead keeps the collection database from
+the previous export as a build cache, indexed by note GUID and content hash,
+and applies only the inserted, updated and deleted notes before repackaging.
+The index lives in a sidecar database, so the packaged collection contains
+only the tables Anki expects.
+
+The notes of the deck are read once per export: their content hashes, their
+models for the deck fingerprint and the changed notes themselves all come from
+that single pass, as `GermanDeck` builds a new `genanki.Note` on every access.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import genanki
+
+BUILD_INDEX_SQL = """
+CREATE TABLE IF NOT EXISTS build.build_index (
+    guid TEXT PRIMARY KEY,
+    note_id INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+)
+"""
+BUILD_META_SQL = (
+    "CREATE TABLE IF NOT EXISTS build.build_meta (key TEXT PRIMARY KEY, value TEXT)"
+)
+
+# Changed notes kept from the scan of the deck to be written without reading the
+# deck again; past this many they are read again, to bound the memory used
+MAX_KEPT_NOTES = 10_000
+
+# GUID -> (note id, content hash) of the notes in the build cache
+CacheIndex = Dict[str, Tuple[int, str]]
+
+
+class _IdGenerator:
+    """Id generator compatible with genanki that exposes the next id it will return."""
+
+    def __init__(self, start: int) -> None:
+        self.next_id = start
+
+    def __iter__(self) -> Iterator[int]:
+        return self
+
+    def __next__(self) -> int:
+        value = self.next_id
+        self.next_id += 1
+        return value
+
+
+def note_content_hash(note: genanki.Note) -> str:
+    """Return a SHA-1 hash over everything an exported note row depends on."""
+    payload = "\x1f".join(field or "" for field in note.fields)
+    payload += "\x1e" + " ".join(note.tags) + "\x1e" + str(note.model.model_id)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def deck_fingerprint(
+    deck: genanki.Deck, note_models: Optional[Iterable[genanki.Model]] = None
+) -> str:
+    """Return a hash of the deck and model definitions stored in the collection.
+
+    A build cache is only valid for the deck and models it was built with, so a
+    change of name, templates or fields forces a full rebuild.
+
+    Args:
+        deck (genanki.Deck): The deck to export.
+        note_models (Optional[Iterable[genanki.Model]]): The models of the notes,
+            if already collected; by default they are read from `deck.notes`.
+    """
+    if note_models is None:
+        note_models = (note.model for note in deck.notes)
+    models = {model.model_id: model for model in note_models}
+    models.update(deck.models)
+    definition = {
+        "deck": deck.to_json(),
+        "models": [
+            models[model_id].to_json(0, deck.deck_id) for model_id in sorted(models)
+        ],
+    }
+    return hashlib.sha1(
+        json.dumps(definition, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _connect(cache_path: Path, index_path: Path) -> sqlite3.Connection:
+    """Open the cached collection with its build index attached as `build`."""
+    connection = sqlite3.connect(cache_path)
+    connection.execute("ATTACH DATABASE ? AS build", (str(index_path),))
+    connection.execute(BUILD_INDEX_SQL)
+    connection.execute(BUILD_META_SQL)
+    return connection
+
+
+def _read_cache(cache_path: Path, index_path: Path) -> Tuple[Optional[str], CacheIndex]:
+    """Return the fingerprint the build cache was made for and its note index."""
+    if not (cache_path.exists() and index_path.exists()):
+        return None, {}
+    connection = _connect(cache_path, index_path)
+    try:
+        row = connection.execute(
+            "SELECT value FROM build.build_meta WHERE key = 'fingerprint'"
+        ).fetchone()
+        cached = {
+            guid: (note_id, content_hash)
+            for guid, note_id, content_hash in connection.execute(
+                "SELECT guid, note_id, content_hash FROM build.build_index"
+            )
+        }
+    finally:
+        connection.close()
+    return (row[0] if row else None), cached
+
+
+def _scan_notes(
+    deck: genanki.Deck, cached: CacheIndex
+) -> Tuple[Dict[str, str], Dict[int, genanki.Model], Optional[List[genanki.Note]]]:
+    """Read the notes of the deck once.
+
+    Returns:
+        Tuple: The content hash of every note by GUID, in deck order, the models
+            of the notes by ID, and the notes whose hash differs from the cached
+            one, or None if there are more than `MAX_KEPT_NOTES` of them.
+    """
+    hashes: Dict[str, str] = {}
+    models: Dict[int, genanki.Model] = {}
+    changed: Optional[List[genanki.Note]] = []
+    for note in deck.notes:
+        guid = note.guid
+        content_hash = note_content_hash(note)
+        hashes[guid] = content_hash
+        models.setdefault(note.model.model_id, note.model)
+        if changed is not None and cached.get(guid, (0, None))[1] != content_hash:
+            changed.append(note)
+            if len(changed) > MAX_KEPT_NOTES:
+                changed = None
+    return hashes, models, changed
+
+
+def _build_full(
+    cursor: sqlite3.Cursor,
+    deck: genanki.Deck,
+    timestamp: float,
+    hashes: Dict[str, str],
+) -> None:
+    """Write the whole deck into an empty collection and index its notes."""
+    id_gen = _IdGenerator(int(timestamp * 1000))
+    genanki.Package(deck).write_to_db(cursor, timestamp, id_gen)
+    note_ids = dict(cursor.execute("SELECT guid, id FROM notes").fetchall())
+    cursor.executemany(
+        "INSERT OR REPLACE INTO build.build_index VALUES (?, ?, ?)",
+        ((guid, note_ids[guid], content_hash) for guid, content_hash in hashes.items()),
+    )
+
+
+def _apply_changes(
+    cursor: sqlite3.Cursor,
+    deck: genanki.Deck,
+    timestamp: float,
+    cached: CacheIndex,
+    current: Dict[str, str],
+    changed_notes: Optional[List[genanki.Note]],
+) -> Tuple[int, int, int]:
+    """Bring a cached collection in line with the deck.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the cached collection.
+        deck (genanki.Deck): The deck to export.
+        timestamp (float): The modification time of written notes.
+        cached (CacheIndex): The notes of the cached collection.
+        current (Dict[str, str]): The content hash of every note of the deck.
+        changed_notes (Optional[List[genanki.Note]]): The inserted and updated
+            notes, or None to read them from the deck again.
+
+    Returns:
+        Tuple[int, int, int]: The number of inserted, updated and deleted notes.
+    """
+    stale_ids = [(cached[guid][0],) for guid in cached.keys() - current.keys()]
+    changed = {}
+    inserted = updated = 0
+    for guid, content_hash in current.items():
+        if guid not in cached:
+            inserted += 1
+        elif cached[guid][1] != content_hash:
+            stale_ids.append((cached[guid][0],))
+            updated += 1
+        else:
+            continue
+        changed[guid] = content_hash
+
+    # Updated notes are rewritten as new rows; Anki matches notes by GUID on import
+    cursor.executemany("DELETE FROM cards WHERE nid = ?", stale_ids)
+    cursor.executemany("DELETE FROM notes WHERE id = ?", stale_ids)
+    cursor.executemany("DELETE FROM build.build_index WHERE note_id = ?", stale_ids)
+
+    (max_id,) = cursor.execute(
+        "SELECT MAX(id) FROM (SELECT MAX(id) AS id FROM notes "
+        "UNION ALL SELECT MAX(id) FROM cards)"
+    ).fetchone()
+    id_gen = _IdGenerator(max(int(timestamp * 1000), (max_id or 0) + 1))
+    if changed_notes is None:
+        changed_notes = [note for note in deck.notes if note.guid in changed]
+    for note in changed_notes:
+        content_hash = changed[note.guid]
+        note_id = id_gen.next_id
+        note.write_to_db(cursor, timestamp, deck.deck_id, id_gen)
+        cursor.execute(
+            "INSERT OR REPLACE INTO build.build_index VALUES (?, ?, ?)",
+            (note.guid, note_id, content_hash),
+        )
+    return inserted, updated, len(stale_ids) - updated
+
+
+def write_incremental_package(
+    deck: genanki.Deck,
+    apkg_path: Path,
+    cache_path: Path,
+    media_files: Sequence[Path] = (),
+) -> Tuple[int, int, int]:
+    """Export a deck to an .apkg file, reusing the collection from the last export.
+
+    The collection database is kept at `cache_path` between exports. If it is
+    missing or was built for a different deck or model definition, it is rebuilt
+    from scratch; otherwise only changed notes are written to it. The package is
+    written to a temporary file and moved into place, so a failed export never
+    leaves a truncated .apkg behind.
+
+    Args:
+        deck (genanki.Deck): The deck to export.
+        apkg_path (Path): The .apkg file to write.
+        cache_path (Path): The collection database kept between exports.
+        media_files (Sequence[Path]): Media files referenced by the notes, which
+            are copied into the package from disk one at a time.
+
+    Returns:
+        Tuple[int, int, int]: The number of inserted, updated and deleted notes.
+    """
+    apkg_path, cache_path = Path(apkg_path), Path(cache_path)
+    index_path = cache_path.with_suffix(".index")
+    timestamp = time.time()
+    cached_fingerprint, cached = _read_cache(cache_path, index_path)
+    hashes, models, changed_notes = _scan_notes(deck, cached)
+    fingerprint = deck_fingerprint(deck, models.values())
+
+    if cached_fingerprint != fingerprint:
+        cache_path.unlink(missing_ok=True)
+        index_path.unlink(missing_ok=True)
+
+    connection = _connect(cache_path, index_path)
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT value FROM build.build_meta WHERE key = 'fingerprint'")
+        if cursor.fetchone():
+            counts = _apply_changes(
+                cursor, deck, timestamp, cached, hashes, changed_notes
+            )
+        else:
+            _build_full(cursor, deck, timestamp, hashes)
+            counts = (len(hashes), 0, 0)
+        cursor.execute(
+            "INSERT OR REPLACE INTO build.build_meta VALUES ('fingerprint', ?)",
+            (fingerprint,),
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+    tmp_path = apkg_path.with_name(apkg_path.name + ".tmp")
+    with zipfile.ZipFile(tmp_path, "w") as outzip:
+        outzip.write(cache_path, "collection.anki2")
+        outzip.writestr(
+            "media",
+            json.dumps({str(i): Path(path).name for i, path in enumerate(media_files)}),
+        )
+        for i, path in enumerate(media_files):
+            outzip.write(path, str(i))
+    os.replace(tmp_path, apkg_path)
+    return counts
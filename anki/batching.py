@@ -0,0 +1,263 @@
+"""Module for processing large inputs through the pipeline in parallel chunks.
+
+Sending a whole input file as one prompt hits the model's context limit, gets
+one long serial answer, and loses everything when that single call fails.
+`BatchRunner` instead packs the input lines into chunks that fit a token
+budget, runs each chunk through the `Pipeline` with a bounded number of chunks
+in flight, and retries a failed chunk with exponential backoff (single
+malformed rows are already retried by the pipeline itself). Results come
+back in input order, so `merge_into_deck` adds notes deterministically no
+matter in which order the chunks finished. Chunks are packed as the input
+is read and only a few are started ahead of the oldest unfinished one, so an
+input streamed from `anki.ingest` is processed in constant memory.
+"""
+
+import asyncio
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+from anki import instrumentation
+from anki.german_deck import GermanDeck
+from anki.normalize import normalize_word
+from anki.pipeline import Pipeline, extracted_words, outputs_to_notes
+from anki.prompts import approximate_tokens
+
+# Chunks started per worker ahead of the oldest unfinished one, so workers
+# stay busy while a slow chunk holds back the results after it
+PREFETCH_FACTOR = 2
+
+
+def iter_chunks(
+    lines: Iterable[str],
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = approximate_tokens,
+) -> Iterator[List[str]]:
+    """Pack lines greedily into chunks of at most `max_tokens` tokens, lazily.
+
+    Blank lines are dropped. A line longer than the budget on its own becomes
+    a chunk by itself rather than being split mid-line.
+
+    Args:
+        lines (Iterable[str]): The input lines, e.g. one German word per line.
+        max_tokens (int): Token budget for the input part of one prompt.
+        count_tokens (Callable[[str], int]): Function counting tokens in a text.
+
+    Yields:
+        List[str]: The next chunk, in input order.
+    """
+    current: List[str] = []
+    current_tokens = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        tokens = count_tokens(line) + 1  # separator
+        if current and current_tokens + tokens > max_tokens:
+            yield current
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        yield current
+
+
+def chunk_lines(
+    lines: Iterable[str],
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = approximate_tokens,
+) -> List[List[str]]:
+    """Pack lines into chunks of at most `max_tokens` tokens, see `iter_chunks`.
+
+    Returns:
+        List[List[str]]: The chunks, in input order.
+    """
+    return list(iter_chunks(lines, max_tokens, count_tokens))
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one chunk: the notes it produced or the error it failed with."""
+
+    index: int
+    lines: List[str]
+    notes: List[Dict[str, str]] = field(default_factory=list)
+    # Extracted words left without a complete note
+    missing: List[str] = field(default_factory=list)
+    error: Optional[BaseException] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        """Whether the chunk eventually succeeded."""
+        return self.error is None
+
+
+class BatchRunner:
+    """Runs chunks of input through a pipeline with a bounded worker pool."""
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        max_workers: int = 4,
+        max_tokens: int = 1000,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        input_key: str = "input_text",
+        count_tokens: Callable[[str], int] = approximate_tokens,
+    ) -> None:
+        """
+        Initialize the batch runner.
+
+        Args:
+            pipeline (Pipeline): The pipeline every chunk is run through.
+            max_workers (int): Maximum number of chunks processed at once.
+            max_tokens (int): Token budget for the input of one chunk.
+            max_retries (int): Retries of a failed chunk before it is given up.
+            backoff_base (float): Delay in seconds before the first retry; it
+                doubles with each further retry and is jittered by up to 10%.
+            input_key (str): The pipeline input the chunk is passed as. With
+                `"german_words"` the chunk is joined the way the extraction
+                template returns words, so extraction is skipped.
+            count_tokens (Callable[[str], int]): Function counting tokens in a text.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.pipeline = pipeline
+        self.max_workers = max_workers
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.input_key = input_key
+        self.count_tokens = count_tokens
+
+    def _chunk_input(self, lines: List[str]) -> Dict[str, str]:
+        separator = " ; " if self.input_key == "german_words" else "\n"
+        return {self.input_key: separator.join(lines)}
+
+    async def _run_chunk(
+        self, index: int, lines: List[str], workers: asyncio.Semaphore
+    ) -> BatchResult:
+        result = BatchResult(index, lines)
+        async with workers:
+            with instrumentation.span("batch.chunk", lines=len(lines)) as span:
+                while True:
+                    result.attempts += 1
+                    try:
+                        outputs = await self.pipeline.arun(self._chunk_input(lines))
+                        result.notes = outputs_to_notes(outputs)
+                        noted = {note["german_word"] for note in result.notes}
+                        result.missing = [
+                            word
+                            for word in extracted_words(outputs)
+                            if word not in noted
+                        ]
+                        result.error = None
+                        break
+                    except Exception as error:
+                        result.error = error
+                        if result.attempts > self.max_retries:
+                            break
+                    delay = self.backoff_base * 2 ** (result.attempts - 1)
+                    await asyncio.sleep(delay * random.uniform(1.0, 1.1))
+                span.update(
+                    records=len(result.notes),
+                    missing=len(result.missing),
+                    retries=result.attempts - 1,
+                    failed=int(not result.ok),
+                )
+        return result
+
+    async def astream(self, lines: Iterable[str]) -> AsyncIterator[BatchResult]:
+        """Process the input lines chunk by chunk, yielding results as they finish.
+
+        Results are yielded in input order: a chunk finishing early is held back
+        until all chunks before it are done. A chunk that still fails after
+        `max_retries` retries does not stop the other chunks; its error is
+        recorded in its `BatchResult` instead.
+
+        The lines are read as chunks are started, and at most
+        `PREFETCH_FACTOR * max_workers` chunks are started ahead of the oldest
+        unfinished one, so a lazy input is never read into memory as a whole.
+
+        Args:
+            lines (Iterable[str]): The input lines, e.g. a generator.
+
+        Yields:
+            BatchResult: The result of the next chunk, in input order.
+        """
+        chunks = enumerate(iter_chunks(lines, self.max_tokens, self.count_tokens))
+        workers = asyncio.Semaphore(self.max_workers)
+        tasks: Deque[asyncio.Future] = deque()
+
+        def start_next() -> bool:
+            for index, chunk in chunks:
+                tasks.append(
+                    asyncio.ensure_future(self._run_chunk(index, chunk, workers))
+                )
+                return True
+            return False
+
+        try:
+            while len(tasks) < PREFETCH_FACTOR * self.max_workers and start_next():
+                pass
+            while tasks:
+                result = await tasks.popleft()
+                start_next()
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def arun(self, lines: Iterable[str]) -> List[BatchResult]:
+        """Process the input lines and return all results, see `astream`.
+
+        Args:
+            lines (Iterable[str]): The input lines.
+
+        Returns:
+            List[BatchResult]: One result per chunk, in input order.
+        """
+        return [result async for result in self.astream(lines)]
+
+    def run(self, lines: Iterable[str]) -> List[BatchResult]:
+        """Synchronous wrapper around `arun` for scripts and notebooks."""
+        return asyncio.run(self.arun(lines))
+
+
+def merge_into_deck(results: Iterable[BatchResult], deck: GermanDeck) -> int:
+    """Add the notes of successful chunks to the deck in chunk order.
+
+    A word produced by several chunks is added once, from the first chunk
+    producing it. Words are compared by `anki.normalize.normalize_word`, the
+    identity of a note in the deck and the database, so "der See" and "die
+    See" stay two notes.
+
+    Args:
+        results (Iterable[BatchResult]): The results of `BatchRunner.run`.
+        deck (GermanDeck): The deck to add the notes to.
+
+    Returns:
+        int: The number of notes added.
+    """
+    seen = set()
+    added = 0
+    for result in sorted(results, key=lambda result: result.index):
+        for note in result.notes:
+            key = normalize_word(note["german_word"])
+            if key in seen:
+                continue
+            seen.add(key)
+            deck.add_note(**note)
+            added += 1
+    return added
@@ -0,0 +1,355 @@
+"""Module for bulk import and export of the `notes` table as JSONL, CSV or Parquet.
+
+Moving vocabulary between databases, or into analytics tools, through
+`add_note` one row at a time or `load_notes` as one list is slow and holds
+the whole table in memory. Here notes stream through in fixed-size batches
+instead:
+
+- `export_notes` reads the table with `GermanDeckDatabase.iter_notes` and
+  writes each batch of note fields to the file, which is moved into place
+  once complete;
+- `import_notes` reads the file batch by batch, checks every row with
+  `validate_note` and upserts the valid ones with `GermanDeckDatabase.add_notes`
+  in one transaction, updating the search index once per batch rather than
+  once per row.
+
+Files hold the note fields only (see `anki.storage.NOTE_FIELDS`); the keys
+and hashes are derived again on import, so files edited by hand or produced by
+other tools import like exported ones. Extra columns are ignored. Parquet
+needs the optional `pyarrow` package.
+"""
+
+import csv
+import json
+import os
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    cast,
+)
+
+from anki import instrumentation
+from anki.german_deck_db import GermanDeckDatabase
+from anki.storage import (
+    NOTE_FIELDS,
+    OPTIONAL_FIELDS,
+    NoteRecord,
+    NoteRow,
+    chunked,
+)
+
+# File formats by file suffix
+FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+
+# Rows read, validated and written at a time
+BATCH_SIZE = 10_000
+
+# Invalid rows described in `ImportStats.errors`; the others are only counted
+MAX_REPORTED_ERRORS = 20
+
+# A decoded row and its position, or the error that kept it from being decoded
+Row = Tuple[int, Any]
+
+
+def note_format(path: str, format: Optional[str] = None) -> str:
+    """Return the format of a notes file, given or guessed from its suffix.
+
+    Raises:
+        ValueError: If the format is unknown, or missing for stdin or stdout.
+    """
+    format = format or FORMATS.get(Path(path).suffix.lower())
+    if format is None or format not in FORMATS.values():
+        raise ValueError(
+            f"Unknown format of {path!r}, expected one of "
+            f"{sorted(set(FORMATS.values()))} or a file ending in {sorted(FORMATS)}"
+        )
+    if path == "-" and format == "parquet":
+        raise ValueError("Parquet files cannot be read from stdin or written to stdout")
+    return format
+
+
+def _pyarrow():
+    """Import pyarrow and its Parquet module."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Install pyarrow to read and write Parquet files") from None
+    return pyarrow, pyarrow.parquet
+
+
+def validate_note(value: Any) -> NoteRow:
+    """Check a decoded row against the `notes` table and return its note fields.
+
+    Fields that are NOT NULL in the table must be non-empty strings; optional
+    ones may also be null or empty, which is stored as NULL.
+
+    Raises:
+        ValueError: If the row is not a mapping or a field has no valid value.
+    """
+    if not isinstance(value, dict):
+        raise ValueError(f"expected an object, got {type(value).__name__}")
+    row: NoteRow = {}
+    for name in NOTE_FIELDS:
+        field_value = value.get(name)
+        if name in OPTIONAL_FIELDS and (field_value is None or field_value == ""):
+            row[name] = None
+        elif isinstance(field_value, str) and field_value.strip():
+            row[name] = field_value
+        else:
+            raise ValueError(f"field {name!r} must be a non-empty string")
+    return row
+
+
+def _check_columns(columns: Sequence[str], path: str) -> None:
+    """Raise a ValueError if a file lacks a column of a NOT NULL note field."""
+    missing = [
+        name
+        for name in NOTE_FIELDS
+        if name not in columns and name not in OPTIONAL_FIELDS
+    ]
+    if missing:
+        raise ValueError(f"{path} has no column {', '.join(map(repr, missing))}")
+
+
+@contextmanager
+def _open_text(path: str, mode: str) -> Iterator[TextIO]:
+    """Open a text file, or stdin or stdout for "-".
+
+    Files are read as "utf-8-sig", so a byte order mark, as written by Excel
+    in front of CSV files, does not end up in the first column name.
+    """
+    if path == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+        return
+    encoding = "utf-8-sig" if mode == "r" else "utf-8"
+    with open(path, mode, encoding=encoding, newline="") as file:
+        yield cast(TextIO, file)
+
+
+def _read_jsonl(path: str, batch_size: int) -> Iterator[Row]:
+    """Yield the objects of a JSON Lines file, by line number."""
+    with _open_text(path, "r") as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as error:
+                yield number, ValueError(f"invalid JSON: {error.msg}")
+
+
+def _read_csv(path: str, batch_size: int) -> Iterator[Row]:
+    """Yield the rows of a CSV file with a header, by line number."""
+    with _open_text(path, "r") as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        _check_columns(header, path)
+        for values in reader:
+            if not values:
+                continue
+            if len(values) != len(header):
+                yield reader.line_num, ValueError(
+                    f"expected {len(header)} columns, got {len(values)}"
+                )
+            else:
+                yield reader.line_num, dict(zip(header, values))
+
+
+def _read_parquet(path: str, batch_size: int) -> Iterator[Row]:
+    """Yield the rows of a Parquet file, by row number, reading one batch at a time."""
+    _, parquet = _pyarrow()
+    file = parquet.ParquetFile(path)
+    names = file.schema_arrow.names
+    _check_columns(names, path)
+    columns = [name for name in NOTE_FIELDS if name in names]
+    number = 0
+    for batch in file.iter_batches(batch_size, columns=columns):
+        data = batch.to_pydict()
+        for values in zip(*(data[name] for name in columns)):
+            number += 1
+            yield number, dict(zip(columns, values))
+
+
+READERS = {"jsonl": _read_jsonl, "csv": _read_csv, "parquet": _read_parquet}
+
+
+@dataclass
+class ImportStats:
+    """Row counts of an `import_notes` run."""
+
+    rows: int = 0
+    invalid: int = 0
+    # Notes inserted or updated; unchanged notes are not written
+    stored: int = 0
+    # "path:position: reason" of the first `MAX_REPORTED_ERRORS` invalid rows
+    errors: List[str] = field(default_factory=list)
+
+
+def read_notes(
+    path: str,
+    format: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    skip_invalid: bool = False,
+    stats: Optional[ImportStats] = None,
+) -> Iterator[NoteRow]:
+    """Stream the valid note rows of a JSONL, CSV or Parquet file.
+
+    Args:
+        path (str): The file; "-" reads JSONL or CSV from stdin.
+        format (Optional[str]): "jsonl", "csv" or "parquet"; by default
+            guessed from the file suffix.
+        batch_size (int): Number of Parquet rows decoded at a time.
+        skip_invalid (bool): Count and skip invalid rows instead of raising.
+        stats (Optional[ImportStats]): Counters updated as rows are read.
+
+    Yields:
+        NoteRow: The note fields of the next valid row, see `validate_note`.
+
+    Raises:
+        ValueError: If the file lacks a column, or a row is invalid and
+            `skip_invalid` is not set. The message holds the line number of
+            JSONL and CSV rows, and the row number of Parquet rows.
+    """
+    reader = READERS[note_format(path, format)]
+    stats = stats if stats is not None else ImportStats()
+    for position, value in reader(path, batch_size):
+        stats.rows += 1
+        try:
+            if isinstance(value, ValueError):
+                raise value
+            yield validate_note(value)
+        except ValueError as error:
+            message = f"{path}:{position}: {error}"
+            if not skip_invalid:
+                raise ValueError(message) from None
+            stats.invalid += 1
+            if len(stats.errors) < MAX_REPORTED_ERRORS:
+                stats.errors.append(message)
+
+
+def import_notes(
+    db: GermanDeckDatabase,
+    path: str,
+    format: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    skip_invalid: bool = False,
+) -> ImportStats:
+    """Upsert the notes of a JSONL, CSV or Parquet file into the database.
+
+    All notes are stored in one transaction, so an invalid row or any other
+    error stores none of them, unless invalid rows are skipped.
+
+    Args:
+        db (GermanDeckDatabase): The database the notes are written to.
+        path (str): The file, see `read_notes`.
+        format (Optional[str]): The file format, see `read_notes`.
+        batch_size (int): Number of rows decoded and upserted at a time.
+        skip_invalid (bool): Count and skip invalid rows instead of raising.
+
+    Returns:
+        ImportStats: The number of rows read, invalid and stored.
+    """
+    stats = ImportStats()
+    with instrumentation.span("bulk.import") as span:
+        notes = read_notes(path, format, batch_size, skip_invalid, stats)
+        stats.stored = db.add_notes(notes, chunk_size=batch_size, bulk=True)
+        span.update(records=stats.rows, invalid=stats.invalid)
+    return stats
+
+
+def _write_jsonl(file: TextIO, batches: Iterable[List[NoteRecord]]) -> None:
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    for batch in batches:
+        file.writelines([encode(dict(zip(NOTE_FIELDS, note))) + "\n" for note in batch])
+
+
+def _write_csv(file: TextIO, batches: Iterable[List[NoteRecord]]) -> None:
+    writer = csv.writer(file)
+    writer.writerow(NOTE_FIELDS)
+    for batch in batches:
+        writer.writerows(batch)
+
+
+def _write_parquet(path: str, batches: Iterable[List[NoteRecord]]) -> None:
+    """Write one row group per batch, with a string column per note field."""
+    pyarrow, parquet = _pyarrow()
+    schema = pyarrow.schema(
+        [
+            pyarrow.field(name, pyarrow.string(), nullable=name in OPTIONAL_FIELDS)
+            for name in NOTE_FIELDS
+        ]
+    )
+    with parquet.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            columns = [
+                pyarrow.array(values, pyarrow.string()) for values in zip(*batch)
+            ]
+            writer.write_batch(pyarrow.record_batch(columns, schema=schema))
+
+
+TEXT_WRITERS = {"jsonl": _write_jsonl, "csv": _write_csv}
+
+
+def _write(path: str, format: str, batches: Iterable[List[NoteRecord]]) -> None:
+    if format == "parquet":
+        _write_parquet(path, batches)
+        return
+    with _open_text(path, "w") as file:
+        TEXT_WRITERS[format](file, batches)
+
+
+def export_notes(
+    db: GermanDeckDatabase,
+    path: str,
+    format: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Write all notes of the database to a JSONL, CSV or Parquet file.
+
+    The file is written to a temporary file next to it and moved into place,
+    so a failed export never leaves a truncated file.
+
+    Args:
+        db (GermanDeckDatabase): The database.
+        path (str): The file; "-" writes JSONL or CSV to stdout.
+        format (Optional[str]): "jsonl", "csv" or "parquet"; by default
+            guessed from the file suffix.
+        batch_size (int): Number of notes read and written at a time.
+
+    Returns:
+        int: The number of exported notes.
+    """
+    format = note_format(path, format)
+    count = 0
+
+    def batches() -> Iterator[List[NoteRecord]]:
+        nonlocal count
+        for batch in chunked(db.iter_notes(batch_size), batch_size):
+            count += len(batch)
+            yield batch
+
+    with instrumentation.span("bulk.export") as span:
+        if path == "-":
+            _write(path, format, batches())
+        else:
+            tmp_path = f"{path}.tmp"
+            try:
+                _write(tmp_path, format, batches())
+                os.replace(tmp_path, path)
+            finally:
+                Path(tmp_path).unlink(missing_ok=True)
+        span["records"] = count
+    return count
@@ -0,0 +1,450 @@
+"""Module with the command-line interface, run as `python -m anki`.
+
+The subcommands cover the notebook flow end to end:
+
+- `ingest` reads an input text and prints the lines without a stored note;
+  like `generate`, it streams the input (see `anki.ingest`), so inputs of
+  any size are read in constant memory;
+- `generate` runs the new lines through the LLM pipeline into the deck;
+- `export` writes the stored notes to the .apkg file, or with `--specs` one
+  .apkg file per deck spec, built in parallel (see `anki.multi_export`);
+- `stats` reports what is stored;
+- `dump` and `load` stream the stored notes to and from JSONL, CSV or
+  Parquet files in batches (see `anki.bulk_io`), to move vocabulary between
+  databases or into analytics tools.
+
+With `--known-collection FILE`, `ingest` and `generate` also skip the words
+of the learner's Anki collection or of an exported .apkg file (see
+`anki.collection_reader`).
+
+With `--audio` or `--images`, `generate` and `export` add pronunciation audio
+and images to the notes, generated into a content-addressed media store (see
+`anki.media`).
+
+With `--metrics FILE`, any subcommand writes a JSON summary of the time spent
+per deck, database and LLM stage operation, with record and token counts, and
+`--trace FILE` appends every timed span as JSON Lines (see
+`anki.instrumentation`).
+
+Heavy dependencies are imported inside the subcommands that use them: only
+`generate` imports langchain, `stats` imports neither genanki nor SQLAlchemy,
+and the default `sqlite3` storage backend never imports SQLAlchemy at all.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Any, List, Optional
+
+from anki.constants import GERMAN_DECK_ID, GERMAN_MEDIA_MODEL_ID, GERMAN_MODEL_ID
+
+DEFAULT_DECK = "data/german_vocabulary"
+DEFAULT_CACHE = "data/llm_cache.db"
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_MEDIA = "data/media"
+
+
+def _open_db(args: argparse.Namespace):
+    from anki.german_deck_db import GermanDeckDatabase
+
+    return GermanDeckDatabase(Path(args.deck).with_suffix(".db"), backend=args.backend)
+
+
+def _known_word_index(args: argparse.Namespace):
+    """Open the index of known words: the deck database, plus the words of the
+    Anki collections given with `--known-collection`.
+
+    Returns:
+        The index and a function closing it.
+    """
+    if not args.known_collection:
+        db = _open_db(args)
+        return db, db.close
+    from anki.collection_reader import KnownVocabulary
+    from anki.german_deck import GermanDeck
+
+    vocabulary = KnownVocabulary.from_collections(args.known_collection)
+    print(f"{len(vocabulary)} words known from Anki collections", file=sys.stderr)
+    deck = GermanDeck(
+        GERMAN_DECK_ID, GERMAN_MODEL_ID, args.deck, args.backend, vocabulary=vocabulary
+    )
+    return deck, deck.close
+
+
+def _note_media(args: argparse.Namespace):
+    """Create the note media selected by `--audio` and `--images`, if any."""
+    if not (args.audio or args.images):
+        return None
+    from anki.media import (
+        EspeakGenerator,
+        MediaStore,
+        NoteMedia,
+        StubAudioGenerator,
+        SvgTextGenerator,
+    )
+
+    audio_generators = {"espeak": EspeakGenerator, "stub": StubAudioGenerator}
+    image_generators = {"svg": SvgTextGenerator}
+    return NoteMedia(
+        MediaStore(args.media_dir),
+        audio=audio_generators[args.audio]() if args.audio else None,
+        image=image_generators[args.images]() if args.images else None,
+    )
+
+
+def _open_deck(args: argparse.Namespace):
+    from anki.german_deck import GermanDeck
+
+    media = _note_media(args)
+    model_id = GERMAN_MODEL_ID if media is None else GERMAN_MEDIA_MODEL_ID
+    return GermanDeck(GERMAN_DECK_ID, model_id, args.deck, args.backend, media=media)
+
+
+def _response_cache(args: argparse.Namespace):
+    """Open the on-disk LLM response cache, unless `--no-cache` is given."""
+    if args.no_cache:
+        return None
+    from anki.llm_cache import ResponseCache
+
+    return ResponseCache(args.cache)
+
+
+def _chat_model(args: argparse.Namespace, cache: Any) -> Any:
+    """Create the chat model used by `generate`, with the given response cache."""
+    if args.model == "fake":
+        from anki.fake_llm import FakeChatModel
+
+        return FakeChatModel(cache=cache)
+
+    from langchain_openai import ChatOpenAI
+
+    # stream_usage reports token usage for streamed answers too
+    return ChatOpenAI(
+        temperature=0.01, model=args.model, cache=cache, stream_usage=True
+    )
+
+
+def ingest(args: argparse.Namespace) -> int:
+    """Print the unique input lines that have no stored note yet."""
+    from anki.ingest import IngestStats, iter_new_batches, read_lines
+
+    index, close_index = _known_word_index(args)
+    stats = IngestStats()
+    output = (
+        sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    )
+    try:
+        for batch in iter_new_batches(read_lines([args.input]), index, stats=stats):
+            output.writelines(f"{line}\n" for line in batch)
+    finally:
+        close_index()
+        if output is not sys.stdout:
+            output.close()
+    print(
+        f"{stats.new} new lines, {stats.known + stats.repeated} known or repeated "
+        "lines skipped",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def generate(args: argparse.Namespace) -> int:
+    """Generate notes for the input lines, store them and export the deck."""
+    from itertools import chain
+
+    from anki.batching import BatchRunner
+    from anki.ingest import iter_new_batches, read_lines
+    from anki.pipeline import MODES, Pipeline
+
+    # The input is read, deduplicated and checked against the database as the
+    # runner starts chunks, so it is never held in memory as a whole
+    lines = read_lines([args.input])
+    close_index = None
+    if not args.include_known:
+        index, close_index = _known_word_index(args)
+        lines = chain.from_iterable(iter_new_batches(lines, index))
+
+    cache = _response_cache(args)
+    runner = BatchRunner(
+        Pipeline(
+            _chat_model(args, cache),
+            stages=MODES[args.mode],
+            max_concurrency=args.concurrency,
+        ),
+        max_workers=args.workers,
+        max_tokens=args.max_tokens,
+        max_retries=args.retries,
+    )
+    failed = []
+    missing = []
+
+    async def notes():
+        async for result in runner.astream(lines):
+            if not result.ok:
+                failed.append(result)
+                print(
+                    f"Chunk {result.index} failed after {result.attempts} attempts: "
+                    f"{result.error}",
+                    file=sys.stderr,
+                )
+            missing.extend(result.missing)
+            for note in result.notes:
+                yield note
+
+    # Notes are committed in micro-batches as chunks finish, so an interrupted
+    # run keeps what it stored; rerunning it skips those words as known
+    deck = _open_deck(args)
+    try:
+        added = asyncio.run(deck.awrite_notes(notes(), batch_size=args.batch_size))
+    finally:
+        if close_index is not None:
+            close_index()
+        if cache is not None:
+            cache.close()
+    deck.load_deck()
+    deck.save_to_apkg(incremental=True)
+
+    if missing:
+        print(f"No complete note for: {', '.join(missing)}", file=sys.stderr)
+    print(f"{added} notes stored")
+    return 1 if failed else 0
+
+
+def export(args: argparse.Namespace) -> int:
+    """Export all stored notes to the .apkg file, or one file per deck spec."""
+    if args.specs:
+        if args.audio or args.images:
+            print("Media are not supported with --specs", file=sys.stderr)
+            return 2
+        from anki.multi_export import export_decks, load_specs
+
+        specs = load_specs(json.loads(Path(args.specs).read_text(encoding="utf-8")))
+        counts = export_decks(
+            Path(args.deck).with_suffix(".db"),
+            specs,
+            GERMAN_MODEL_ID,
+            max_workers=args.workers,
+            incremental=args.incremental,
+        )
+        for path, count in counts.items():
+            print(f"{count} notes exported to {path}")
+        return 0
+
+    deck = _open_deck(args)
+    deck.load_deck()
+    deck.save_to_apkg(incremental=args.incremental)
+    print(f"{len(deck.deck.notes)} notes exported to {deck.apkg_path}")
+    return 0
+
+
+def dump(args: argparse.Namespace) -> int:
+    """Write the stored notes to a JSONL, CSV or Parquet file."""
+    from anki.bulk_io import export_notes
+
+    db = _open_db(args)
+    try:
+        count = export_notes(db, args.output, args.format, args.batch_size)
+    finally:
+        db.close()
+    print(f"{count} notes written to {args.output}", file=sys.stderr)
+    return 0
+
+
+def load(args: argparse.Namespace) -> int:
+    """Upsert the notes of a JSONL, CSV or Parquet file into the database."""
+    from anki.bulk_io import import_notes
+
+    db = _open_db(args)
+    try:
+        stats = import_notes(
+            db, args.input, args.format, args.batch_size, args.skip_invalid
+        )
+    except (ValueError, OSError, RuntimeError) as error:
+        # A missing file or pyarrow is reported like an invalid row
+        print(error, file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    for message in stats.errors:
+        print(f"Invalid row {message}", file=sys.stderr)
+    print(
+        f"{stats.rows} rows read, {stats.stored} notes stored, "
+        f"{stats.invalid} invalid rows skipped",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def stats(args: argparse.Namespace) -> int:
+    """Print the number of stored notes and the size of the deck files."""
+    db_path = Path(args.deck).with_suffix(".db")
+    apkg_path = Path(args.deck).with_suffix(".apkg")
+    count = 0
+    # Do not create an empty database just to report on it
+    if db_path.exists():
+        db = _open_db(args)
+        count = db.count_notes()
+        db.close()
+    print(f"notes: {count}")
+    for path in (db_path, apkg_path):
+        size = f"{path.stat().st_size} bytes" if path.exists() else "missing"
+        print(f"{path}: {size}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser with one subparser per subcommand."""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--deck",
+        default=DEFAULT_DECK,
+        help="base path of the deck files (.db and .apkg)",
+    )
+    common.add_argument(
+        "--backend",
+        default="sqlite3",
+        choices=["sqlalchemy", "sqlite3"],
+        help="storage backend of the deck database",
+    )
+    common.add_argument(
+        "--metrics", help="write a JSON summary of timings and counts to this file"
+    )
+    common.add_argument("--trace", help="append every timed span to this JSONL file")
+
+    known = argparse.ArgumentParser(add_help=False)
+    known.add_argument(
+        "--known-collection",
+        action="append",
+        metavar="FILE",
+        help="Anki collection (collection.anki2) or .apkg file whose words are "
+        "skipped as known; may be given several times",
+    )
+
+    media = argparse.ArgumentParser(add_help=False)
+    media.add_argument(
+        "--audio",
+        choices=["espeak", "stub"],
+        help="add pronunciation audio, with espeak-ng or a stub tone",
+    )
+    media.add_argument(
+        "--images", choices=["svg"], help="add an image showing the translation"
+    )
+    media.add_argument(
+        "--media-dir", default=DEFAULT_MEDIA, help="directory of the media store"
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="python -m anki", description=__doc__.splitlines()[0]
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_ingest = subparsers.add_parser(
+        "ingest", parents=[common, known], help=ingest.__doc__
+    )
+    parser_ingest.add_argument("input", help="input text file, one term per line")
+    parser_ingest.add_argument("-o", "--output", default="-", help="output file")
+    parser_ingest.set_defaults(func=ingest)
+
+    parser_generate = subparsers.add_parser(
+        "generate", parents=[common, known, media], help=generate.__doc__
+    )
+    parser_generate.add_argument("input", help="input text file, one term per line")
+    parser_generate.add_argument(
+        "--model",
+        default=DEFAULT_MODEL,
+        help='OpenAI model name, or "fake" for the offline fake model',
+    )
+    parser_generate.add_argument(
+        "--mode",
+        default="chain",
+        choices=["chain", "combined"],
+        help="five LLM calls per batch, or one call returning complete notes",
+    )
+    parser_generate.add_argument("--cache", default=DEFAULT_CACHE)
+    parser_generate.add_argument("--no-cache", action="store_true")
+    parser_generate.add_argument("--workers", type=int, default=4)
+    parser_generate.add_argument("--concurrency", type=int, default=3)
+    parser_generate.add_argument("--max-tokens", type=int, default=1000)
+    parser_generate.add_argument("--retries", type=int, default=3)
+    parser_generate.add_argument(
+        "--batch-size", type=int, default=100, help="notes committed per transaction"
+    )
+    parser_generate.add_argument(
+        "--include-known",
+        action="store_true",
+        help="also regenerate lines that already have a stored note",
+    )
+    parser_generate.set_defaults(func=generate)
+
+    parser_export = subparsers.add_parser(
+        "export", parents=[common, media], help=export.__doc__
+    )
+    parser_export.add_argument("--incremental", action="store_true")
+    parser_export.add_argument(
+        "--specs",
+        help="JSON file with a list of deck specs (deck_id, name, apkg_path, "
+        "where, parameters) to export in parallel",
+    )
+    parser_export.add_argument(
+        "--workers", type=int, help="export processes, by default one per CPU"
+    )
+    parser_export.set_defaults(func=export)
+
+    bulk = argparse.ArgumentParser(add_help=False)
+    bulk.add_argument(
+        "--format",
+        choices=["jsonl", "csv", "parquet"],
+        help="file format, by default guessed from the file suffix",
+    )
+    bulk.add_argument(
+        "--batch-size", type=int, default=10_000, help="rows read and written at a time"
+    )
+
+    parser_dump = subparsers.add_parser(
+        "dump", parents=[common, bulk], help=dump.__doc__
+    )
+    parser_dump.add_argument("output", help='output file, or "-" for stdout')
+    parser_dump.set_defaults(func=dump)
+
+    parser_load = subparsers.add_parser(
+        "load", parents=[common, bulk], help=load.__doc__
+    )
+    parser_load.add_argument("input", help='input file, or "-" for stdin')
+    parser_load.add_argument(
+        "--skip-invalid",
+        action="store_true",
+        help="skip invalid rows instead of storing nothing",
+    )
+    parser_load.set_defaults(func=load)
+
+    parser_stats = subparsers.add_parser("stats", parents=[common], help=stats.__doc__)
+    parser_stats.set_defaults(func=stats)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command line interface.
+
+    Args:
+        argv (Optional[List[str]]): The arguments, `sys.argv[1:]` by default.
+
+    Returns:
+        int: The exit status.
+    """
+    args = build_parser().parse_args(argv)
+    if not (args.metrics or args.trace):
+        return args.func(args)
+
+    from anki.instrumentation import JsonLinesSink, recording
+
+    sinks = [JsonLinesSink(args.trace)] if args.trace else []
+    with recording(*sinks) as recorder:
+        try:
+            return args.func(args)
+        finally:
+            for sink in sinks:
+                sink.close()
+            if args.metrics:
+                recorder.write_json(args.metrics)
@@ -0,0 +1,236 @@
+"""Module for reading the vocabulary of existing Anki collections.
+
+Learners often already have thousands of German cards in their Anki profile
+(`collection.anki2`) or in exported packages (.apkg). `iter_note_words`
+opens such a file read-only and streams the German word of every note from
+its SQLite `notes` table, and `KnownVocabulary` indexes these words by lemma
+key (see `anki.normalize.lemma_key`), so words the learner already has are
+skipped before any LLM call, like words with a stored note.
+
+The word of a note is taken from the first field of its note type named like
+one of `WORD_FIELD_NAMES`, or else from its first field, with HTML markup and
+sound tags removed. Both the legacy collection schema, with note types stored
+as JSON in the `col` table, and the current one, with a `fields` table, are
+supported. Packages in the compressed format of Anki 2.1.50+ need the optional
+`zstandard` package.
+"""
+
+import html
+import json
+import re
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Set, Union
+
+from anki.normalize import lemma_key
+
+# Names of the fields holding the German word, in order of preference
+WORD_FIELD_NAMES = (
+    "German Word",
+    "German",
+    "Deutsch",
+    "Wort",
+    "Word",
+    "Front",
+    "Vorderseite",
+)
+
+# Collection files in a package, in order of preference. Packages in the
+# compressed format also hold a legacy `collection.anki2` with a placeholder
+# note, so the compressed one comes first.
+PACKAGE_COLLECTIONS = ("collection.anki21b", "collection.anki21", "collection.anki2")
+
+# Separator of the fields in the `flds` column of the `notes` table
+FIELD_SEPARATOR = "\x1f"
+
+# Size of the blocks in which a collection is extracted from a package
+COPY_BLOCK_SIZE = 1 << 20
+
+_TAG = re.compile(r"<[^>]*>|\[sound:[^\]]*\]")
+
+
+def clean_field(value: str) -> str:
+    """Return the text of a field value, without HTML markup and sound tags."""
+    return " ".join(html.unescape(_TAG.sub(" ", value)).split())
+
+
+def _connect(path: Path, immutable: bool) -> sqlite3.Connection:
+    """Open a collection database read-only."""
+    query = "mode=ro&immutable=1" if immutable else "mode=ro"
+    return sqlite3.connect(f"{path.resolve().as_uri()}?{query}", uri=True)
+
+
+def _extract_collection(package: zipfile.ZipFile, target: Path) -> None:
+    """Extract the collection of a package to a file, in blocks."""
+    names = set(package.namelist())
+    member = next((name for name in PACKAGE_COLLECTIONS if name in names), None)
+    if member is None:
+        raise ValueError(f"No Anki collection in {package.filename}")
+    with package.open(member) as source, open(target, "wb") as file:
+        if member.endswith(".anki21b"):
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError(
+                    f"{package.filename} uses the compressed format of Anki 2.1.50+; "
+                    "install zstandard to read it, or export it from Anki with "
+                    '"Support older Anki versions"'
+                ) from None
+            zstandard.ZstdDecompressor().copy_stream(source, file)
+        else:
+            shutil.copyfileobj(source, file, COPY_BLOCK_SIZE)
+
+
+@contextmanager
+def open_collection(path: Union[str, Path]) -> Iterator[sqlite3.Connection]:
+    """Open an Anki collection or package read-only.
+
+    A package's collection is extracted to a temporary file, which is deleted
+    on exit. A collection file is opened in place and never written to; close
+    Anki first, as it locks the collection of the open profile.
+
+    Args:
+        path (Union[str, Path]): A `collection.anki2` file or an .apkg file.
+
+    Yields:
+        sqlite3.Connection: A read-only connection to the collection.
+    """
+    path = Path(path).expanduser()
+    if not path.exists():
+        raise FileNotFoundError(f"No Anki collection at {path}")
+    if not zipfile.is_zipfile(path):
+        connection = _connect(path, immutable=False)
+        try:
+            yield connection
+        finally:
+            connection.close()
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        collection = Path(tmp_dir) / "collection.anki2"
+        with zipfile.ZipFile(path) as package:
+            _extract_collection(package, collection)
+        connection = _connect(collection, immutable=True)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+
+def _field_names(connection: sqlite3.Connection) -> Dict[int, List[str]]:
+    """Return the field names of every note type, by note type ID."""
+    tables = {
+        row[0]
+        for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+    names: Dict[int, List[str]] = {}
+    if "fields" in tables:
+        rows = connection.execute("SELECT ntid, name FROM fields ORDER BY ntid, ord")
+        for note_type_id, name in rows:
+            names.setdefault(note_type_id, []).append(name)
+        return names
+    (models,) = connection.execute("SELECT models FROM col").fetchone()
+    for note_type_id, model in json.loads(models or "{}").items():
+        fields = sorted(model["flds"], key=lambda field: field["ord"])
+        names[int(note_type_id)] = [field["name"] for field in fields]
+    return names
+
+
+def word_field_indexes(
+    connection: sqlite3.Connection, field_names: Sequence[str] = WORD_FIELD_NAMES
+) -> Dict[int, int]:
+    """Return the index of the word field of every note type, by note type ID.
+
+    Args:
+        connection (sqlite3.Connection): A connection to the collection.
+        field_names (Sequence[str]): Names of the word field, in order of
+            preference and compared case-insensitively. Note types without such
+            a field use their first field.
+
+    Returns:
+        Dict[int, int]: The field index, by note type ID.
+    """
+    wanted = [name.casefold() for name in field_names]
+    indexes = {}
+    for note_type_id, names in _field_names(connection).items():
+        folded = [name.casefold() for name in names]
+        indexes[note_type_id] = next(
+            (folded.index(name) for name in wanted if name in folded), 0
+        )
+    return indexes
+
+
+def iter_note_words(
+    path: Union[str, Path], field_names: Sequence[str] = WORD_FIELD_NAMES
+) -> Iterator[str]:
+    """Stream the German word of every note of an Anki collection or package.
+
+    Args:
+        path (Union[str, Path]): A `collection.anki2` file or an .apkg file.
+        field_names (Sequence[str]): Names of the word field, see
+            `word_field_indexes`.
+
+    Yields:
+        str: The cleaned word field of the next note, if not empty.
+    """
+    with open_collection(path) as connection:
+        indexes = word_field_indexes(connection, field_names)
+        for note_type_id, fields in connection.execute("SELECT mid, flds FROM notes"):
+            values = fields.split(FIELD_SEPARATOR)
+            index = indexes.get(note_type_id, 0)
+            word = clean_field(values[index] if index < len(values) else values[0])
+            if word:
+                yield word
+
+
+class KnownVocabulary:
+    """Index of the words a learner already has, by lemma key."""
+
+    def __init__(self, words: Iterable[str] = ()) -> None:
+        """
+        Initialize the index.
+
+        Args:
+            words (Iterable[str]): The known German words or phrases.
+        """
+        self._keys: Set[str] = set()
+        self.update(words)
+
+    @classmethod
+    def from_collections(
+        cls,
+        paths: Iterable[Union[str, Path]],
+        field_names: Sequence[str] = WORD_FIELD_NAMES,
+    ) -> "KnownVocabulary":
+        """Index the words of Anki collections or packages, see `iter_note_words`."""
+        vocabulary = cls()
+        for path in paths:
+            vocabulary.update(iter_note_words(path, field_names))
+        return vocabulary
+
+    def update(self, words: Iterable[str]) -> None:
+        """Add words to the index."""
+        self._keys.update(map(lemma_key, words))
+
+    def __contains__(self, word: str) -> bool:
+        return lemma_key(word) in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def known_words(self, words: Iterable[str]) -> Set[str]:
+        """Return the given words that are in the index, like `GermanDeckDatabase.known_words`.
+
+        Args:
+            words (Iterable[str]): The German words or phrases to check.
+
+        Returns:
+            Set[str]: The input words that are already known.
+        """
+        return {word for word in words if lemma_key(word) in self._keys}
@@ -1,4 +1,6 @@
 """Module with constants"""
 
 GERMAN_MODEL_ID = 3205940011
+# Model with the Audio and Image fields, see `anki.media`
+GERMAN_MEDIA_MODEL_ID = 3205940012
 GERMAN_DECK_ID = 2059400110
@@ -0,0 +1,361 @@
+"""Module with a deterministic local chat model for offline runs and load tests.
+
+`FakeChatModel` is a LangChain chat model, so it drops in wherever the
+pipeline takes `ChatOpenAI`. It answers a prompt in one of two ways:
+
+- replay: the answer recorded for the same prompt, e.g. by a
+  `RecordingCallback` attached to a live model;
+- synthesis: a schema-valid JSON Lines answer for the words at the end of
+  the prompt, with one record per word and the fields the prompt's format
+  instructions ask for. Values come from the given `notes` where the word
+  is known, and are derived from the word otherwise.
+
+Latency is modeled as a time per call plus a time per completion token,
+streamed answers arrive in chunks, and a share of calls fails with
+`FakeLLMError` (mid-stream when streaming) or returns a malformed row. The
+failures are drawn from the prompt and the number of times it was asked, so
+they do not depend on the order in which concurrent calls are made. Every
+answer reports approximate token usage like a real model, including the
+prompt tokens a provider would serve from its prompt cache: like OpenAI, the
+model caches prompt prefixes of at least `cache_min_tokens` tokens, in blocks
+of `cache_block_tokens`.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+from uuid import UUID
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    BaseCallbackHandler,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    get_buffer_string,
+)
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+    LLMResult,
+)
+from langchain_core.pydantic_v1 import PrivateAttr
+
+from anki.normalize import normalize_word
+from anki.prefilter import split_words
+from anki.prompts import approximate_tokens
+from anki.response_schema import KEY_FIELD, Record
+
+# Field names listed in a prompt's format instructions
+FIELD_PATTERN = re.compile(r'^\s*- "(\w+)":', re.MULTILINE)
+
+
+class FakeLLMError(RuntimeError):
+    """A simulated failure of the fake chat model, e.g. a rate limit."""
+
+
+def prompt_key(messages: List[BaseMessage]) -> str:
+    """Return the text a prompt is recorded and replayed by."""
+    return get_buffer_string(messages)
+
+
+def prompt_words(prompt: str) -> List[str]:
+    """Return the words in the payload at the end of a rendered prompt.
+
+    The payload is the text in the last code fence, or else the last line. It
+    holds raw input lines, a semicolon-separated word list or JSON Lines
+    records keyed by `KEY_FIELD`.
+    """
+    prompt = prompt.strip()
+    if prompt.endswith("```"):
+        payload = prompt[:-3].rsplit("```", 1)[-1]
+    else:
+        payload = prompt.splitlines()[-1]
+    words = []
+    for line in payload.splitlines():
+        if line.strip().startswith("{"):
+            words.append(json.loads(line)[KEY_FIELD])
+        else:
+            words.extend(split_words(line))
+    return words
+
+
+def synthetic_value(field: str, word: str) -> str:
+    """Return a deterministic value of a record field for a word."""
+    values = {
+        "translation": f"{word} (en)",
+        "german_sentence": f"Hier steht {word} in einem Satz.",
+        "english_sentence": f"Here {word} (en) is in a sentence.",
+        "other_forms": "NONE",
+    }
+    return values.get(field, word)
+
+
+def load_recordings(path: str) -> Dict[str, str]:
+    """Read recorded answers from a JSON Lines file of prompts and answers.
+
+    Args:
+        path (str): A file written by `RecordingCallback`.
+
+    Returns:
+        Dict[str, str]: The answers by prompt; the last one wins.
+    """
+    recordings = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry["prompt"]] = entry["answer"]
+    return recordings
+
+
+class RecordingCallback(BaseCallbackHandler):
+    """LangChain callback appending the prompts and answers of a chat model to a file.
+
+    Attach it to a live model, e.g. `ChatOpenAI(callbacks=[RecordingCallback(path)])`,
+    to record answers that `FakeChatModel` can replay.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize the callback.
+
+        Args:
+            path (str): The JSON Lines file the prompts and answers are appended to.
+        """
+        self.path = path
+        self._prompts: Dict[UUID, str] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        self._prompts[run_id] = prompt_key(messages[0])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        prompt = self._prompts.pop(run_id, None)
+        if prompt is None or not response.generations:
+            return
+        entry = {"prompt": prompt, "answer": response.generations[0][0].text}
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model replaying or synthesizing the template answers."""
+
+    # Recorded answers by prompt, see `load_recordings`
+    recordings: Dict[str, str] = {}
+    # Known note records by normalized German word, used for synthesized answers
+    notes: Dict[str, Record] = {}
+    # Seconds per call, and per completion token on top of it
+    latency: float = 0.0
+    token_latency: float = 0.0
+    # Share of calls failing with `FakeLLMError`
+    error_rate: float = 0.0
+    # Share of answers with one malformed row
+    malformed_rate: float = 0.0
+    # Characters per streamed chunk
+    chunk_size: int = 64
+    # Shortest cached prompt prefix, and the steps in which prefixes are cached
+    cache_min_tokens: int = 1024
+    cache_block_tokens: int = 128
+    seed: int = 0
+
+    # Times each prompt was asked, by prompt hash
+    _asked: Dict[bytes, int] = PrivateAttr(default_factory=dict)
+    _calls: int = PrivateAttr(default=0)
+    # Hashes of the prompt prefixes seen so far, see `_cached_tokens`
+    _prefixes: Set[bytes] = PrivateAttr(default_factory=set)
+
+    @classmethod
+    def from_notes(cls, notes: List[Record], **kwargs: Any) -> "FakeChatModel":
+        """Create a model answering from note records, e.g. exported from the database."""
+        return cls(
+            notes={normalize_word(note[KEY_FIELD]): note for note in notes}, **kwargs
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "anki-fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"seed": self.seed, "error_rate": self.error_rate}
+
+    @property
+    def calls(self) -> int:
+        """The number of prompts answered or failed so far."""
+        return self._calls
+
+    def synthesize(self, prompt: str) -> str:
+        """Return a schema-valid JSON Lines answer to a rendered template prompt."""
+        fields = FIELD_PATTERN.findall(prompt) or [KEY_FIELD]
+        rows = []
+        for word in prompt_words(prompt):
+            note = self.notes.get(normalize_word(word), {})
+            # The key field is the word as given, as the schemas ask
+            record = {
+                field: (
+                    word
+                    if field == KEY_FIELD
+                    else note.get(field) or synthetic_value(field, word)
+                )
+                for field in fields
+            }
+            rows.append(json.dumps(record, ensure_ascii=False))
+        return "\n".join(rows)
+
+    def _answer(self, messages: List[BaseMessage]) -> Tuple[str, bool]:
+        """Return the answer to a prompt and whether the call fails."""
+        prompt = prompt_key(messages)
+        digest = hashlib.sha1(prompt.encode("utf-8")).digest()
+        asked = self._asked.get(digest, 0)
+        self._asked[digest] = asked + 1
+        self._calls += 1
+        rng = random.Random(digest + f"\x1f{self.seed}\x1f{asked}".encode())
+
+        answer = self.recordings.get(prompt)
+        if answer is None:
+            # The format instructions and the words may be in different messages
+            answer = self.synthesize("\n\n".join(str(m.content) for m in messages))
+        fails = rng.random() < self.error_rate
+        if answer and rng.random() < self.malformed_rate:
+            # Drop a separator between two fields of the first row
+            answer = answer.replace('", "', '" "', 1)
+        return answer, fails
+
+    def _delay(self, answer: str) -> float:
+        return self.latency + approximate_tokens(answer) * self.token_latency
+
+    def _cached_tokens(self, prompt: str) -> int:
+        """Return the tokens of the longest cached prefix of a prompt, and cache it.
+
+        Prefixes are hashed at every block boundary from `cache_min_tokens` on,
+        with tokens approximated as four characters.
+        """
+        block = 4 * self.cache_block_tokens
+        digest = hashlib.sha1()
+        cached = 0
+        for end in range(block, len(prompt) + 1, block):
+            digest.update(prompt[end - block : end].encode("utf-8"))
+            if end < 4 * self.cache_min_tokens:
+                continue
+            prefix = digest.digest()
+            if prefix in self._prefixes:
+                cached = end // 4
+            else:
+                self._prefixes.add(prefix)
+        return cached
+
+    def _message(self, messages: List[BaseMessage], answer: str) -> AIMessage:
+        prompt = prompt_key(messages)
+        prompt_tokens = approximate_tokens(prompt)
+        completion_tokens = approximate_tokens(answer)
+        return AIMessage(
+            content=answer,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "input_token_details": {"cache_read": self._cached_tokens(prompt)},
+            },
+        )
+
+    def _chunks(
+        self, messages: List[BaseMessage], answer: str, fails: bool
+    ) -> Iterator[Union[ChatGenerationChunk, FakeLLMError]]:
+        """Split an answer into chunks; a failing call breaks off halfway."""
+        pieces = [
+            answer[i : i + self.chunk_size]
+            for i in range(0, len(answer), self.chunk_size)
+        ]
+        if fails:
+            yield from (
+                ChatGenerationChunk(message=AIMessageChunk(content=piece))
+                for piece in pieces[: len(pieces) // 2]
+            )
+            yield FakeLLMError("simulated failure while streaming")
+            return
+        for piece in pieces:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        # The usage arrives with a final empty chunk, as with `stream_usage`
+        usage = self._message(messages, answer).usage_metadata
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="", usage_metadata=usage)
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        answer, fails = self._answer(messages)
+        time.sleep(self._delay(answer))
+        if fails:
+            raise FakeLLMError("simulated failure")
+        return ChatResult(
+            generations=[ChatGeneration(message=self._message(messages, answer))]
+        )
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        answer, fails = self._answer(messages)
+        await asyncio.sleep(self._delay(answer))
+        if fails:
+            raise FakeLLMError("simulated failure")
+        return ChatResult(
+            generations=[ChatGeneration(message=self._message(messages, answer))]
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        answer, fails = self._answer(messages)
+        chunks = list(self._chunks(messages, answer, fails))
+        delay = self._delay(answer) / len(chunks)
+        for chunk in chunks:
+            time.sleep(delay)
+            if isinstance(chunk, FakeLLMError):
+                raise chunk
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ):
+        answer, fails = self._answer(messages)
+        chunks = list(self._chunks(messages, answer, fails))
+        delay = self._delay(answer) / len(chunks)
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            if isinstance(chunk, FakeLLMError):
+                raise chunk
+            yield chunk
@@ -2,33 +2,169 @@
 
 This module provides a `GermanDeck` class to create Anki decks, add notes,
 save them to a SQLite database, and export them as Anki package files (.apkg).
+
+Every note gets a deterministic GUID derived from its normalized German word
+(see `anki.normalize.note_guid`), which the database stores with the note too.
+The deck indexes its notes by GUID, so adding or loading a word that is
+already in the deck updates that note instead of adding a duplicate, and
+re-importing an exported package into Anki updates the cards in place.
+
+Notes are held as compact `DeckNote` records. The `genanki.Note` objects
+genanki exports are built one at a time while the package is written, so a
+large deck never holds them all in memory.
+
+With `NoteMedia`, the notes get pronunciation audio and images, generated into
+a content-addressed `anki.media.MediaStore` when the package is written.
+
+With a `KnownVocabulary`, e.g. read from the learner's Anki collection (see
+`anki.collection_reader`), `known_words` also reports the words the learner
+already has, so passing the deck to `anki.prefilter.filter_new_words` or
+`anki.ingest.iter_new_batches` skips them before any LLM call.
 """
 
+from itertools import islice
 from pathlib import Path
+from typing import (
+    AsyncIterable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+)
 
 import genanki
 
+from anki import instrumentation
+from anki.apkg_export import write_incremental_package
+from anki.collection_reader import KnownVocabulary
 from anki.german_deck_db import GermanDeckDatabase
 from anki.german_model import GermanModel
+from anki.media import NoteMedia
+from anki.normalize import note_guid
+from anki.storage import NOTE_FIELDS, NoteRow
+
+
+class DeckNote:
+    """Compact record of one note of a `GermanDeck`.
+
+    A slotted object with one attribute per note field, instead of a
+    `genanki.Note` with its instance dict, field and tag lists and model.
+    """
+
+    __slots__ = ("guid", *NOTE_FIELDS)
+
+    def __init__(self, guid: str, fields: Sequence[Optional[str]]) -> None:
+        """
+        Initialize the record.
+
+        Args:
+            guid (str): The note GUID, see `anki.normalize.note_guid`.
+            fields (Sequence[Optional[str]]): The note fields, in `NOTE_FIELDS` order.
+        """
+        self.guid = guid
+        (
+            self.german_word,
+            self.translation,
+            self.german_sentence,
+            self.english_sentence,
+            self.other_forms,
+        ) = fields
+
+    @property
+    def fields(self) -> List[Optional[str]]:
+        """The note fields, in `NOTE_FIELDS` order."""
+        return [getattr(self, name) for name in NOTE_FIELDS]
+
+    @fields.setter
+    def fields(self, fields: Sequence[Optional[str]]) -> None:
+        for name, value in zip(NOTE_FIELDS, fields):
+            setattr(self, name, value)
+
+    def as_row(self) -> Dict[str, Optional[str]]:
+        """Return the note as a row for `GermanDeckDatabase.add_notes`."""
+        return {name: getattr(self, name) for name in NOTE_FIELDS}
+
+
+class NoteView(Sequence[genanki.Note]):
+    """Read-only sequence of the notes of a `GermanDeck` as `genanki.Note` objects.
+
+    It stands in for `genanki.Deck.notes`: every access builds new
+    `genanki.Note` objects from the deck's records, so iterating over it, as
+    genanki does when writing a package, holds one note at a time. Changing a
+    returned note does not change the deck; use `GermanDeck.add_note`.
+    """
+
+    def __init__(self, deck: "GermanDeck") -> None:
+        self._deck = deck
+
+    def __len__(self) -> int:
+        return len(self._deck._notes)
+
+    def __iter__(self) -> Iterator[genanki.Note]:
+        return map(self._deck._to_genanki, self._deck._notes.values())
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return list(islice(self, *index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("note index out of range")
+        return next(islice(self, index, None))
 
 
 class GermanDeck:
-    def __init__(self, deck_id: int, model_id: int, file_name: str) -> None:
+    def __init__(
+        self,
+        deck_id: int,
+        model_id: int,
+        file_name: str,
+        db_backend: str = "sqlalchemy",
+        deck_name: str = "German Vocabulary",
+        media: Optional[NoteMedia] = None,
+        vocabulary: Optional[KnownVocabulary] = None,
+    ) -> None:
         """Initialize the GermanDeck with deck ID, model ID, and file name.
 
         Args:
             deck_id (int): The unique ID for the Anki deck.
             model_id (int): The unique ID for the Anki model.
             file_name (str): The base file name used to store the deck.
+            db_backend (str): The `GermanDeckDatabase` storage backend to use.
+            deck_name (str): The deck name shown in Anki.
+            media (Optional[NoteMedia]): Generates the Audio and Image fields of
+                the notes. Decks with media use the `GermanModel` with these
+                fields, which needs a model ID of its own.
+            vocabulary (Optional[KnownVocabulary]): Words the learner already
+                has, which `known_words` reports as known.
         """
         self.deck_id = deck_id
-        self.model = GermanModel(model_id)
-        self.deck = genanki.Deck(deck_id, "German Vocabulary")
+        self.db_backend = db_backend
+        self.media = media
+        self.vocabulary = vocabulary
+        self.model = GermanModel(model_id, media=media is not None)
+        self.deck = genanki.Deck(deck_id, deck_name)
+        self.deck.add_model(self.model)
+        # genanki reads the notes through a view building them on access
+        self.deck.notes = NoteView(self)
+        # Notes of the deck by GUID, for constant-time deduplication
+        self._notes: Dict[str, DeckNote] = {}
+        # Notes added or changed since the last load or save, by GUID
+        self._unsaved_notes: Dict[str, DeckNote] = {}
+        # Database reused by `known_words` across calls, opened on first use
+        self._lookup_db: Optional[GermanDeckDatabase] = None
 
         # Store the file name and derive paths for .db and .apkg files
         self.db_path = Path(file_name).with_suffix(".db")
         self.apkg_path = Path(file_name).with_suffix(".apkg")
+        # Collection database reused between incremental .apkg exports
+        self.build_cache_path = Path(file_name).with_suffix(".build.anki2")
 
+    @instrumentation.instrumented("deck.add_note")
     def add_note(
         self,
         german_word: str,
@@ -37,7 +173,12 @@ class GermanDeck:
         english_sentence: str,
         other_forms: str,
     ) -> None:
-        """Add a new note to the Anki deck.
+        """Add a new note to the Anki deck, or update the note of the same word.
+
+        Words are matched by GUID, i.e. by their normalized German word. The
+        fields of an existing note are overwritten by the given non-empty
+        values, so re-adding a word without its other forms keeps the stored
+        ones.
 
         Args:
             german_word (str): The German word to be added.
@@ -46,61 +187,211 @@ class GermanDeck:
             english_sentence (str): The English translation of the German sentence.
             other_forms (str): Other grammatical forms of the German word.
         """
-        note = genanki.Note(
-            model=self.model,
-            fields=[
-                german_word,
-                translation,
-                german_sentence,
-                english_sentence,
-                other_forms,
-            ],
+        note = self._put(
+            [german_word, translation, german_sentence, english_sentence, other_forms],
+            merge=True,
         )
-        self.deck.add_note(note)
-
-    def save_deck(self) -> None:
-        """Save the deck to a SQLite database and export it as an Anki package (.apkg) file."""
-        # Initialize the database connection
-        db = GermanDeckDatabase(self.db_path)
-
-        # Save each note in the deck to the database
-        for note in self.deck.notes:
-            db.add_note(
-                german_word=note.fields[0],
-                translation=note.fields[1],
-                german_sentence=note.fields[2],
-                english_sentence=note.fields[3],
-                other_forms=note.fields[4],
-            )
-
-        # Save the deck to an Anki package file
-        genanki.Package(self.deck).write_to_file(self.apkg_path)
+        if note is not None:
+            self._unsaved_notes[note.guid] = note
+
+    def _put(self, fields: List[Optional[str]], merge: bool) -> Optional[DeckNote]:
+        """Add a note, or update the fields of the note with the same GUID.
+
+        With `merge`, empty new values keep the current values of the note.
+
+        Returns:
+            Optional[DeckNote]: The added or changed note, or None if the note
+                was already in the deck with these fields.
+        """
+        guid = note_guid(fields[0] or "")
+        note = self._notes.get(guid)
+        if note is None:
+            note = self._notes[guid] = DeckNote(guid, fields)
+            return note
+        if merge:
+            fields = [new or old for new, old in zip(fields, note.fields)]
+        if fields == note.fields:
+            return None
+        note.fields = fields
+        return note
+
+    def _to_genanki(self, note: DeckNote) -> genanki.Note:
+        """Build the `genanki.Note` exported for a note record."""
+        fields = note.fields
+        if self.media is not None:
+            fields += self.media.fields(note)
+        return genanki.Note(model=self.model, fields=fields, guid=note.guid)
+
+    def save_deck(self, incremental: bool = False) -> None:
+        """Save the deck to a SQLite database and export it as an Anki package (.apkg) file.
+
+        Only notes added since the last load or save are sent to the database, where
+        they are upserted by German word, so repeated saves never duplicate rows.
+
+        Args:
+            incremental (bool): Export the package incrementally, see `save_to_apkg`.
+        """
+        with instrumentation.span("deck.save_deck") as span:
+            # Initialize the database connection
+            db = GermanDeckDatabase(self.db_path, backend=self.db_backend)
+
+            # Upsert the new notes into the database in one transaction
+            unsaved_notes = list(self._unsaved_notes.values())
+            span["records"] = len(unsaved_notes)
+            try:
+                db.add_notes(note.as_row() for note in unsaved_notes)
+            finally:
+                db.close()
+            # Only forget the pending notes once they are stored, so a failed
+            # save can be retried
+            self._unsaved_notes = {}
+
+            # Save the deck to an Anki package file
+            self.save_to_apkg(incremental=incremental)
+
+    def write_notes(
+        self,
+        notes: Iterable[NoteRow],
+        batch_size: int = 100,
+        checkpoint: Optional[str] = None,
+    ) -> int:
+        """Stream notes straight into the database, see `GermanDeckDatabase.write_notes`.
+
+        The notes are committed in micro-batches and not kept in the deck; call
+        `load_deck` and `save_to_apkg` afterwards to export them.
+
+        Args:
+            notes (Iterable[NoteRow]): Notes keyed by `add_note` argument.
+            batch_size (int): Number of notes committed per transaction.
+            checkpoint (Optional[str]): Name under which progress is saved.
+
+        Returns:
+            int: The number of notes written.
+        """
+        with instrumentation.span("deck.write_notes") as span:
+            db = GermanDeckDatabase(self.db_path, backend=self.db_backend)
+            try:
+                span["records"] = db.write_notes(notes, batch_size, checkpoint)
+            finally:
+                db.close()
+        return span["records"]
+
+    async def awrite_notes(
+        self,
+        notes: AsyncIterable[NoteRow],
+        batch_size: int = 100,
+        checkpoint: Optional[str] = None,
+    ) -> int:
+        """Async counterpart of `write_notes` for notes produced as LLM results arrive.
+
+        Args:
+            notes (AsyncIterable[NoteRow]): Notes keyed by `add_note` argument.
+            batch_size (int): Number of notes committed per transaction.
+            checkpoint (Optional[str]): Name under which progress is saved.
+
+        Returns:
+            int: The number of notes written.
+        """
+        with instrumentation.span("deck.awrite_notes") as span:
+            db = GermanDeckDatabase(self.db_path, backend=self.db_backend)
+            try:
+                span["records"] = await db.awrite_notes(notes, batch_size, checkpoint)
+            finally:
+                db.close()
+        return span["records"]
 
     def load_deck(self) -> None:
-        """Load notes from a SQLite database and add them to the Anki deck."""
-        # Initialize the database connection
-        db = GermanDeckDatabase(self.db_path)
-
-        # Load notes from the database
-        notes = db.load_notes()
-
-        # Convert each database record into a genanki.Note and add it to the deck
-        for note_model in notes:
-            note = genanki.Note(
-                model=self.model,
-                fields=[
-                    note_model.german_word,
-                    note_model.translation,
-                    note_model.german_sentence,
-                    note_model.english_sentence,
-                    note_model.other_forms,
-                ],
-            )
-            self.deck.add_note(note)
-
-    def save_to_apkg(self) -> None:
-        """Save the Anki deck as an Anki package (.apkg) file."""
-        genanki.Package(self.deck).write_to_file(self.apkg_path)
+        """Load notes from a SQLite database and add them to the Anki deck.
+
+        Rows are streamed from the database, so no intermediate list of database
+        records is built alongside the deck. Stored notes replace the notes of
+        the same word in the deck, except for notes not saved yet, so loading
+        twice does not duplicate notes.
+        """
+        with instrumentation.span("deck.load_deck") as span:
+            # Initialize the database connection
+            db = GermanDeckDatabase(self.db_path, backend=self.db_backend)
+
+            # Add each database record to the deck, or update its note there
+            span["records"] = 0
+            try:
+                for row in db.iter_notes():
+                    if (
+                        self._unsaved_notes
+                        and note_guid(row.german_word) in self._unsaved_notes
+                    ):
+                        continue
+                    self._put(
+                        [
+                            row.german_word,
+                            row.translation,
+                            row.german_sentence,
+                            row.english_sentence,
+                            row.other_forms,
+                        ],
+                        merge=False,
+                    )
+                    span["records"] += 1
+            finally:
+                db.close()
+
+    def known_words(self, words: Iterable[str]) -> Set[str]:
+        """Return the given words that have a stored note or are in the vocabulary.
+
+        Words are matched on their lemma key, see `GermanDeckDatabase.known_words`.
+        Only the words not in the vocabulary are looked up in the database, which
+        is opened on the first lookup and kept open until `close`.
+
+        Args:
+            words (Iterable[str]): The German words or phrases to check.
+
+        Returns:
+            Set[str]: The input words that are already known.
+        """
+        words = list(words)
+        known = set()
+        if self.vocabulary is not None:
+            known = self.vocabulary.known_words(words)
+            words = [word for word in words if word not in known]
+        if words:
+            if self._lookup_db is None:
+                self._lookup_db = GermanDeckDatabase(
+                    self.db_path, backend=self.db_backend
+                )
+            known |= self._lookup_db.known_words(words)
+        return known
+
+    def close(self) -> None:
+        """Close the database opened by `known_words`, if any."""
+        if self._lookup_db is not None:
+            self._lookup_db.close()
+            self._lookup_db = None
+
+    def save_to_apkg(self, incremental: bool = False) -> None:
+        """Save the Anki deck as an Anki package (.apkg) file.
+
+        With media, missing media files are generated first, and only the files
+        the notes reference are added to the package.
+
+        Args:
+            incremental (bool): Reuse the collection database built by the previous
+                incremental export and apply only the notes that changed since,
+                instead of rebuilding the whole collection.
+        """
+        with instrumentation.span(
+            "deck.save_to_apkg", records=len(self.deck.notes), incremental=incremental
+        ):
+            media_files = []
+            if self.media is not None:
+                media_files = self.media.prepare(self._notes.values())
+            if incremental:
+                write_incremental_package(
+                    self.deck, self.apkg_path, self.build_cache_path, media_files
+                )
+            else:
+                genanki.Package(self.deck, media_files=media_files).write_to_file(
+                    self.apkg_path
+                )
 
 
 # Example usage:
@@ -1,41 +1,136 @@
-"""Module for working with SQLite database for storing Anki cards using SQLAlchemy."""
+"""Module for working with SQLite database for storing Anki cards.
 
-from typing import List, Optional
+Persistence is delegated to a pluggable storage backend: the SQLAlchemy ORM
+backend (`"sqlalchemy"`, the default) or the lightweight stdlib backend
+(`"sqlite3"`). Backends are imported only when selected, so the `sqlite3`
+backend never pays for importing SQLAlchemy.
 
-from sqlalchemy import Column, Integer, String, Text, create_engine
-from sqlalchemy.orm import Session, declarative_base, sessionmaker
+Long ingestion jobs can stream notes into the database through a `NoteSink`,
+which commits them in micro-batches and can resume from a checkpoint.
 
-# Base class for SQLAlchemy models
-Base = declarative_base()
+Words can be looked up exactly or by prefix of their normalized form, and in
+reverse by translation, through indexes on the `notes` table. The example
+sentences are searchable through an FTS5 index that triggers keep in sync.
+"""
 
+import os
+from importlib import import_module
+from itertools import islice
+from typing import (
+    Any,
+    AsyncIterable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Union,
+)
 
-class NoteModel(Base):
-    """SQLAlchemy model representing a note in the German vocabulary deck."""
+from anki import instrumentation
+from anki.normalize import lemma_key, normalize_word
+from anki.storage import (
+    LOOKUP_LIMIT,
+    NoteRecord,
+    NoteRow,
+    NoteStorage,
+    match_query,
+    note_row,
+)
 
-    __tablename__ = "notes"
+# Backend name -> (module, class) implementing `NoteStorage`
+BACKENDS = {
+    "sqlalchemy": ("anki.sqlalchemy_backend", "SQLAlchemyBackend"),
+    "sqlite3": ("anki.sqlite_backend", "SQLiteBackend"),
+}
 
-    id: int = Column(Integer, primary_key=True)
-    german_word: str = Column(String, nullable=False)
-    translation: str = Column(String, nullable=False)
-    german_sentence: str = Column(Text, nullable=False)
-    english_sentence: str = Column(Text, nullable=False)
-    other_forms: Optional[str] = Column(String, nullable=True)
+
+def __getattr__(name: str) -> Any:
+    """Lazily expose the SQLAlchemy models without importing SQLAlchemy up front."""
+    if name in ("Base", "NoteModel"):
+        return getattr(import_module("anki.sqlalchemy_backend"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class NoteSink:
+    """Buffer of notes committed to the database in micro-batches.
+
+    Every micro-batch is upserted in its own transaction, so a crash loses at
+    most the notes of the current batch. With a checkpoint name, the number of
+    notes committed so far is saved in the same transaction as each batch; a
+    new sink with the same name starts at that `position`, so a producer that
+    yields the same notes again can skip the ones already stored.
+    """
+
+    def __init__(
+        self,
+        db: "GermanDeckDatabase",
+        batch_size: int = 100,
+        checkpoint: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the sink.
+
+        Args:
+            db (GermanDeckDatabase): The database the notes are written to.
+            batch_size (int): Number of notes committed per transaction.
+            checkpoint (Optional[str]): Name of the checkpoint to resume from and
+                save to, if the write should be resumable.
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.position = db.backend.get_checkpoint(checkpoint) if checkpoint else 0
+        self._buffer: List[NoteRow] = []
+
+    def write(self, note: NoteRow) -> None:
+        """Add a note, committing the buffered batch once it is full."""
+        self._buffer.append(note_row(note))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit the buffered notes, together with the checkpoint if any."""
+        if not self._buffer:
+            return
+        position = self.position + len(self._buffer)
+        checkpoint = (self.checkpoint, position) if self.checkpoint else None
+        with instrumentation.span("db.flush", records=len(self._buffer)):
+            self.db.backend.add_notes(self._buffer, checkpoint=checkpoint)
+        self.position = position
+        self._buffer = []
+
+    def finish(self) -> None:
+        """Commit the remaining notes and delete the finished job's checkpoint."""
+        self.flush()
+        if self.checkpoint:
+            self.db.backend.clear_checkpoint(self.checkpoint)
 
 
 class GermanDeckDatabase:
     """Class for managing the SQLite database containing the German vocabulary deck."""
 
-    def __init__(self, db_file: str) -> None:
+    def __init__(
+        self, db_file: Union[str, os.PathLike], backend: str = "sqlalchemy"
+    ) -> None:
         """
         Initialize the GermanDeckDatabase with the given SQLite database file.
 
         Args:
-            db_file (str): The SQLite database file path.
+            db_file (Union[str, os.PathLike]): The SQLite database file path.
+            backend (str): The storage backend to use, one of `BACKENDS`.
         """
-        self.engine = create_engine(f"sqlite:///{db_file}")
-        Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown backend {backend!r}, expected one of {sorted(BACKENDS)}"
+            )
+        module_name, class_name = BACKENDS[backend]
+        self.backend: NoteStorage = getattr(import_module(module_name), class_name)(
+            os.fspath(db_file)
+        )
 
+    @instrumentation.instrumented("db.add_note")
     def add_note(
         self,
         german_word: str,
@@ -45,7 +140,7 @@ class GermanDeckDatabase:
         other_forms: Optional[str] = None,
     ) -> None:
         """
-        Add a new note to the database.
+        Add a note to the database, or update the stored note for the same word.
 
         Args:
             german_word (str): The German word to add.
@@ -54,29 +149,245 @@ class GermanDeckDatabase:
             english_sentence (str): The English translation of the German sentence.
             other_forms (Optional[str]): Other forms of the German word, if any.
         """
-        session: Session = self.Session()
-        new_note = NoteModel(
-            german_word=german_word,
-            translation=translation,
-            german_sentence=german_sentence,
-            english_sentence=english_sentence,
-            other_forms=other_forms,
+        self.add_notes(
+            [
+                {
+                    "german_word": german_word,
+                    "translation": translation,
+                    "german_sentence": german_sentence,
+                    "english_sentence": english_sentence,
+                    "other_forms": other_forms,
+                }
+            ]
         )
-        session.add(new_note)
-        session.commit()
-        session.close()
 
-    def load_notes(self) -> List[NoteModel]:
+    def add_notes(
+        self, notes: Iterable[NoteRow], chunk_size: int = 1000, bulk: bool = False
+    ) -> int:
+        """
+        Upsert many notes into the database in a single transaction.
+
+        Notes are matched on their normalized German word. New words are inserted,
+        stored words whose content changed are updated, and unchanged ones are
+        skipped without a write. Rows are streamed from `notes` and sent to the
+        database in chunks of `chunk_size` using executemany-style statements, so
+        the whole batch costs one commit. If any chunk fails, nothing is stored.
+
+        Args:
+            notes (Iterable[NoteRow]): Note rows keyed by column name (`german_word`,
+                `translation`, `german_sentence`, `english_sentence` and, optionally,
+                `other_forms`).
+            chunk_size (int): Number of rows sent per executemany call.
+            bulk (bool): Update the sentence search index once per chunk instead
+                of once per row, about twice as fast for large imports with the
+                `sqlite3` backend, which changes the schema for the duration of
+                the transaction.
+
+        Returns:
+            int: The number of notes inserted or updated.
+        """
+        with instrumentation.span("db.add_notes") as span:
+            span["records"] = self.backend.add_notes(
+                map(note_row, notes), chunk_size, bulk=bulk
+            )
+        return span["records"]
+
+    @instrumentation.instrumented("db.write_notes")
+    def write_notes(
+        self,
+        notes: Iterable[NoteRow],
+        batch_size: int = 100,
+        checkpoint: Optional[str] = None,
+    ) -> int:
+        """
+        Stream notes into the database, committing every `batch_size` notes.
+
+        Unlike `add_notes`, which stores all notes in one transaction, this keeps
+        only one micro-batch in memory and commits notes as they arrive, so a
+        failure loses at most one batch. With a `checkpoint`, the notes committed
+        by an earlier, interrupted call with the same name are skipped from the
+        start of `notes`, and the checkpoint is deleted once all notes are stored.
+
+        Args:
+            notes (Iterable[NoteRow]): Note rows keyed by column name, see
+                `add_notes`.
+            batch_size (int): Number of notes committed per transaction.
+            checkpoint (Optional[str]): Name under which progress is saved.
+
+        Returns:
+            int: The number of notes written by this call.
+        """
+        sink = NoteSink(self, batch_size, checkpoint)
+        start = sink.position
+        for note in islice(notes, start, None):
+            sink.write(note)
+        sink.finish()
+        return sink.position - start
+
+    @instrumentation.instrumented("db.awrite_notes")
+    async def awrite_notes(
+        self,
+        notes: AsyncIterable[NoteRow],
+        batch_size: int = 100,
+        checkpoint: Optional[str] = None,
+    ) -> int:
+        """
+        Stream notes from an async iterator into the database.
+
+        The async counterpart of `write_notes`, for notes produced while LLM
+        results arrive. Each micro-batch is committed synchronously, which
+        blocks the event loop only for the duration of one small transaction.
+
+        Args:
+            notes (AsyncIterable[NoteRow]): Note rows keyed by column name.
+            batch_size (int): Number of notes committed per transaction.
+            checkpoint (Optional[str]): Name under which progress is saved.
+
+        Returns:
+            int: The number of notes written by this call.
+        """
+        sink = NoteSink(self, batch_size, checkpoint)
+        start = skip = sink.position
+        async for note in notes:
+            if skip:
+                skip -= 1
+                continue
+            sink.write(note)
+        sink.finish()
+        return sink.position - start
+
+    def iter_notes(self, batch_size: int = 1000) -> Iterator[NoteRecord]:
+        """
+        Stream all notes from the database in insertion order.
+
+        Rows are plain named tuples of the note fields (`german_word`, `translation`,
+        `german_sentence`, `english_sentence`, `other_forms`) rather than ORM
+        instances, and are fetched from the cursor `batch_size` at a time, so memory
+        stays bounded by the batch size instead of the table size.
+
+        Args:
+            batch_size (int): Number of rows fetched from the cursor at a time.
+
+        Yields:
+            NoteRecord: The next note in the database.
+        """
+        return self.backend.iter_notes(batch_size)
+
+    @instrumentation.instrumented("db.load_notes")
+    def load_notes(self) -> List[Any]:
         """
         Load all notes from the database.
 
         Returns:
-            List[NoteModel]: A list of all notes in the database.
+            List[Any]: A list of all notes in the database, exposing every column of
+                the `notes` table as an attribute.
+        """
+        return self.backend.load_notes()
+
+    @instrumentation.instrumented("db.count_notes")
+    def count_notes(self) -> int:
+        """
+        Count the notes stored in the database.
+
+        Returns:
+            int: The number of stored notes.
+        """
+        return self.backend.count_notes()
+
+    @instrumentation.instrumented("db.known_words")
+    def known_words(self, words: Iterable[str]) -> Set[str]:
+        """
+        Return the given words that already have a note in the database.
+
+        Words are matched on their lemma key (see `anki.normalize.lemma_key`), so
+        differences in article, case, punctuation or umlaut spelling are ignored.
+        The lookup uses the index on the `lemma_key` column.
+
+        Args:
+            words (Iterable[str]): The German words or phrases to check.
+
+        Returns:
+            Set[str]: The input words that are already stored.
+        """
+        words_by_key: Dict[str, List[str]] = {}
+        for word in words:
+            words_by_key.setdefault(lemma_key(word), []).append(word)
+        return {
+            word
+            for key in self.backend.find_lemma_keys(words_by_key)
+            for word in words_by_key[key]
+        }
+
+    @instrumentation.instrumented("db.find_word")
+    def find_word(self, word: str) -> Optional[Any]:
+        """
+        Find the note of a German word, using the unique index on `note_key`.
+
+        Args:
+            word (str): The German word or phrase, normalized with
+                `anki.normalize.normalize_word` before the lookup.
+
+        Returns:
+            Optional[Any]: The stored note, or None if the word has no note.
+        """
+        return self.backend.find_by_key(normalize_word(word))
+
+    @instrumentation.instrumented("db.find_prefix")
+    def find_prefix(self, prefix: str, limit: int = LOOKUP_LIMIT) -> List[Any]:
+        """
+        Find the notes whose normalized German word starts with a prefix.
+
+        The prefix is normalized like the words, so "Der Hu" finds "der Hund".
+        The lookup is a range scan on the index on `note_key`.
+
+        Args:
+            prefix (str): The start of the German word or phrase.
+            limit (int): Maximum number of notes returned.
+
+        Returns:
+            List[Any]: The matching notes, ordered by their normalized word.
+        """
+        return self.backend.find_by_key_prefix(normalize_word(prefix), limit)
+
+    @instrumentation.instrumented("db.find_translation")
+    def find_translation(
+        self, translation: str, limit: int = LOOKUP_LIMIT
+    ) -> List[Any]:
         """
-        session: Session = self.Session()
-        notes: List[NoteModel] = session.query(NoteModel).all()
-        session.close()
-        return notes
+        Find the notes with an English translation, ignoring ASCII case.
+
+        Args:
+            translation (str): The exact English translation, e.g. "the dog".
+            limit (int): Maximum number of notes returned.
+
+        Returns:
+            List[Any]: The matching notes, in insertion order.
+        """
+        return self.backend.find_by_translation(translation.strip(), limit)
+
+    @instrumentation.instrumented("db.search_sentences")
+    def search_sentences(self, text: str, limit: int = LOOKUP_LIMIT) -> List[Any]:
+        """
+        Search the German and English example sentences for all words of a text.
+
+        The search uses the FTS5 index over the sentences, which ignores case
+        and diacritics, so "Kuche" also finds "Küche".
+
+        Args:
+            text (str): The words to search for.
+            limit (int): Maximum number of notes returned.
+
+        Returns:
+            List[Any]: The matching notes, in insertion order.
+        """
+        query = match_query(text)
+        if not query:
+            return []
+        return self.backend.search_sentences(query, limit)
+
+    def close(self) -> None:
+        """Close the database connections."""
+        self.backend.close()
 
 
 # Example usage:
@@ -4,7 +4,7 @@ import genanki
 
 
 class GermanModel(genanki.Model):
-    def __init__(self, model_id):
+    def __init__(self, model_id, media=False):
         # Predefined values for name, fields, and templates
         name = "German Vocabulary Model"
         fields = [
@@ -26,6 +26,20 @@ class GermanModel(genanki.Model):
                 "afmt": '{{FrontSide}}<hr id="answer">{{German Word}}<br><br>{{German Sentence}}<br><br><b>Other forms:</b> {{Other Forms}}',
             },
         ]
+        if media:
+            # Pronunciation plays with the German word, the image shows the meaning.
+            # A model with other fields needs its own model ID.
+            name = "German Vocabulary Model with Media"
+            fields += [{"name": "Audio"}, {"name": "Image"}]
+            card_1, card_2 = templates
+            card_1["qfmt"] = card_1["qfmt"].replace(
+                "{{German Word}}", "{{German Word}} {{Audio}}", 1
+            )
+            card_1["afmt"] += "<br><br>{{Image}}"
+            card_2["qfmt"] = "{{Image}}<br><br>" + card_2["qfmt"]
+            card_2["afmt"] = card_2["afmt"].replace(
+                "{{German Word}}", "{{German Word}} {{Audio}}", 1
+            )
 
         # Initialize the parent class (genanki.Model) with these values
         super().__init__(
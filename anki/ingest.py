@@ -0,0 +1,240 @@
+"""Module for streaming large vocabulary inputs into the pipeline.
+
+Reading a whole input file, deduplicating it with a `set` and joining it back
+into one string holds several copies of the input in memory before any work
+starts. Here the input flows through in constant memory instead:
+
+- `read_lines` reads input files lazily, line by line, and normalizes them;
+- `SpillingSet` remembers the lines seen so far in a bounded in-memory set
+  that spills to a temporary SQLite table when full;
+- `iter_new_batches` drops repeated lines and lines with a stored note, and
+  yields the new ones in batches, ready for `BatchRunner.astream`, which
+  starts chunks as the input arrives.
+
+Multi-GB chat exports then only cost the bounded set and one batch of memory,
+plus the temporary table on disk.
+"""
+
+import hashlib
+import sqlite3
+import sys
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Sequence, Set
+
+from anki.normalize import lemma_key
+from anki.prefilter import KnownWordIndex
+from anki.storage import LOOKUP_CHUNK_SIZE, chunked
+
+# Keys held in memory before a `SpillingSet` moves them to its SQLite table
+MAX_MEMORY_KEYS = 100_000
+
+# Lines whose lemma key `iter_new_batches` keeps cached
+LEMMA_CACHE_SIZE = 1 << 14
+
+
+def normalize_line(line: str) -> str:
+    """NFC-normalize a line and collapse its whitespace, keeping its case."""
+    return " ".join(unicodedata.normalize("NFC", line).split())
+
+
+def read_lines(paths: Iterable[str], encoding: str = "utf-8") -> Iterator[str]:
+    """Lazily read the non-empty, normalized lines of input files.
+
+    Args:
+        paths (Iterable[str]): The input files; "-" reads stdin.
+        encoding (str): The file encoding. Undecodable bytes are replaced, so
+            one broken line does not stop a large import.
+
+    Yields:
+        str: The next non-empty line, see `normalize_line`.
+    """
+    for path in paths:
+        if path == "-":
+            file = sys.stdin
+        else:
+            file = open(path, encoding=encoding, errors="replace")
+        try:
+            for raw_line in file:
+                line = normalize_line(raw_line)
+                if line:
+                    yield line
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+
+class SpillingSet:
+    """Set of strings with bounded memory, spilling to a temporary SQLite table.
+
+    Strings are stored as 128-bit hashes. About `max_memory_keys` of them are
+    kept in a Python set; when it is full, they are moved to a table in a
+    temporary SQLite database, which SQLite keeps on disk and deletes on close.
+    The strings added together with `add_many` are looked up in the table with
+    one query, and spilled keys found again are kept in memory until the next
+    spill, so frequent strings are mostly answered without a query.
+    """
+
+    def __init__(self, max_memory_keys: int = MAX_MEMORY_KEYS) -> None:
+        """
+        Initialize an empty set.
+
+        Args:
+            max_memory_keys (int): Maximum number of keys held in memory.
+        """
+        self.max_memory_keys = max_memory_keys
+        # Keys not spilled yet, and spilled keys found again since the last spill
+        self._memory: Set[bytes] = set()
+        self._hot: Set[bytes] = set()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._spill_count = 0
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def _spilled(self, digests: Iterable[bytes]) -> Set[bytes]:
+        """Return the digests found in the SQLite table."""
+        if self._connection is None:
+            return set()
+        found: Set[bytes] = set()
+        for chunk in chunked(digests, LOOKUP_CHUNK_SIZE):
+            placeholders = ", ".join("?" * len(chunk))
+            found.update(
+                row[0]
+                for row in self._connection.execute(
+                    f"SELECT key FROM seen WHERE key IN ({placeholders})", chunk
+                )
+            )
+        return found
+
+    def __contains__(self, key: str) -> bool:
+        digest = self._digest(key)
+        return (
+            digest in self._memory
+            or digest in self._hot
+            or bool(self._spilled([digest]))
+        )
+
+    def __len__(self) -> int:
+        return len(self._memory) + self._spill_count
+
+    def add(self, key: str) -> bool:
+        """Add a string to the set.
+
+        Returns:
+            bool: Whether the string was new.
+        """
+        return self.add_many([key])[0]
+
+    def add_many(self, keys: Sequence[str]) -> List[bool]:
+        """Add strings to the set, looking up spilled ones in a single query.
+
+        Args:
+            keys (Sequence[str]): The strings, which may repeat.
+
+        Returns:
+            List[bool]: Whether each string was new, i.e. not in the set and
+            not earlier in `keys`.
+        """
+        memory, hot = self._memory, self._hot
+        digests = [self._digest(key) for key in keys]
+        spilled = self._spilled(
+            {digest for digest in digests if digest not in memory and digest not in hot}
+        )
+        hot.update(spilled)
+        added = []
+        for digest in digests:
+            new = digest not in memory and digest not in hot
+            if new:
+                memory.add(digest)
+            added.append(new)
+        if len(memory) + len(hot) >= self.max_memory_keys:
+            self._spill()
+        return added
+
+    def _spill(self) -> None:
+        """Move the keys held in memory to the SQLite table."""
+        if self._connection is None:
+            # An empty file name opens a temporary database on disk
+            self._connection = sqlite3.connect("")
+            self._connection.execute(
+                "CREATE TABLE seen (key BLOB PRIMARY KEY) WITHOUT ROWID"
+            )
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO seen VALUES (?)", ((digest,) for digest in self._memory)
+            )
+        self._spill_count += len(self._memory)
+        self._memory.clear()
+        self._hot.clear()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+@dataclass
+class IngestStats:
+    """Line counts of an `iter_new_batches` run."""
+
+    lines: int = 0
+    repeated: int = 0
+    known: int = 0
+    new: int = 0
+
+
+def iter_new_batches(
+    lines: Iterable[str],
+    db: Optional[KnownWordIndex] = None,
+    batch_size: int = 1000,
+    seen: Optional[SpillingSet] = None,
+    stats: Optional[IngestStats] = None,
+) -> Iterator[List[str]]:
+    """Yield the lines that are neither repeated nor stored yet, in batches.
+
+    Lines are compared by `anki.normalize.lemma_key`, like `filter_new_words`,
+    and each block of input lines is checked against the lines seen so far
+    and against the database with one query each.
+
+    Args:
+        lines (Iterable[str]): The input lines, e.g. from `read_lines`.
+        db (Optional[KnownWordIndex]): The database of known words, or another
+            index like a `GermanDeck`; without it, only repeated lines are
+            dropped.
+        batch_size (int): Number of input lines deduplicated and checked at once,
+            so also the maximum size of a yielded batch.
+        seen (Optional[SpillingSet]): The set of lemma keys seen so far, e.g.
+            shared by several inputs; by default a new one.
+        stats (Optional[IngestStats]): Counters updated as lines are read.
+
+    Yields:
+        List[str]: The next non-empty batch of new lines, in input order.
+    """
+    stats = stats if stats is not None else IngestStats()
+    # Frequent lines, e.g. common words in chat exports, are keyed only once
+    line_key = lru_cache(maxsize=LEMMA_CACHE_SIZE)(lemma_key)
+    own_seen = seen is None
+    seen = SpillingSet() if seen is None else seen
+
+    def new_lines(batch: List[str]) -> List[str]:
+        known = db.known_words(batch) if db is not None else set()
+        stats.known += len(known)
+        new = [line for line in batch if line not in known]
+        stats.new += len(new)
+        return new
+
+    try:
+        for block in chunked(lines, batch_size):
+            stats.lines += len(block)
+            added = seen.add_many([line_key(line) for line in block])
+            unique = [line for line, new in zip(block, added) if new]
+            stats.repeated += len(block) - len(unique)
+            new = new_lines(unique) if unique else []
+            if new:
+                yield new
+    finally:
+        if own_seen:
+            seen.close()
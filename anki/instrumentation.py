@@ -0,0 +1,258 @@
+"""Module with opt-in timers, counters and spans for the hot paths.
+
+Instrumentation is off by default, and an instrumented function or `span`
+block then costs a single global lookup. Inside `recording()` (or after
+`enable`) a `Recorder` is active: it times every span, aggregates durations
+and numeric span attributes (such as `records` or `prompt_tokens`) by span
+name, sums counters, and hands each finished `Span` to its sinks, e.g. a
+`JsonLinesSink` or a callback forwarding spans to a tracer.
+
+`Recorder.summary()` returns the totals as a JSON-serializable dict, so the
+time spent in LLM calls, parsing, database commits and packaging can be
+compared across runs without a profiler attached.
+"""
+
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    TypeVar,
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class Span:
+    """A timed operation with the attributes it reported."""
+
+    name: str
+    # Wall-clock start, in seconds since the epoch
+    start: float
+    duration: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    # Exception type name if the operation failed
+    error: Optional[str] = None
+
+
+Sink = Callable[[Span], None]
+
+
+@dataclass
+class TimerStats:
+    """Aggregated durations and numeric attributes of the spans of one name."""
+
+    count: int = 0
+    errors: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    sums: Dict[str, float] = field(default_factory=dict)
+
+    def add(self, span: Span) -> None:
+        self.count += 1
+        self.errors += span.error is not None
+        self.total += span.duration
+        self.max = max(self.max, span.duration)
+        for key, value in span.attributes.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.sums[key] = self.sums.get(key, 0) + value
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "count": self.count,
+            "errors": self.errors,
+            "total_s": round(self.total, 6),
+            "mean_s": round(self.total / self.count, 6) if self.count else 0.0,
+            "max_s": round(self.max, 6),
+            **self.sums,
+        }
+        if "records" in self.sums and self.total:
+            stats["records_per_s"] = round(self.sums["records"] / self.total, 2)
+        return stats
+
+
+class Recorder:
+    """Collects spans and counters of one run."""
+
+    def __init__(self, sinks: Iterable[Sink] = ()) -> None:
+        """
+        Initialize the recorder.
+
+        Args:
+            sinks (Iterable[Sink]): Callbacks receiving every finished span.
+        """
+        self.sinks = list(sinks)
+        self.timers: Dict[str, TimerStats] = {}
+        self.counters: Dict[str, float] = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """Time the enclosed block as a span.
+
+        Args:
+            name (str): The span name, e.g. "db.add_notes".
+            **attributes: Initial span attributes.
+
+        Yields:
+            Dict[str, Any]: The span attributes, which the block may update,
+                e.g. with the number of `records` it processed.
+        """
+        start, started = time.time(), time.perf_counter()
+        error = None
+        try:
+            yield attributes
+        except BaseException as exception:
+            error = type(exception).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            self.record(Span(name, start, duration, attributes, error))
+
+    def record(self, span: Span) -> None:
+        """Aggregate a finished span and pass it to the sinks."""
+        with self._lock:
+            self.timers.setdefault(span.name, TimerStats()).add(span)
+        for sink in self.sinks:
+            sink(span)
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Add a value to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the run totals as a JSON-serializable dict.
+
+        Returns:
+            Dict[str, Any]: The wall time of the run, the aggregated spans by
+                name (count, errors, total, mean and max seconds, summed
+                numeric attributes and `records_per_s`) and the counters.
+        """
+        with self._lock:
+            return {
+                "wall_s": round(time.perf_counter() - self.started, 6),
+                "spans": {
+                    name: stats.as_dict() for name, stats in sorted(self.timers.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def write_json(self, path: str) -> None:
+        """Write the run summary to a JSON file."""
+        Path(path).write_text(json.dumps(self.summary(), indent=2) + "\n")
+
+
+class JsonLinesSink:
+    """Span sink appending every span as one JSON object per line to a file."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize the sink.
+
+        Args:
+            path (str): The file the spans are appended to.
+        """
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, span: Span) -> None:
+        self.file.write(json.dumps(asdict(span), default=str) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+# The recorder of the current run, None while instrumentation is off
+_recorder: Optional[Recorder] = None
+
+
+def active() -> Optional[Recorder]:
+    """Return the active recorder, or None while instrumentation is off."""
+    return _recorder
+
+
+def enable(recorder: Optional[Recorder] = None) -> Recorder:
+    """Turn instrumentation on, with a new recorder by default."""
+    global _recorder
+    _recorder = recorder or Recorder()
+    return _recorder
+
+
+def disable() -> None:
+    """Turn instrumentation off."""
+    global _recorder
+    _recorder = None
+
+
+@contextmanager
+def recording(*sinks: Sink) -> Iterator[Recorder]:
+    """Record the spans and counters of the enclosed block.
+
+    Args:
+        *sinks (Sink): Callbacks receiving every finished span.
+
+    Yields:
+        Recorder: The active recorder.
+    """
+    previous = _recorder
+    recorder = enable(Recorder(sinks))
+    try:
+        yield recorder
+    finally:
+        if previous is None:
+            disable()
+        else:
+            enable(previous)
+
+
+def span(name: str, **attributes: Any) -> ContextManager[Dict[str, Any]]:
+    """Time the enclosed block if instrumentation is on, see `Recorder.span`."""
+    if _recorder is None:
+        return nullcontext(attributes)
+    return _recorder.span(name, **attributes)
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add a value to a counter if instrumentation is on."""
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+def instrumented(name: str) -> Callable[[F], F]:
+    """Decorate a function or coroutine function to run in a span of that name."""
+
+    def decorator(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if _recorder is None:
+                    return await func(*args, **kwargs)
+                with _recorder.span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with _recorder.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
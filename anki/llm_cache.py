@@ -0,0 +1,160 @@
+"""Module with a persistent on-disk response cache for the LLM chain.
+
+`ResponseCache` implements the LangChain cache interface, so it plugs into any
+chat model used with the `anki.templates` prompts, either per model
+(`ChatOpenAI(..., cache=ResponseCache(path))`) or globally through
+`langchain.globals.set_llm_cache`. Entries are keyed by the LLM configuration
+(model name, temperature and the other invocation parameters) and the rendered
+prompt, which carries the template text and the normalized input. The cache is
+stored in SQLite and evicts the least recently used entries beyond its limits.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+# Runs of whitespace, including whitespace escaped inside serialized messages
+_WHITESPACE_RE = re.compile(r"(?:\\[nrt]|\s)+")
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+CREATE_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)"
+)
+
+
+@dataclass
+class CacheStats:
+    """Hit and miss counters of a `ResponseCache` since it was opened."""
+
+    hits: int = 0
+    misses: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the stats as a JSON-serializable dict."""
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Return the cache key for a rendered prompt and an LLM configuration.
+
+    Whitespace in the prompt is collapsed, so formatting-only differences in the
+    input map to the same entry.
+    """
+    normalized_prompt = _WHITESPACE_RE.sub(" ", prompt).strip()
+    payload = f"{llm_string}\x00{normalized_prompt}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(BaseCache):
+    """SQLite-backed LLM response cache with LRU eviction and hit/miss stats."""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_entries: Optional[int] = 100_000,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the cache stored in the given SQLite file.
+
+        Args:
+            path (Union[str, Path]): The SQLite file holding the cache.
+            max_entries (Optional[int]): Maximum number of cached responses.
+            max_bytes (Optional[int]): Maximum total size of cached responses.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(path), check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute(CREATE_TABLE_SQL)
+        self._connection.execute(CREATE_INDEX_SQL)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._connection.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = dumps(list(return_val))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (cache_key(prompt, llm_string), value, len(value), time.time()),
+            )
+            self._evict()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._hits = self._misses = 0
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries until the cache is within limits."""
+        entries, size = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        excess_entries = entries - self.max_entries if self.max_entries else 0
+        excess_bytes = size - self.max_bytes if self.max_bytes else 0
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return
+
+        stale = []
+        for key, entry_size in self._connection.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ):
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            stale.append((key,))
+            excess_entries -= 1
+            excess_bytes -= entry_size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def stats(self) -> CacheStats:
+        """Return the hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return CacheStats(self._hits, self._misses, entries, size)
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        self._connection.close()
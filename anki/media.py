@@ -0,0 +1,339 @@
+"""Module for generating and storing the audio and image files of notes.
+
+A `MediaGenerator` creates one media file from a text, e.g. pronunciation
+audio for a German word. Generators are pluggable: `EspeakGenerator` runs the
+offline espeak-ng text-to-speech engine, while `StubAudioGenerator` and
+`SvgTextGenerator` create small deterministic files without any dependency,
+for tests and dry runs.
+
+`MediaStore` keeps the generated files content-addressed on disk: each file
+is named after the SHA-256 hash of its bytes, so identical files generated
+for different notes or decks are stored, and packaged, once. A SQLite index
+maps each generator and input text to its file, so a file is only generated
+again when the text it was generated from changes.
+
+`NoteMedia` ties generators to the fields of deck notes. A `GermanDeck`
+created with one uses the `GermanModel` with its Audio and Image fields and
+passes just the files its notes reference to the package, which genanki
+streams from disk into the .apkg zip.
+"""
+
+import array
+import hashlib
+import math
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import wave
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+
+from anki import instrumentation
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS media (
+    key TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL
+)
+"""
+
+# Size of the blocks in which generated files are hashed
+HASH_BLOCK_SIZE = 1 << 16
+
+
+class MediaGenerator(ABC):
+    """Creates a media file from a text, e.g. pronunciation audio for a word."""
+
+    # Identifies the generator in the media index
+    name: str = ""
+    # File extension of the generated files, e.g. ".wav"
+    extension: str = ""
+    # Changing the version regenerates all files of the generator
+    version: str = "1"
+
+    @abstractmethod
+    def generate(self, text: str, path: Path) -> None:
+        """Write the media file for a text.
+
+        Args:
+            text (str): The text, e.g. a German word.
+            path (Path): The file to write, with the generator's extension.
+        """
+
+
+class StubAudioGenerator(MediaGenerator):
+    """Generates a short sine tone whose pitch depends on the text."""
+
+    name = "stub-audio"
+    extension = ".wav"
+
+    def __init__(self, duration: float = 0.3, sample_rate: int = 8000) -> None:
+        """
+        Initialize the generator.
+
+        Args:
+            duration (float): Length of the tone in seconds.
+            sample_rate (int): Samples per second of the 16-bit mono audio.
+        """
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.version = f"{duration}/{sample_rate}"
+
+    def generate(self, text: str, path: Path) -> None:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        frequency = 220 + int.from_bytes(digest[:2], "big") % 660
+        step = 2 * math.pi * frequency / self.sample_rate
+        samples = array.array(
+            "h",
+            (
+                int(8000 * math.sin(i * step))
+                for i in range(int(self.duration * self.sample_rate))
+            ),
+        )
+        with wave.open(str(path), "wb") as audio:
+            audio.setnchannels(1)
+            audio.setsampwidth(2)
+            audio.setframerate(self.sample_rate)
+            audio.writeframes(samples.tobytes())
+
+
+class SvgTextGenerator(MediaGenerator):
+    """Generates an SVG image showing the text on a plain card."""
+
+    name = "svg-text"
+    extension = ".svg"
+
+    def generate(self, text: str, path: Path) -> None:
+        path.write_text(
+            '<svg xmlns="http://www.w3.org/2000/svg" width="320" height="120">'
+            '<rect width="100%" height="100%" rx="12" fill="#f4f1e8"/>'
+            '<text x="50%" y="50%" dominant-baseline="middle" text-anchor="middle" '
+            f'font-family="sans-serif" font-size="28">{escape(text)}</text></svg>\n',
+            encoding="utf-8",
+        )
+
+
+class EspeakGenerator(MediaGenerator):
+    """Generates pronunciation audio with the offline espeak-ng engine."""
+
+    name = "espeak"
+    extension = ".wav"
+
+    def __init__(self, voice: str = "de", command: str = "espeak-ng") -> None:
+        """
+        Initialize the generator.
+
+        Args:
+            voice (str): The espeak-ng voice, German by default.
+            command (str): The espeak-ng executable.
+        """
+        executable = shutil.which(command)
+        if executable is None:
+            raise RuntimeError(f"{command} not found; install espeak-ng to use it")
+        self.command = executable
+        self.voice = voice
+        self.version = voice
+
+    def generate(self, text: str, path: Path) -> None:
+        subprocess.run(
+            [self.command, "-v", self.voice, "-w", str(path), text],
+            check=True,
+            capture_output=True,
+        )
+
+
+def media_key(generator: MediaGenerator, text: str) -> str:
+    """Return the index key of the file a generator creates for a text."""
+    payload = f"{generator.name}\x1f{generator.version}\x1f{text}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 hash of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class MediaStats:
+    """Counters of a `MediaStore` since it was opened."""
+
+    # Files found in the index
+    reused: int = 0
+    # Files generated because their text was not in the index
+    generated: int = 0
+    # Generated files identical to a stored file
+    deduplicated: int = 0
+
+
+class MediaStore:
+    """Content-addressed store of generated media files with a SQLite index."""
+
+    def __init__(self, root: Union[str, Path]) -> None:
+        """
+        Initialize the store in a directory.
+
+        Args:
+            root (Union[str, Path]): The directory holding the files and index.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._root = str(self.root)
+        self.stats = MediaStats()
+        self._connection = sqlite3.connect(
+            str(self.root / "index.db"), isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute(CREATE_TABLE_SQL)
+
+    def path(self, file_name: str) -> Path:
+        """Return the path of a stored file, sharded by the first hash digits."""
+        return Path(self._root, file_name[:2], file_name)
+
+    def lookup(self, generator: MediaGenerator, text: str) -> Optional[str]:
+        """Return the name of the file indexed for a generator and text, if any."""
+        row = self._connection.execute(
+            "SELECT file_name FROM media WHERE key = ?", (media_key(generator, text),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def file_name(self, generator: MediaGenerator, text: str) -> str:
+        """Return the name of the file a generator creates for a text.
+
+        The file is generated unless the index has a file for the generator and
+        text that is still on disk.
+
+        Args:
+            generator (MediaGenerator): The generator.
+            text (str): The input text.
+
+        Returns:
+            str: The file name, the hash of the file content and the extension.
+        """
+        file_name = self.lookup(generator, text)
+        # Plain string paths, as this runs for every note of an export
+        if file_name is not None and os.path.exists(
+            os.path.join(self._root, file_name[:2], file_name)
+        ):
+            self.stats.reused += 1
+            return file_name
+
+        with instrumentation.span("media.generate", generator=generator.name):
+            file_name = self._generate(generator, text).name
+        self._connection.execute(
+            "INSERT OR REPLACE INTO media VALUES (?, ?)",
+            (media_key(generator, text), file_name),
+        )
+        self.stats.generated += 1
+        return file_name
+
+    def get(self, generator: MediaGenerator, text: str) -> Path:
+        """Return the path of the file a generator creates for a text, see `file_name`."""
+        return self.path(self.file_name(generator, text))
+
+    def _generate(self, generator: MediaGenerator, text: str) -> Path:
+        """Generate a file into a temporary path and move it to its content address."""
+        handle, tmp_name = tempfile.mkstemp(suffix=generator.extension, dir=self.root)
+        os.close(handle)
+        tmp_path = Path(tmp_name)
+        try:
+            generator.generate(text, tmp_path)
+            path = self.path(file_digest(tmp_path) + generator.extension)
+            if path.exists():
+                self.stats.deduplicated += 1
+            else:
+                path.parent.mkdir(exist_ok=True)
+                os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return path
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class NoteMedia:
+    """Generates the Audio and Image fields of notes into a `MediaStore`.
+
+    Audio is generated from the German word and images from the translation.
+    """
+
+    def __init__(
+        self,
+        store: MediaStore,
+        audio: Optional[MediaGenerator] = None,
+        image: Optional[MediaGenerator] = None,
+    ) -> None:
+        """
+        Initialize the note media.
+
+        Args:
+            store (MediaStore): The store the files are kept in.
+            audio (Optional[MediaGenerator]): Generator of the pronunciation audio.
+            image (Optional[MediaGenerator]): Generator of the images.
+        """
+        self.store = store
+        self.audio = audio
+        self.image = image
+
+    def _inputs(self, note: Any) -> Iterator[Tuple[MediaGenerator, str]]:
+        """Yield the generator and input text of each media field of a note."""
+        for generator, text in (
+            (self.audio, note.german_word),
+            (self.image, note.translation),
+        ):
+            if generator is not None and text:
+                yield generator, text
+
+    def fields(self, note: Any) -> List[str]:
+        """Return the Audio and Image field values of a note.
+
+        Files generated by `prepare` are only looked up in the index.
+
+        Args:
+            note (Any): A note with `german_word` and `translation` attributes.
+
+        Returns:
+            List[str]: A sound tag and an image tag, empty without a file.
+        """
+        names: Dict[MediaGenerator, str] = {}
+        for generator, text in self._inputs(note):
+            names[generator] = self.store.lookup(
+                generator, text
+            ) or self.store.file_name(generator, text)
+        audio = names.get(self.audio) if self.audio is not None else None
+        image = names.get(self.image) if self.image is not None else None
+        return [
+            f"[sound:{audio}]" if audio else "",
+            f'<img src="{image}">' if image else "",
+        ]
+
+    def prepare(self, notes: Iterable[Any]) -> List[Path]:
+        """Generate the missing files of the notes and return all they reference.
+
+        Args:
+            notes (Iterable[Any]): Notes with `german_word` and `translation`.
+
+        Returns:
+            List[Path]: The referenced files, each once.
+        """
+        with instrumentation.span("media.prepare") as span:
+            generated = self.store.stats.generated
+            file_names = dict.fromkeys(
+                self.store.file_name(generator, text)
+                for note in notes
+                for generator, text in self._inputs(note)
+            )
+            span.update(
+                records=len(file_names),
+                generated=self.store.stats.generated - generated,
+            )
+        return [self.store.path(file_name) for file_name in file_names]
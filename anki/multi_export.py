@@ -0,0 +1,164 @@
+"""Module for exporting several decks from one database in parallel.
+
+A `DeckSpec` describes one deck built from the stored notes: its Anki deck
+ID and name, the .apkg file to write and a filter selecting its notes, given
+as an SQL condition over the columns of the `notes` table, e.g.
+
+    DeckSpec(1, "Verbs", "decks/verbs.apkg", "german_word NOT LIKE ?", ("% %",))
+    DeckSpec(2, "First 1000", "decks/first.apkg", "id <= ?", (1000,))
+    DeckSpec(3, "Kitchen", "decks/kitchen.apkg",
+             "id IN (SELECT rowid FROM notes_fts WHERE notes_fts MATCH ?)",
+             ("Küche",))
+
+`export_decks` copies the database once into a snapshot file with the SQLite
+backup API and builds the decks across a `ProcessPoolExecutor`. Every worker
+opens the snapshot read-only and immutable, so the workers neither lock each
+other nor see notes written to the live database during the export, and all
+decks are built from the same state. Building and zipping a package is CPU
+bound, so exporting N decks scales with the available cores.
+"""
+
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from anki import instrumentation
+from anki.constants import GERMAN_MODEL_ID
+from anki.german_deck import GermanDeck
+from anki.storage import NOTE_FIELDS
+
+SELECT_SPEC_SQL = "SELECT {fields} FROM notes WHERE ({where}) ORDER BY id"
+
+
+@dataclass(frozen=True)
+class DeckSpec:
+    """One deck to export: its ID, name, package file and note filter."""
+
+    deck_id: int
+    name: str
+    apkg_path: str
+    # SQL condition over the `notes` columns; the default selects all notes
+    where: str = "1"
+    # Values of the `?` placeholders in `where`
+    parameters: Sequence[Any] = ()
+
+
+def snapshot_database(db_file: Union[str, Path], snapshot_file: Path) -> None:
+    """Copy a deck database into a snapshot file with the SQLite backup API.
+
+    The backup is consistent even while other connections write to the
+    database, and it includes the lookup indexes and full-text index.
+
+    Args:
+        db_file (Union[str, Path]): The deck database.
+        snapshot_file (Path): The file the snapshot is written to.
+    """
+    source = sqlite3.connect(db_file)
+    target = sqlite3.connect(snapshot_file)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def _export_deck(
+    snapshot_file: str, spec: DeckSpec, model_id: int, incremental: bool
+) -> int:
+    """Build and write the package of one deck spec, in a worker process.
+
+    Returns:
+        int: The number of notes exported.
+    """
+    connection = sqlite3.connect(
+        f"{Path(snapshot_file).as_uri()}?mode=ro&immutable=1", uri=True
+    )
+    deck = GermanDeck(
+        spec.deck_id,
+        model_id,
+        str(Path(spec.apkg_path).with_suffix("")),
+        deck_name=spec.name,
+    )
+    try:
+        sql = SELECT_SPEC_SQL.format(fields=", ".join(NOTE_FIELDS), where=spec.where)
+        for row in connection.execute(sql, tuple(spec.parameters)):
+            deck.add_note(*row)
+    finally:
+        connection.close()
+    deck.apkg_path.parent.mkdir(parents=True, exist_ok=True)
+    deck.save_to_apkg(incremental=incremental)
+    return len(deck.deck.notes)
+
+
+def export_decks(
+    db_file: Union[str, Path],
+    specs: Sequence[DeckSpec],
+    model_id: int = GERMAN_MODEL_ID,
+    max_workers: Optional[int] = None,
+    incremental: bool = False,
+) -> Dict[str, int]:
+    """Export one .apkg file per deck spec from a shared database snapshot.
+
+    Args:
+        db_file (Union[str, Path]): The deck database the notes are read from.
+        specs (Sequence[DeckSpec]): The decks to export.
+        model_id (int): The ID of the note model used by all decks.
+        max_workers (Optional[int]): Number of worker processes, by default
+            the number of CPUs (at most one per spec). With 1 the decks are
+            exported one after another in this process.
+        incremental (bool): Export each package incrementally, reusing the
+            collection built next to it by the previous export, see
+            `GermanDeck.save_to_apkg`.
+
+    Returns:
+        Dict[str, int]: The number of notes exported, by package path.
+    """
+    if not Path(db_file).exists():
+        raise FileNotFoundError(f"No deck database at {db_file}")
+    paths = [spec.apkg_path for spec in specs]
+    if len(set(paths)) != len(paths):
+        raise ValueError("Every deck spec needs its own apkg_path")
+
+    with instrumentation.span("deck.export_decks", decks=len(specs)) as span:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_file = str(Path(tmp_dir) / "snapshot.db")
+            snapshot_database(db_file, Path(snapshot_file))
+
+            workers = min(max_workers or os.cpu_count() or 1, len(specs))
+            if workers <= 1:
+                counts = [
+                    _export_deck(snapshot_file, spec, model_id, incremental)
+                    for spec in specs
+                ]
+            else:
+                # Spans of the workers would not reach this process's recorder
+                with ProcessPoolExecutor(
+                    max_workers=workers, initializer=instrumentation.disable
+                ) as executor:
+                    futures = [
+                        executor.submit(
+                            _export_deck, snapshot_file, spec, model_id, incremental
+                        )
+                        for spec in specs
+                    ]
+                    counts = [future.result() for future in futures]
+        span["records"] = sum(counts)
+    return dict(zip(paths, counts))
+
+
+def load_specs(specs: List[Dict[str, Any]]) -> List[DeckSpec]:
+    """Create deck specs from JSON objects with the `DeckSpec` fields."""
+    return [
+        DeckSpec(
+            deck_id=int(spec["deck_id"]),
+            name=spec["name"],
+            apkg_path=spec["apkg_path"],
+            where=spec.get("where", "1"),
+            parameters=tuple(spec.get("parameters", ())),
+        )
+        for spec in specs
+    ]
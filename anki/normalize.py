@@ -0,0 +1,78 @@
+"""Module with normalization helpers for German vocabulary"""
+
+import hashlib
+import unicodedata
+
+
+def normalize_word(word: str) -> str:
+    """Normalize a German word or phrase into a stable lookup key.
+
+    The word is NFC-normalized (so composed and decomposed umlauts compare
+    equal), lowercased, and its whitespace is collapsed. Articles are kept,
+    because "der See" and "die See" are different words.
+
+    Args:
+        word (str): The German word or phrase.
+
+    Returns:
+        str: The normalized key.
+    """
+    return " ".join(unicodedata.normalize("NFC", word).lower().split())
+
+
+# Leading articles dropped when matching words regardless of their article
+ARTICLES = frozenset("der die das den dem des ein eine einen einem einer eines".split())
+
+# ASCII spellings of umlauts and sharp s, as typed on non-German keyboards
+_UMLAUT_FOLD = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+_PUNCTUATION = ".,;:!?\"'()[]«»„“”‚‘’"
+
+
+def lemma_key(word: str) -> str:
+    """Normalize a German word into a loose key for detecting known vocabulary.
+
+    On top of `normalize_word`, surrounding punctuation and a leading article are
+    removed, and umlauts and sharp s are folded to their ASCII spellings, so
+    "das Mädchen", "Maedchen" and "mädchen," share the key "maedchen".
+
+    Args:
+        word (str): The German word or phrase.
+
+    Returns:
+        str: The lemma key.
+    """
+    tokens = normalize_word(word).strip(_PUNCTUATION).split()
+    if len(tokens) > 1 and tokens[0] in ARTICLES:
+        tokens = tokens[1:]
+    return " ".join(tokens).translate(_UMLAUT_FOLD)
+
+
+# Digits of the base91 encoding Anki uses for note GUIDs, as in `genanki.guid_for`
+_BASE91 = (
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    "!#$%&()*+,-./:;<=>?@[]^_`{|}~"
+)
+
+
+def note_guid(word: str) -> str:
+    """Return the deterministic Anki note GUID of a German word or phrase.
+
+    The GUID is derived from `normalize_word` only, with the same hashing and
+    base91 encoding as `genanki.guid_for`, so a note keeps its GUID when its
+    translation or sentences change, and re-importing the deck into Anki
+    updates the existing cards instead of adding new ones.
+
+    Args:
+        word (str): The German word or phrase.
+
+    Returns:
+        str: The note GUID.
+    """
+    digest = hashlib.sha256(normalize_word(word).encode("utf-8")).digest()
+    value = int.from_bytes(digest[:8], "big")
+    digits = []
+    while value:
+        value, digit = divmod(value, len(_BASE91))
+        digits.append(_BASE91[digit])
+    return "".join(reversed(digits))
@@ -0,0 +1,475 @@
+"""Module for running the LLM templates as a concurrent dependency graph.
+
+Each `Stage` renders one of the `anki.templates` prompts and parses the LLM
+answer into records of its `anki.response_schema` schema, one per word. A
+stage depends on the stages producing its template's input variables, so in
+the default graph the translation, sentence and other-forms stages only wait
+for the extracted words, and only the sentence translation waits for the
+generated sentences. `Pipeline` runs independent stages concurrently with
+asyncio, so the wall-clock time of a run is the critical path of the graph
+rather than the sum of all stages.
+
+Answers are parsed while they stream in. Words whose row is malformed or
+missing, or was cut off by a failed stream, are asked for again in a smaller
+follow-up call instead of rerunning the stage for every word.
+
+With `anki.instrumentation` turned on, every LLM call is recorded as a
+`stage.<output_key>` span with the records it produced, the time spent parsing
+and the token usage the chat model reported, split into the prompt tokens the
+provider served from its prompt cache and the uncached ones. The prompt and
+its static prefix are also counted locally (see `anki.prompts`), so a prefix
+too short for the provider to cache shows up even without provider support.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.globals import get_llm_cache
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.outputs import LLMResult
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from anki import instrumentation
+from anki.normalize import normalize_word
+from anki.prefilter import split_words
+from anki.prompts import count_message_tokens, prompt_prefix
+from anki.response_schema import (
+    KEY_FIELD,
+    NOTE_SCHEMA,
+    OTHER_FORMS_SCHEMA,
+    SENTENCE_SCHEMA,
+    SENTENCE_TRANSLATION_SCHEMA,
+    TRANSLATION_SCHEMA,
+    WORD_SCHEMA,
+    Record,
+    RecordParser,
+    RecordSchema,
+    parse_records,
+)
+from anki.templates import (
+    extract_template,
+    note_template,
+    other_forms_template,
+    sentence_translate_template,
+    translate_template,
+    words_sentences_template,
+)
+
+# A pipeline variable: raw text such as `input_text`, or the records of a stage
+Value = Union[str, List[Record]]
+
+
+def _records(outputs: Dict[str, Value], key: str) -> List[Record]:
+    """Return the records of a stage output, which are never raw text."""
+    return cast(List[Record], outputs[key])
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One LLM call of the pipeline: a prompt template, its output key and schema."""
+
+    output_key: str
+    template: ChatPromptTemplate
+    schema: RecordSchema
+
+    @property
+    def input_keys(self) -> List[str]:
+        """The variables the template needs, i.e. the outputs this stage depends on."""
+        return list(self.template.input_variables)
+
+
+# The default graph, in the order of the original sequential chain
+STAGES: Tuple[Stage, ...] = (
+    Stage("german_words", extract_template, WORD_SCHEMA),
+    Stage("english_words", translate_template, TRANSLATION_SCHEMA),
+    Stage("german_sentences", words_sentences_template, SENTENCE_SCHEMA),
+    Stage(
+        "english_sentences", sentence_translate_template, SENTENCE_TRANSLATION_SCHEMA
+    ),
+    Stage("other_forms", other_forms_template, OTHER_FORMS_SCHEMA),
+)
+
+# One call per batch returning complete note records
+COMBINED_STAGES: Tuple[Stage, ...] = (Stage("notes", note_template, NOTE_SCHEMA),)
+
+# Pipeline mode name -> stages
+MODES: Dict[str, Tuple[Stage, ...]] = {"chain": STAGES, "combined": COMBINED_STAGES}
+
+
+# Note field -> (stage output, record field) holding it
+NOTE_OUTPUTS = {
+    "translation": ("english_words", "translation"),
+    "german_sentence": ("german_sentences", "german_sentence"),
+    "english_sentence": ("english_sentences", "english_sentence"),
+    "other_forms": ("other_forms", "other_forms"),
+}
+
+
+def outputs_to_notes(outputs: Dict[str, Value]) -> List[Dict[str, str]]:
+    """Turn the records of a pipeline run into `GermanDeck.add_note` arguments.
+
+    In the combined mode the `notes` records already are complete notes. In
+    the chain mode, records of every stage are matched to the extracted words by their
+    normalized German word. Words missing a translation or a sentence are left
+    out; missing other forms, or ones marked `NONE`, become an empty string.
+
+    Args:
+        outputs (Dict[str, Value]): The result of `Pipeline.run` or `Pipeline.arun`.
+
+    Returns:
+        List[Dict[str, str]]: One note per complete word, in extraction order.
+    """
+    if "notes" in outputs:
+        return [
+            (
+                {**note, "other_forms": ""}
+                if note["other_forms"].upper() == "NONE"
+                else note
+            )
+            for note in _records(outputs, "notes")
+        ]
+    values = {
+        field: {
+            normalize_word(record[KEY_FIELD]): record[name]
+            for record in _records(outputs, key)
+        }
+        for field, (key, name) in NOTE_OUTPUTS.items()
+    }
+    notes = []
+    for record in _records(outputs, "german_words"):
+        key = normalize_word(record[KEY_FIELD])
+        note: Dict[str, Optional[str]] = {"german_word": record[KEY_FIELD]}
+        note.update(
+            (field, field_values.get(key)) for field, field_values in values.items()
+        )
+        if (note["other_forms"] or "NONE").upper() == "NONE":
+            note["other_forms"] = ""
+        if all(value is not None for value in note.values()):
+            notes.append(cast(Dict[str, str], note))
+    return notes
+
+
+def extracted_words(outputs: Dict[str, Value]) -> List[str]:
+    """Return the German words a pipeline run extracted, in extraction order."""
+    records = _records(outputs, "notes" if "notes" in outputs else "german_words")
+    return [record[KEY_FIELD] for record in records]
+
+
+def _as_records(text: str, schema: RecordSchema) -> List[Record]:
+    """Turn a given stage output into records, e.g. a pasted list of words."""
+    records = parse_records(text, schema)
+    if not records and len(schema.fields) == 1:
+        records = [{KEY_FIELD: word} for word in split_words(text)]
+    return records
+
+
+def _select(value: Value, words: Iterable[str]) -> Value:
+    """Keep only the records of the given words; raw text is kept as is."""
+    if isinstance(value, str):
+        return value
+    keys = {normalize_word(word) for word in words}
+    return [record for record in value if normalize_word(record[KEY_FIELD]) in keys]
+
+
+def _uses_cache(llm: Runnable) -> bool:
+    """Whether LangChain caches the model's answers, which it skips when streaming."""
+    cache = getattr(llm, "cache", None)
+    if cache is None or cache is True:
+        return get_llm_cache() is not None
+    return cache is not False
+
+
+def _cached_tokens(usage: Dict[str, Any]) -> int:
+    """Return the prompt tokens served from the provider's cache in usage metadata."""
+    return (usage.get("input_token_details") or {}).get("cache_read", 0)
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """LangChain callback adding the token usage of LLM calls to span attributes."""
+
+    # Called in the event loop rather than handed to a thread for every token
+    run_inline = True
+
+    def __init__(self, attributes: Dict[str, Any]) -> None:
+        """
+        Initialize the callback.
+
+        Args:
+            attributes (Dict[str, Any]): The span attributes to add
+                `prompt_tokens`, `cached_prompt_tokens`, `uncached_prompt_tokens`
+                and `completion_tokens` to.
+        """
+        self.attributes = attributes
+        self._streamed_cached_tokens = 0
+
+    def on_llm_new_token(self, token: str, *, chunk: Any = None, **kwargs: Any) -> None:
+        # Merging streamed chunks drops the cache details of their usage
+        usage = getattr(getattr(chunk, "message", None), "usage_metadata", None)
+        if usage:
+            self._streamed_cached_tokens += _cached_tokens(usage)
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        prompt_tokens = completion_tokens = cached_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+                    cached_tokens += _cached_tokens(usage)
+        # Models without usage metadata on their messages report it here
+        if not prompt_tokens and not completion_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            details = usage.get("prompt_tokens_details") or {}
+            cached_tokens = details.get("cached_tokens") or 0
+        cached_tokens = cached_tokens or self._streamed_cached_tokens
+        for key, tokens in (
+            ("prompt_tokens", prompt_tokens),
+            ("cached_prompt_tokens", cached_tokens),
+            ("uncached_prompt_tokens", prompt_tokens - cached_tokens),
+            ("completion_tokens", completion_tokens),
+        ):
+            self.attributes[key] = self.attributes.get(key, 0) + tokens
+
+
+def _topological_order(stages: Sequence[Stage], inputs: Iterable[str]) -> List[Stage]:
+    """Order stages so that each one comes after the stages it depends on.
+
+    Raises:
+        ValueError: If a stage needs a variable that no input or stage provides,
+            or the stages depend on each other in a cycle.
+    """
+    available = set(inputs)
+    pending = list(stages)
+    ordered: List[Stage] = []
+    while pending:
+        ready = [stage for stage in pending if set(stage.input_keys) <= available]
+        if not ready:
+            missing = {key for stage in pending for key in stage.input_keys} - available
+            raise ValueError(
+                f"Stages {[stage.output_key for stage in pending]} cannot run, "
+                f"unresolved inputs: {sorted(missing)}"
+            )
+        for stage in ready:
+            pending.remove(stage)
+            available.add(stage.output_key)
+        ordered.extend(ready)
+    return ordered
+
+
+class Pipeline:
+    """Runs pipeline stages as a dependency graph with bounded concurrency."""
+
+    def __init__(
+        self,
+        llm: Runnable,
+        stages: Sequence[Stage] = STAGES,
+        max_concurrency: int = 3,
+        row_retries: int = 1,
+        stream: Optional[bool] = None,
+    ) -> None:
+        """
+        Initialize the pipeline.
+
+        Args:
+            llm (Runnable): The chat model (or any runnable accepting a prompt value).
+            stages (Sequence[Stage]): The stages to run.
+            max_concurrency (int): Maximum number of LLM calls in flight at once.
+            row_retries (int): Follow-up calls per stage for words whose row was
+                malformed or missing.
+            stream (Optional[bool]): Parse answers while they stream in. By default
+                answers are streamed unless the model uses an LLM cache, which
+                LangChain only consults for non-streamed calls.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.llm = llm
+        self.stages = list(stages)
+        self.max_concurrency = max_concurrency
+        self.row_retries = row_retries
+        self.stream = not _uses_cache(llm) if stream is None else stream
+        # Schemas of the default stages too, so their outputs can be given as inputs
+        self.schemas = {
+            stage.output_key: stage.schema for stage in (*STAGES, *self.stages)
+        }
+        self._prefix_token_counts: Dict[str, int] = {}
+
+    def stages_for(self, inputs: Iterable[str]) -> List[Stage]:
+        """Return the stages needed for the given inputs, in dependency order.
+
+        Stages whose output is already among the inputs are skipped, so a run can
+        start, for example, from prefiltered `german_words` instead of raw text.
+        """
+        inputs = set(inputs)
+        remaining = [stage for stage in self.stages if stage.output_key not in inputs]
+        return _topological_order(remaining, inputs)
+
+    def _prefix_tokens(self, stage: Stage) -> int:
+        """Return the locally counted tokens of the static prefix of a stage's prompt."""
+        tokens = self._prefix_token_counts.get(stage.output_key)
+        if tokens is None:
+            tokens = count_message_tokens(prompt_prefix(stage.template))
+            self._prefix_token_counts[stage.output_key] = tokens
+        return tokens
+
+    def _render(self, key: str, value: Value) -> str:
+        return value if isinstance(value, str) else self.schemas[key].render(value)
+
+    async def _call(
+        self,
+        stage: Stage,
+        variables: Dict[str, Value],
+        semaphore: asyncio.Semaphore,
+        keep_partial: bool,
+    ) -> List[Record]:
+        """Run the stage's LLM call once and parse the answer into records.
+
+        With `keep_partial`, an error after some rows arrived returns those rows
+        instead of failing the call.
+        """
+        parser = RecordParser(stage.schema)
+        chain = self.llm | StrOutputParser()
+        prompt = stage.template.format_prompt(
+            **{key: self._render(key, value) for key, value in variables.items()}
+        )
+        async with semaphore:
+            with instrumentation.span(f"stage.{stage.output_key}") as span:
+                config: Optional[RunnableConfig] = None
+                if instrumentation.active():
+                    config = {"callbacks": [TokenUsageCallback(span)]}
+                    span.update(
+                        local_prompt_tokens=count_message_tokens(prompt.to_messages()),
+                        local_prefix_tokens=self._prefix_tokens(stage),
+                    )
+                parse_time = 0.0
+                try:
+                    if self.stream:
+                        async for chunk in chain.astream(prompt, config):
+                            started = time.perf_counter()
+                            parser.feed(chunk)
+                            parse_time += time.perf_counter() - started
+                    else:
+                        answer = await chain.ainvoke(prompt, config)
+                        started = time.perf_counter()
+                        parser.feed(answer)
+                        parse_time += time.perf_counter() - started
+                except Exception:
+                    if not (keep_partial and parser.records):
+                        raise
+                records = parser.close()
+                span.update(
+                    records=len(records),
+                    row_errors=len(parser.errors),
+                    parse_s=parse_time,
+                )
+        return records
+
+    async def _run_stage(
+        self,
+        stage: Stage,
+        variables: Dict[str, Value],
+        semaphore: asyncio.Semaphore,
+    ) -> List[Record]:
+        """Run a stage, asking again for the words whose rows did not arrive."""
+        # Stages fed with records answer one row per input word
+        words = next(
+            (
+                [record[KEY_FIELD] for record in value]
+                for value in variables.values()
+                if not isinstance(value, str)
+            ),
+            None,
+        )
+        if words is None:
+            return await self._call(stage, variables, semaphore, keep_partial=False)
+        if not words:
+            return []
+
+        found: Dict[str, Record] = {}
+        missing = words
+        for attempt in range(self.row_retries + 1):
+            selected = {
+                key: _select(value, missing) for key, value in variables.items()
+            }
+            for record in await self._call(
+                stage, selected, semaphore, keep_partial=attempt < self.row_retries
+            ):
+                found.setdefault(normalize_word(record[KEY_FIELD]), record)
+            missing = [word for word in words if normalize_word(word) not in found]
+            if not missing:
+                break
+        return [found[key] for key in map(normalize_word, words) if key in found]
+
+    async def arun(
+        self, inputs: Dict[str, str], semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Dict[str, Value]:
+        """Run the stages concurrently and return the inputs merged with all outputs.
+
+        Args:
+            inputs (Dict[str, str]): Initial variables, e.g. `{"input_text": ...}`.
+                A stage output given as input may be JSON Lines records or, for
+                `german_words`, a semicolon-separated list of words.
+            semaphore (Optional[asyncio.Semaphore]): Shared limit on LLM calls in
+                flight. By default each run gets its own of `max_concurrency` slots.
+
+        Returns:
+            Dict[str, Value]: The inputs and the records of every stage; stage
+                outputs given as inputs are returned as records too.
+        """
+        semaphore = semaphore or asyncio.Semaphore(self.max_concurrency)
+        stages = self.stages_for(inputs)
+        loop = asyncio.get_running_loop()
+        results: Dict[str, asyncio.Future] = {
+            stage.output_key: loop.create_future() for stage in stages
+        }
+        for key, text in inputs.items():
+            value: Value = text
+            if key in self.schemas:
+                value = _as_records(text, self.schemas[key])
+            results[key] = loop.create_future()
+            results[key].set_result(value)
+
+        async def run_stage(stage: Stage) -> None:
+            try:
+                variables = {key: await results[key] for key in stage.input_keys}
+                output = await self._run_stage(stage, variables, semaphore)
+                results[stage.output_key].set_result(output)
+            except BaseException as error:
+                results[stage.output_key].set_exception(error)
+                raise
+
+        tasks = [asyncio.ensure_future(run_stage(stage)) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Mark failures of dependent stages as retrieved; the first one is raised
+            for future in results.values():
+                if future.done() and not future.cancelled():
+                    future.exception()
+            raise
+        return {key: future.result() for key, future in results.items()}
+
+    def run(self, inputs: Dict[str, str]) -> Dict[str, Value]:
+        """Synchronous wrapper around `arun` for scripts and notebooks."""
+        return asyncio.run(self.arun(inputs))
@@ -0,0 +1,66 @@
+"""Module for filtering extracted vocabulary before it reaches the LLM.
+
+Only words without a stored note need translations, sentences and other
+forms, so the generation templates are run on the new words alone.
+"""
+
+from typing import Iterable, List, Protocol, Set, Tuple
+
+from anki.normalize import lemma_key
+
+
+class KnownWordIndex(Protocol):
+    """An index of known words, e.g. `GermanDeckDatabase` or `GermanDeck`."""
+
+    def known_words(self, words: Iterable[str]) -> Set[str]:
+        """Return the given words that are already known."""
+
+
+def split_words(text: str, separator: str = ";") -> List[str]:
+    """Split a separated word list returned by the LLM into stripped words.
+
+    Args:
+        text (str): The LLM output, e.g. "der Hund ; lernen ; noch einmal".
+        separator (str): The separator between words.
+
+    Returns:
+        List[str]: The non-empty words in their original order.
+    """
+    return [word.strip() for word in text.split(separator) if word.strip()]
+
+
+def filter_new_words(
+    words: Iterable[str], db: KnownWordIndex
+) -> Tuple[List[str], List[str]]:
+    """Split words into new ones and ones that can be skipped.
+
+    A word is skipped if it repeats an earlier word of the input or already has
+    a note in the database, both compared by `anki.normalize.lemma_key`.
+
+    Args:
+        words (Iterable[str]): The extracted German words or phrases.
+        db (KnownWordIndex): The vocabulary database to check against, or
+            another index of known words, e.g. a `GermanDeck` that also knows
+            the words of the learner's Anki collection.
+
+    Returns:
+        Tuple[List[str], List[str]]: The new words and the skipped words, each in
+            input order.
+    """
+    # (word, whether it repeats an earlier word), in input order
+    entries: List[Tuple[str, bool]] = []
+    unique: List[str] = []
+    seen: Set[str] = set()
+    for word in words:
+        key = lemma_key(word)
+        entries.append((word, key in seen))
+        if key not in seen:
+            seen.add(key)
+            unique.append(word)
+
+    known = db.known_words(unique)
+    new_words: List[str] = []
+    skipped: List[str] = []
+    for word, repeated in entries:
+        (skipped if repeated or word in known else new_words).append(word)
+    return new_words, skipped
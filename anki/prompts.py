@@ -0,0 +1,155 @@
+"""Module for building prompts that providers can cache, and counting their tokens.
+
+Providers such as OpenAI cache the longest prompt prefix they have seen
+recently and bill its tokens at a discount, but only if the prefix is
+byte-for-byte identical. `cacheable_template` therefore builds every template
+from a static part, i.e. the role, the instructions, the shared answering
+rules and the format instructions of its schema, dedented so the bytes never
+depend on the indentation of the source, followed by the variable content as
+the very last text of the prompt.
+
+`prompt_prefix` returns the static prefix of any template, and
+`count_tokens` counts tokens locally with tiktoken when it is installed (it
+comes with langchain-openai), or estimates them otherwise. The pipeline
+reports these counts together with the cached and uncached prompt tokens
+the provider reported for every stage (see `anki.pipeline`).
+"""
+
+import inspect
+import math
+from functools import lru_cache
+from typing import Any, Callable, List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+# Rules shared by the generation templates, worded identically in all of them
+ANSWERING_RULES = """\
+- Read the entire convo history line by line before answering.
+- You ALWAYS will be PENALIZED for wrong and low-effort answers.
+- ALWAYS follow "Answering rules."
+- I'm going to tip $1,000,000 for the best reply.
+- Your answer is critical for my career."""
+
+# Tokenizer of the gpt-4o model family
+DEFAULT_ENCODING = "o200k_base"
+
+# Tokens a chat message costs on top of its content, and the reply priming
+MESSAGE_OVERHEAD_TOKENS = 3
+REPLY_PRIMING_TOKENS = 3
+
+# Marks the variables when a template is rendered to find its static prefix
+_SENTINEL = "\x00"
+
+
+def approximate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text, about four characters per token."""
+    return math.ceil(len(text) / 4)
+
+
+@lru_cache(maxsize=None)
+def _tokenizer(encoding: str) -> Optional[Callable[[str], List[int]]]:
+    """Return the tiktoken encoder of an encoding, or None if it is unavailable."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(encoding).encode_ordinary
+    except Exception:
+        # Not installed, or its vocabulary cannot be downloaded when offline
+        return None
+
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """Count the tokens of a text with tiktoken, or estimate them without it.
+
+    Args:
+        text (str): The text.
+        encoding (str): The tiktoken encoding of the model.
+
+    Returns:
+        int: The number of tokens.
+    """
+    encode = _tokenizer(encoding)
+    return len(encode(text)) if encode is not None else approximate_tokens(text)
+
+
+def count_message_tokens(
+    messages: List[BaseMessage], encoding: str = DEFAULT_ENCODING
+) -> int:
+    """Count the prompt tokens of chat messages, as OpenAI bills them.
+
+    Args:
+        messages (List[BaseMessage]): The rendered prompt.
+        encoding (str): The tiktoken encoding of the model.
+
+    Returns:
+        int: The number of prompt tokens.
+    """
+    return REPLY_PRIMING_TOKENS + sum(
+        count_tokens(str(message.content), encoding) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
+
+
+def _escape(text: str) -> str:
+    """Escape the braces of static text for a prompt template."""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def cacheable_template(
+    role: str,
+    instructions: str,
+    format_instructions: str,
+    payload: str,
+    answering_rules: bool = True,
+) -> ChatPromptTemplate:
+    """Build a chat template with a static prefix and the variable content last.
+
+    Args:
+        role (str): The system message.
+        instructions (str): The task instructions; they are dedented and
+            followed by the answering rules and the format instructions.
+        format_instructions (str): The format instructions of the schema.
+        payload (str): The last lines of the prompt, a template ending with the
+            variable content, e.g. "Here is the text input:\\n```{input_text}```".
+        answering_rules (bool): Add the shared `ANSWERING_RULES`.
+
+    Returns:
+        ChatPromptTemplate: A system message and a user message, whose text
+            only varies after the static part.
+    """
+    parts = [inspect.cleandoc(instructions)]
+    if answering_rules:
+        parts.append(ANSWERING_RULES)
+    static = "\n\n".join([*parts, format_instructions.strip()])
+    return ChatPromptTemplate(
+        [
+            SystemMessage(content=inspect.cleandoc(role)),
+            ("user", f"{_escape(static)}\n\n{payload}"),
+        ]
+    )
+
+
+def prompt_prefix(template: ChatPromptTemplate) -> List[BaseMessage]:
+    """Return the static prefix of a template: the prompt up to its first variable.
+
+    Args:
+        template (ChatPromptTemplate): The template.
+
+    Returns:
+        List[BaseMessage]: The messages before the first one holding a
+            variable, and that message cut before the variable.
+    """
+    messages = template.format_messages(
+        **{name: _SENTINEL for name in template.input_variables}
+    )
+    prefix: List[Any] = []
+    for message in messages:
+        content = str(message.content)
+        if _SENTINEL in content:
+            prefix.append(
+                message.__class__(content=content[: content.index(_SENTINEL)])
+            )
+            break
+        prefix.append(message)
+    return prefix
@@ -1,41 +1,279 @@
-"""Module with response schemas for llm"""
+"""Module with response schemas for llm
 
-from langchain.output_parsers import ResponseSchema, StructuredOutputParser
+Every template asks the LLM for JSON Lines: one JSON object per word, keyed by
+the German word. `RecordParser` reads those records in a single pass while the
+answer streams in, whether the LLM sends JSON Lines, a JSON array or wraps
+either in a Markdown code fence. A malformed row only loses that row; it is
+recorded as a `RowError` and the pipeline asks again for the missing words
+instead of rerunning the whole batch.
+"""
 
-# Create a structured output parser based on the schema
-LIST_OUTPUT_PARSER = StructuredOutputParser.from_response_schemas(
-    [
-        ResponseSchema(
-            name="german_words",
-            description="A list of extracted German words/phrases separated by semicolons `;`.",
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+Record = Dict[str, str]
+
+# Name of the field every record is keyed by
+KEY_FIELD = "german_word"
+
+# Characters that change the parser state; everything else is skipped over
+_SPECIAL = re.compile(r'[{}"\\]')
+
+
+@dataclass(frozen=True)
+class RecordSchema:
+    """The fields of the records one template returns, with an example answer."""
+
+    # (field, description) pairs, the first one being `KEY_FIELD`
+    fields: Tuple[Tuple[str, str], ...]
+    examples: Tuple[Record, ...]
+    # Fields the LLM may leave out or set to null
+    optional: Tuple[str, ...] = ()
+
+    @property
+    def names(self) -> List[str]:
+        """The field names, in order."""
+        return [name for name, _ in self.fields]
+
+    def format_instructions(self) -> str:
+        """Describe the expected output format for the prompt."""
+        fields = "\n".join(
+            f'- "{name}": {description}' for name, description in self.fields
+        )
+        examples = "\n".join(
+            json.dumps(example, ensure_ascii=False) for example in self.examples
         )
-    ]
+        return (
+            "**Output Format:** Return JSON Lines: one JSON object per line and per "
+            "input word or phrase, with these keys:\n"
+            f"{fields}\n"
+            "Do not add any other text. For example:\n"
+            f"{examples}"
+        )
+
+    def validate(self, value: Any) -> Record:
+        """Check a decoded JSON value and return it as a record of the schema fields.
+
+        Raises:
+            ValueError: If the value is not an object or a required field is
+                missing, empty or not a string.
+        """
+        if not isinstance(value, dict):
+            raise ValueError(f"expected a JSON object, got {type(value).__name__}")
+        record: Record = {}
+        for name in self.names:
+            field = value.get(name)
+            if field is None and name in self.optional:
+                field = ""
+            if not isinstance(field, str) or not (
+                field.strip() or name in self.optional
+            ):
+                raise ValueError(f"field {name!r} must be a non-empty string")
+            record[name] = field.strip()
+        return record
+
+    def render(self, records: Iterable[Record]) -> str:
+        """Render records as input of a later template.
+
+        Single-field records become a semicolon-separated list, like the word
+        lists users paste; other records are rendered as JSON Lines.
+        """
+        if len(self.fields) == 1:
+            return " ; ".join(record[KEY_FIELD] for record in records)
+        return "\n".join(json.dumps(record, ensure_ascii=False) for record in records)
+
+
+class RowError(NamedTuple):
+    """A row of the answer that could not be turned into a record."""
+
+    text: str
+    reason: str
+
+
+class RecordParser:
+    """Incremental parser for the JSON objects in a streamed LLM answer.
+
+    Feed it the answer chunk by chunk; every top-level JSON object is decoded
+    and validated against the schema as soon as its closing brace arrives.
+    Text outside objects, such as array brackets, commas or code fences, is
+    ignored.
+    """
+
+    def __init__(self, schema: RecordSchema) -> None:
+        """
+        Initialize the parser.
+
+        Args:
+            schema (RecordSchema): The schema records are validated against.
+        """
+        self.schema = schema
+        self.records: List[Record] = []
+        self.errors: List[RowError] = []
+        self._pending: List[str] = []  # parts of an object spanning chunks
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[Record]:
+        """Parse the next chunk of the answer.
+
+        Args:
+            text (str): The next chunk of the answer.
+
+        Returns:
+            List[Record]: The records completed by this chunk.
+        """
+        new_records: List[Record] = []
+        start = 0  # start of the current object within this chunk
+        position = 0
+        while True:
+            if self._escape:
+                if position >= len(text):
+                    break
+                position += 1
+                self._escape = False
+            match = _SPECIAL.search(text, position)
+            if match is None:
+                break
+            char, position = match.group(), match.end()
+            if self._depth == 0:
+                if char == "{":
+                    self._depth, start = 1, match.start()
+            elif self._in_string:
+                if char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pending.append(text[start:position])
+                    self._finish_row("".join(self._pending), new_records)
+                    self._pending = []
+        if self._depth:
+            self._pending.append(text[start:])
+        self.records.extend(new_records)
+        return new_records
+
+    def _finish_row(self, text: str, records: List[Record]) -> None:
+        try:
+            records.append(self.schema.validate(json.loads(text)))
+        except ValueError as error:
+            self.errors.append(RowError(text, str(error)))
+
+    def close(self) -> List[Record]:
+        """Finish parsing, recording an unterminated last object as an error.
+
+        Returns:
+            List[Record]: All records parsed from the answer.
+        """
+        if self._depth:
+            self.errors.append(RowError("".join(self._pending), "truncated object"))
+        self._pending, self._depth = [], 0
+        self._in_string = self._escape = False
+        return self.records
+
+
+def parse_records(text: str, schema: RecordSchema) -> List[Record]:
+    """Parse a complete answer into records, skipping malformed rows.
+
+    Args:
+        text (str): The LLM answer.
+        schema (RecordSchema): The schema records are validated against.
+
+    Returns:
+        List[Record]: The valid records, in answer order.
+    """
+    parser = RecordParser(schema)
+    parser.feed(text)
+    return parser.close()
+
+
+WORD_SCHEMA = RecordSchema(
+    fields=((KEY_FIELD, "The German word or phrase, nouns with their article."),),
+    examples=({KEY_FIELD: "der Hund"}, {KEY_FIELD: "noch einmal"}),
 )
 
-# Create a structured output parser based on the schema
-SENTENCE_OUTPUT_PARSER = StructuredOutputParser.from_response_schemas(
-    [
-        ResponseSchema(
-            name="translations",
-            description="""
-            - A list of the sentences separated by semicolons `;`.
-            - Do not repeat input in the output.
-            - Output example: Sentence 1. ; Sentence 2. ; Sentence 3.
-            """,
-        )
-    ]
+TRANSLATION_SCHEMA = RecordSchema(
+    fields=(
+        (KEY_FIELD, "The German word or phrase exactly as given."),
+        ("translation", "Its English translation."),
+    ),
+    examples=({KEY_FIELD: "der Hund", "translation": "the dog"},),
 )
 
-# Create a structured output parser based on the schema
-MAPPING_OUTPUT_PARSER = StructuredOutputParser.from_response_schemas(
-    [
-        ResponseSchema(
-            name="mapping",
-            description="""
-            - A list of the mapped sentences separated by colons `:` and semicolons `;`.
-            - Structure of the response: input word/phrase : output sentence ;
-            - Output example: kennen : I kann ; der Hund : die Hunde
-            """,
-        )
-    ]
+SENTENCE_SCHEMA = RecordSchema(
+    fields=(
+        (KEY_FIELD, "The German word or phrase exactly as given."),
+        ("german_sentence", "One simple B1-level German sentence using it."),
+    ),
+    examples=(
+        {
+            KEY_FIELD: "Geld verlangen",
+            "german_sentence": "Man kann für gute Arbeit Geld verlangen.",
+        },
+    ),
+)
+
+SENTENCE_TRANSLATION_SCHEMA = RecordSchema(
+    fields=(
+        (KEY_FIELD, "The German word or phrase exactly as given."),
+        ("english_sentence", "The English translation of its German sentence."),
+    ),
+    examples=(
+        {
+            KEY_FIELD: "Geld verlangen",
+            "english_sentence": "You can ask for money for good work.",
+        },
+    ),
+)
+
+OTHER_FORMS_SCHEMA = RecordSchema(
+    fields=(
+        (KEY_FIELD, "The German word or phrase exactly as given."),
+        ("other_forms", "Its other forms, or NONE."),
+    ),
+    examples=(
+        {KEY_FIELD: "kennen", "other_forms": "kannte, habe gekannt"},
+        {KEY_FIELD: "der Tisch", "other_forms": "die Tische"},
+        {KEY_FIELD: "laufen", "other_forms": "lief, bin gelaufen"},
+        {KEY_FIELD: "schnell", "other_forms": "NONE"},
+    ),
+    optional=("other_forms",),
+)
+
+NOTE_SCHEMA = RecordSchema(
+    fields=(
+        (KEY_FIELD, "The German word or phrase, nouns with their article."),
+        ("translation", "Its English translation."),
+        ("german_sentence", "One simple B1-level German sentence using it."),
+        ("english_sentence", "The English translation of that sentence."),
+        (
+            "other_forms",
+            "The plural for nouns, Präteritum and Perfekt for verbs, NONE otherwise.",
+        ),
+    ),
+    examples=(
+        {
+            KEY_FIELD: "der Tisch",
+            "translation": "the table",
+            "german_sentence": "Der Tisch steht in der Küche.",
+            "english_sentence": "The table is in the kitchen.",
+            "other_forms": "die Tische",
+        },
+        {
+            KEY_FIELD: "kennen",
+            "translation": "to know",
+            "german_sentence": "Ich kenne diesen Mann gut.",
+            "english_sentence": "I know this man well.",
+            "other_forms": "kannte, habe gekannt",
+        },
+    ),
+    optional=("other_forms",),
 )
@@ -0,0 +1,213 @@
+"""Module with the SQLAlchemy storage backend for the German vocabulary database."""
+
+import sqlite3
+from typing import Iterable, Iterator, List, Optional, Set, cast
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    create_engine,
+    delete,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from anki.storage import (
+    LOOKUP_CHUNK_SIZE,
+    LOOKUP_LIMIT,
+    NOTE_COLUMNS,
+    NOTE_FIELDS,
+    SEARCH_SENTENCES_SQL,
+    Checkpoint,
+    NoteRecord,
+    NoteRow,
+    NoteStorage,
+    StoredNote,
+    chunked,
+    create_lookup_indexes,
+    migrate_legacy_schema,
+    prefix_bounds,
+)
+
+# Base class for SQLAlchemy models
+Base = declarative_base()
+
+
+class NoteModel(Base):
+    """SQLAlchemy model representing a note in the German vocabulary deck."""
+
+    __tablename__ = "notes"
+
+    id: int = Column(Integer, primary_key=True)
+    german_word: str = Column(String, nullable=False)
+    translation: str = Column(String, nullable=False)
+    german_sentence: str = Column(Text, nullable=False)
+    english_sentence: str = Column(Text, nullable=False)
+    other_forms: Optional[str] = Column(String, nullable=True)
+    # Natural key (normalized German word)
+    note_key: str = Column(String, nullable=False, unique=True, index=True)
+    # Anki note GUID derived from the natural key, see `anki.normalize.note_guid`
+    guid: str = Column(String, nullable=False, unique=True, index=True)
+    # Loose key (no article, folded umlauts) used to detect already known words
+    lemma_key: str = Column(String, nullable=False, index=True)
+    # Hash of all note fields, used to skip unchanged notes on upsert
+    content_hash: str = Column(String(40), nullable=False)
+    # The translation index and the sentence search index are created by
+    # `anki.storage.create_lookup_indexes`, shared with the sqlite3 backend
+
+
+class CheckpointModel(Base):
+    """SQLAlchemy model of a resumable write's position, see `NoteSink`."""
+
+    __tablename__ = "checkpoints"
+
+    name: str = Column(String, primary_key=True)
+    position: int = Column(Integer, nullable=False)
+
+
+def _upsert_statement():
+    """Build an INSERT that updates an existing note only if its content changed."""
+    stmt = insert(NoteModel.__table__)
+    columns = NoteModel.__table__.c
+    return stmt.on_conflict_do_update(
+        index_elements=[columns.note_key],
+        set_={
+            column: stmt.excluded[column] for column in (*NOTE_FIELDS, "content_hash")
+        },
+        where=columns.content_hash != stmt.excluded.content_hash,
+    )
+
+
+def _migrate_legacy_schema(engine: Engine) -> None:
+    """Run the shared schema migration and lookup indexes on a raw connection."""
+    connection = engine.raw_connection()
+    driver_connection = cast(sqlite3.Connection, connection.driver_connection)
+    try:
+        migrate_legacy_schema(driver_connection)
+        create_lookup_indexes(driver_connection)
+    finally:
+        connection.close()
+
+
+class SQLAlchemyBackend(NoteStorage):
+    """Storage backend built on the SQLAlchemy ORM and `NoteModel`."""
+
+    def __init__(self, db_file: str) -> None:
+        """
+        Initialize the backend with the given SQLite database file.
+
+        Args:
+            db_file (str): The SQLite database file path.
+        """
+        self.engine = create_engine(f"sqlite:///{db_file}")
+        Base.metadata.create_all(self.engine)
+        _migrate_legacy_schema(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def add_notes(
+        self,
+        notes: Iterable[NoteRow],
+        chunk_size: int = 1000,
+        checkpoint: Optional[Checkpoint] = None,
+        bulk: bool = False,
+    ) -> int:
+        # `bulk` is ignored: pysqlite runs DDL outside the session's transaction
+        count = 0
+        stmt = _upsert_statement()
+        with self.Session() as session:
+            for chunk in chunked(notes, chunk_size):
+                count += session.execute(stmt, chunk).rowcount
+            if checkpoint is not None:
+                name, position = checkpoint
+                session.merge(CheckpointModel(name=name, position=position))
+            session.commit()
+        return count
+
+    def iter_notes(self, batch_size: int = 1000) -> Iterator[NoteRecord]:
+        columns = NoteModel.__table__.c
+        stmt = select(*(columns[field] for field in NOTE_FIELDS)).order_by(columns.id)
+        with self.Session() as session:
+            result = session.execute(stmt, execution_options={"yield_per": batch_size})
+            yield from map(NoteRecord._make, result)
+
+    def load_notes(self) -> List[StoredNote]:
+        return self._select(self._select_notes().order_by(NoteModel.__table__.c.id))
+
+    def count_notes(self) -> int:
+        with self.Session() as session:
+            return session.execute(
+                select(func.count()).select_from(NoteModel)
+            ).scalar_one()
+
+    def find_lemma_keys(self, keys: Iterable[str]) -> Set[str]:
+        found: Set[str] = set()
+        with self.Session() as session:
+            lemma_key = NoteModel.__table__.c.lemma_key
+            for chunk in chunked(set(keys), LOOKUP_CHUNK_SIZE):
+                stmt = select(lemma_key).where(lemma_key.in_(chunk))
+                found.update(session.execute(stmt).scalars())
+        return found
+
+    def _select(self, stmt) -> List[StoredNote]:
+        with self.Session() as session:
+            return list(map(StoredNote._make, session.execute(stmt)))
+
+    def _select_notes(self):
+        columns = NoteModel.__table__.c
+        return select(*(columns[column] for column in NOTE_COLUMNS))
+
+    def find_by_key(self, key: str) -> Optional[StoredNote]:
+        note_key = NoteModel.__table__.c.note_key
+        notes = self._select(self._select_notes().where(note_key == key))
+        return notes[0] if notes else None
+
+    def find_by_key_prefix(
+        self, prefix: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        low, high = prefix_bounds(prefix)
+        note_key = NoteModel.__table__.c.note_key
+        stmt = (
+            self._select_notes()
+            .where(note_key >= low, note_key < high)
+            .order_by(note_key)
+            .limit(limit)
+        )
+        return self._select(stmt)
+
+    def find_by_translation(
+        self, translation: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        columns = NoteModel.__table__.c
+        stmt = (
+            self._select_notes()
+            .where(columns.translation.collate("NOCASE") == translation)
+            .order_by(columns.id)
+            .limit(limit)
+        )
+        return self._select(stmt)
+
+    def search_sentences(
+        self, query: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        stmt = text(SEARCH_SENTENCES_SQL).bindparams(query=query, limit=limit)
+        return self._select(stmt)
+
+    def get_checkpoint(self, name: str) -> int:
+        with self.Session() as session:
+            checkpoint = session.get(CheckpointModel, name)
+            return checkpoint.position if checkpoint else 0
+
+    def clear_checkpoint(self, name: str) -> None:
+        with self.Session() as session:
+            name_column = CheckpointModel.__table__.c.name
+            session.execute(delete(CheckpointModel).where(name_column == name))
+            session.commit()
+
+    def close(self) -> None:
+        self.engine.dispose()
@@ -0,0 +1,216 @@
+"""Module with a lightweight storage backend built on the stdlib `sqlite3` module.
+
+The backend avoids importing SQLAlchemy and per-row ORM overhead, which makes it
+a better fit for short-lived command-line jobs and bulk ingestion.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Set
+
+from anki.storage import (
+    CREATE_SEARCH_INSERT_TRIGGER_SQL,
+    DROP_SEARCH_INSERT_TRIGGER_SQL,
+    INDEX_NEW_ROWS_SQL,
+    LOOKUP_CHUNK_SIZE,
+    LOOKUP_LIMIT,
+    MAX_ID_SQL,
+    NOTE_COLUMNS,
+    NOTE_FIELDS,
+    SEARCH_SENTENCES_SQL,
+    Checkpoint,
+    NoteRecord,
+    NoteRow,
+    NoteStorage,
+    StoredNote,
+    chunked,
+    create_lookup_indexes,
+    last_per_key,
+    migrate_legacy_schema,
+    prefix_bounds,
+)
+
+# Same table layout as the one SQLAlchemy generates for `NoteModel`
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER NOT NULL,
+    german_word VARCHAR NOT NULL,
+    translation VARCHAR NOT NULL,
+    german_sentence TEXT NOT NULL,
+    english_sentence TEXT NOT NULL,
+    other_forms VARCHAR,
+    note_key VARCHAR NOT NULL,
+    guid VARCHAR NOT NULL,
+    lemma_key VARCHAR NOT NULL,
+    content_hash VARCHAR(40) NOT NULL,
+    PRIMARY KEY (id)
+)
+"""
+CREATE_CHECKPOINTS_SQL = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name VARCHAR NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (name)
+)
+"""
+CREATE_INDEXES_SQL = """
+CREATE UNIQUE INDEX IF NOT EXISTS ix_notes_note_key ON notes (note_key);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_notes_guid ON notes (guid);
+CREATE INDEX IF NOT EXISTS ix_notes_lemma_key ON notes (lemma_key);
+"""
+
+UPSERT_SQL = f"""
+INSERT INTO notes ({", ".join(NOTE_COLUMNS[1:])})
+VALUES ({", ".join(f":{column}" for column in NOTE_COLUMNS[1:])})
+ON CONFLICT (note_key) DO UPDATE SET
+    {", ".join(f"{column} = excluded.{column}" for column in (*NOTE_FIELDS, "content_hash"))}
+WHERE notes.content_hash != excluded.content_hash
+"""
+SAVE_CHECKPOINT_SQL = """
+INSERT INTO checkpoints (name, position) VALUES (?, ?)
+ON CONFLICT (name) DO UPDATE SET position = excluded.position
+"""
+SELECT_FIELDS_SQL = f"SELECT {', '.join(NOTE_FIELDS)} FROM notes ORDER BY id"
+SELECT_ALL_SQL = f"SELECT {', '.join(NOTE_COLUMNS)} FROM notes ORDER BY id"
+SELECT_BY_KEY_SQL = f"SELECT {', '.join(NOTE_COLUMNS)} FROM notes WHERE note_key = ?"
+SELECT_BY_KEY_RANGE_SQL = f"""
+SELECT {", ".join(NOTE_COLUMNS)} FROM notes
+WHERE note_key >= ? AND note_key < ? ORDER BY note_key LIMIT ?
+"""
+SELECT_BY_TRANSLATION_SQL = f"""
+SELECT {", ".join(NOTE_COLUMNS)} FROM notes
+WHERE translation = ? COLLATE NOCASE ORDER BY id LIMIT ?
+"""
+
+# Durability is kept per transaction in WAL mode with synchronous=NORMAL
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -16000,
+    "mmap_size": 256 * 2**20,
+}
+
+
+class SQLiteBackend(NoteStorage):
+    """Storage backend built directly on `sqlite3` with WAL mode and tuned pragmas."""
+
+    def __init__(self, db_file: str) -> None:
+        """
+        Initialize the backend with the given SQLite database file.
+
+        Args:
+            db_file (str): The SQLite database file path.
+        """
+        # Autocommit mode: transactions are opened explicitly in `_transaction`
+        self.connection = sqlite3.connect(
+            str(db_file), isolation_level=None, cached_statements=64
+        )
+        for name, value in PRAGMAS.items():
+            self.connection.execute(f"PRAGMA {name} = {value}")
+        self.connection.execute(CREATE_TABLE_SQL)
+        self.connection.execute(CREATE_CHECKPOINTS_SQL)
+        migrate_legacy_schema(self.connection)
+        self.connection.executescript(CREATE_INDEXES_SQL)
+        create_lookup_indexes(self.connection)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Run the enclosed statements in one transaction, rolling back on error."""
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+    def add_notes(
+        self,
+        notes: Iterable[NoteRow],
+        chunk_size: int = 1000,
+        checkpoint: Optional[Checkpoint] = None,
+        bulk: bool = False,
+    ) -> int:
+        count = 0
+        with self._transaction() as cursor:
+            if bulk:
+                cursor.execute(DROP_SEARCH_INSERT_TRIGGER_SQL)
+            # rowcount leaves out the rows written by the search index triggers
+            for chunk in chunked(notes, chunk_size):
+                if bulk:
+                    (max_id,) = cursor.execute(MAX_ID_SQL).fetchone()
+                    cursor.executemany(UPSERT_SQL, last_per_key(chunk))
+                    count += cursor.rowcount
+                    cursor.execute(INDEX_NEW_ROWS_SQL, {"max_id": max_id})
+                else:
+                    cursor.executemany(UPSERT_SQL, chunk)
+                    count += cursor.rowcount
+            if bulk:
+                cursor.execute(CREATE_SEARCH_INSERT_TRIGGER_SQL)
+            if checkpoint is not None:
+                cursor.execute(SAVE_CHECKPOINT_SQL, checkpoint)
+        return count
+
+    def iter_notes(self, batch_size: int = 1000) -> Iterator[NoteRecord]:
+        cursor = self.connection.execute(SELECT_FIELDS_SQL)
+        try:
+            while rows := cursor.fetchmany(batch_size):
+                yield from map(NoteRecord._make, rows)
+        finally:
+            cursor.close()
+
+    def load_notes(self) -> List[StoredNote]:
+        return list(map(StoredNote._make, self.connection.execute(SELECT_ALL_SQL)))
+
+    def count_notes(self) -> int:
+        (count,) = self.connection.execute("SELECT count(*) FROM notes").fetchone()
+        return count
+
+    def find_lemma_keys(self, keys: Iterable[str]) -> Set[str]:
+        found: Set[str] = set()
+        for chunk in chunked(set(keys), LOOKUP_CHUNK_SIZE):
+            placeholders = ", ".join("?" * len(chunk))
+            found.update(
+                key
+                for (key,) in self.connection.execute(
+                    f"SELECT lemma_key FROM notes WHERE lemma_key IN ({placeholders})",
+                    chunk,
+                )
+            )
+        return found
+
+    def _select(self, sql: str, parameters) -> List[StoredNote]:
+        return list(map(StoredNote._make, self.connection.execute(sql, parameters)))
+
+    def find_by_key(self, key: str) -> Optional[StoredNote]:
+        notes = self._select(SELECT_BY_KEY_SQL, (key,))
+        return notes[0] if notes else None
+
+    def find_by_key_prefix(
+        self, prefix: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        return self._select(SELECT_BY_KEY_RANGE_SQL, (*prefix_bounds(prefix), limit))
+
+    def find_by_translation(
+        self, translation: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        return self._select(SELECT_BY_TRANSLATION_SQL, (translation, limit))
+
+    def search_sentences(
+        self, query: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        return self._select(SEARCH_SENTENCES_SQL, {"query": query, "limit": limit})
+
+    def get_checkpoint(self, name: str) -> int:
+        row = self.connection.execute(
+            "SELECT position FROM checkpoints WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def clear_checkpoint(self, name: str) -> None:
+        self.connection.execute("DELETE FROM checkpoints WHERE name = ?", (name,))
+
+    def close(self) -> None:
+        self.connection.close()
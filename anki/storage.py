@@ -0,0 +1,436 @@
+"""Module with the storage interface shared by the note database backends.
+
+`GermanDeckDatabase` delegates persistence to a `NoteStorage` backend. Both
+backends store notes in the same SQLite `notes` table, so a database written
+by one of them can be read by the other.
+"""
+
+import hashlib
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from itertools import islice
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    cast,
+)
+
+from anki.normalize import lemma_key, normalize_word, note_guid
+
+
+# Plain record types returned by the backends instead of ORM instances
+class NoteRecord(NamedTuple):
+    """The content fields of a stored note, in the order of the Anki note fields."""
+
+    german_word: str
+    translation: str
+    german_sentence: str
+    english_sentence: str
+    other_forms: Optional[str]
+
+
+class StoredNote(NamedTuple):
+    """A full row of the `notes` table."""
+
+    id: int
+    german_word: str
+    translation: str
+    german_sentence: str
+    english_sentence: str
+    other_forms: Optional[str]
+    note_key: str
+    guid: str
+    lemma_key: str
+    content_hash: str
+
+
+# Columns holding the note content, in the order of the Anki note fields
+NOTE_FIELDS = NoteRecord._fields
+
+# Note fields that may be NULL; the others are NOT NULL, as in `NoteModel`
+OPTIONAL_FIELDS = ("other_forms",)
+
+# All columns of the `notes` table
+NOTE_COLUMNS = StoredNote._fields
+
+NoteRow = Dict[str, Optional[str]]
+T = TypeVar("T")
+
+# (name, position) of a resumable write, stored with the notes it covers
+Checkpoint = Tuple[str, int]
+
+# Keys per IN (...) lookup, below SQLite's default bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+CREATE_SEARCH_INSERT_TRIGGER_SQL = (
+    "CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN "
+    "INSERT INTO notes_fts (rowid, german_sentence, english_sentence) "
+    "VALUES (new.id, new.german_sentence, new.english_sentence); END"
+)
+
+# Case-insensitive index for reverse lookups, and an external-content FTS5
+# index over the example sentences that triggers keep in sync with `notes`
+LOOKUP_INDEX_STATEMENTS = (
+    "CREATE INDEX IF NOT EXISTS ix_notes_translation "
+    "ON notes (translation COLLATE NOCASE)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5("
+    "german_sentence, english_sentence, content='notes', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    CREATE_SEARCH_INSERT_TRIGGER_SQL,
+    "CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN "
+    "INSERT INTO notes_fts (notes_fts, rowid, german_sentence, english_sentence) "
+    "VALUES ('delete', old.id, old.german_sentence, old.english_sentence); END",
+    "CREATE TRIGGER IF NOT EXISTS notes_fts_update "
+    "AFTER UPDATE OF german_sentence, english_sentence ON notes BEGIN "
+    "INSERT INTO notes_fts (notes_fts, rowid, german_sentence, english_sentence) "
+    "VALUES ('delete', old.id, old.german_sentence, old.english_sentence); "
+    "INSERT INTO notes_fts (rowid, german_sentence, english_sentence) "
+    "VALUES (new.id, new.german_sentence, new.english_sentence); END",
+)
+
+# Bulk writes drop the insert trigger of the search index for their transaction
+# and index the rows each chunk inserted with one statement, which halves the
+# cost of large imports. New rows get increasing ids and updates still go
+# through the update trigger, so a chunk must hold every word at most once
+# (see `last_per_key`): a row updated before it is indexed corrupts the index.
+DROP_SEARCH_INSERT_TRIGGER_SQL = "DROP TRIGGER IF EXISTS notes_fts_insert"
+MAX_ID_SQL = "SELECT coalesce(max(id), 0) FROM notes"
+INDEX_NEW_ROWS_SQL = """
+INSERT INTO notes_fts (rowid, german_sentence, english_sentence)
+SELECT id, german_sentence, english_sentence FROM notes WHERE id > :max_id
+"""
+
+# Default number of rows returned by the lookup and search methods
+LOOKUP_LIMIT = 20
+
+# Matches are returned in rowid order: ranking them with bm25 would first scan
+# the full posting list of every common term, about 4 ms on 100k notes
+SEARCH_SENTENCES_SQL = f"""
+SELECT {", ".join(f"notes.{column}" for column in NOTE_COLUMNS)}
+FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid
+WHERE notes_fts MATCH :query
+ORDER BY notes_fts.rowid
+LIMIT :limit
+"""
+
+
+def content_hash(note: NoteRow) -> str:
+    """Return a stable SHA-1 hash over the content fields of a note row."""
+    payload = "\x1f".join(note.get(field) or "" for field in NOTE_FIELDS)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def note_row(note: NoteRow) -> NoteRow:
+    """Project a mapping onto the columns of the `notes` table.
+
+    Missing optional fields default to None, and the keys and content hash are
+    derived from the note content.
+    """
+    row = {field: note.get(field) for field in NOTE_FIELDS}
+    row["note_key"] = normalize_word(row["german_word"] or "")
+    row["guid"] = note_guid(row["german_word"] or "")
+    row["lemma_key"] = lemma_key(row["german_word"] or "")
+    row["content_hash"] = content_hash(row)
+    return row
+
+
+def last_per_key(rows: Iterable[NoteRow]) -> List[NoteRow]:
+    """Keep the last of the rows sharing a natural key, as successive upserts would."""
+    return list({row["note_key"]: row for row in rows}.values())
+
+
+def chunked(rows: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Split an iterable into lists of at most `size` items."""
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@contextmanager
+def _migration(connection: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Run one migration step in its own transaction."""
+    connection.execute("BEGIN")
+    try:
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+
+def _add_natural_key(connection: sqlite3.Connection) -> None:
+    """Add `note_key` and `content_hash`, keeping the latest row per word."""
+    with _migration(connection):
+        connection.execute("ALTER TABLE notes ADD COLUMN note_key VARCHAR")
+        connection.execute("ALTER TABLE notes ADD COLUMN content_hash VARCHAR(40)")
+        rows = connection.execute(
+            f"SELECT id, {', '.join(NOTE_FIELDS)} FROM notes ORDER BY id"
+        )
+        latest: Dict[str, NoteRow] = {}
+        for note_id, *fields in rows.fetchall():
+            note = note_row(dict(zip(NOTE_FIELDS, fields)))
+            note["id"] = note_id
+            # `note_row` always sets the natural key
+            latest[cast(str, note["note_key"])] = note
+        keep = {note["id"] for note in latest.values()}
+        connection.executemany(
+            "DELETE FROM notes WHERE id = ?",
+            [
+                (note_id,)
+                for (note_id,) in connection.execute("SELECT id FROM notes").fetchall()
+                if note_id not in keep
+            ],
+        )
+        connection.executemany(
+            "UPDATE notes SET note_key = :note_key, content_hash = :content_hash "
+            "WHERE id = :id",
+            list(latest.values()),
+        )
+        connection.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_notes_note_key ON notes (note_key)"
+        )
+
+
+def _add_lemma_key(connection: sqlite3.Connection) -> None:
+    """Add and backfill the indexed `lemma_key` used to detect known words."""
+    with _migration(connection):
+        connection.execute("ALTER TABLE notes ADD COLUMN lemma_key VARCHAR")
+        connection.executemany(
+            "UPDATE notes SET lemma_key = ? WHERE id = ?",
+            [
+                (lemma_key(german_word), note_id)
+                for note_id, german_word in connection.execute(
+                    "SELECT id, german_word FROM notes"
+                ).fetchall()
+            ],
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_notes_lemma_key ON notes (lemma_key)"
+        )
+
+
+def _add_guid(connection: sqlite3.Connection) -> None:
+    """Add and backfill the unique Anki note `guid` derived from the natural key."""
+    with _migration(connection):
+        connection.execute("ALTER TABLE notes ADD COLUMN guid VARCHAR")
+        connection.executemany(
+            "UPDATE notes SET guid = ? WHERE id = ?",
+            [
+                (note_guid(german_word), note_id)
+                for note_id, german_word in connection.execute(
+                    "SELECT id, german_word FROM notes"
+                ).fetchall()
+            ],
+        )
+        connection.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_notes_guid ON notes (guid)"
+        )
+
+
+def migrate_legacy_schema(connection: sqlite3.Connection) -> None:
+    """Add the columns introduced after the first version of the `notes` table.
+
+    Missing key columns are added and backfilled together with their indexes.
+    When the natural key is added, duplicate rows of the same word are collapsed
+    to the most recently inserted one.
+
+    Args:
+        connection (sqlite3.Connection): An open connection to the database.
+    """
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(notes)")}
+    if "note_key" not in columns:
+        _add_natural_key(connection)
+    if "lemma_key" not in columns:
+        _add_lemma_key(connection)
+    if "guid" not in columns:
+        _add_guid(connection)
+
+
+def create_lookup_indexes(connection: sqlite3.Connection) -> None:
+    """Create the translation index and the sentence search index if missing.
+
+    The search index is filled from the existing notes when it is first
+    created; afterwards the triggers keep it in sync on insert, update and
+    delete.
+
+    Args:
+        connection (sqlite3.Connection): An open connection to the database.
+    """
+    exists = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'"
+    ).fetchone()
+    with _migration(connection):
+        for statement in LOOKUP_INDEX_STATEMENTS:
+            connection.execute(statement)
+        if not exists:
+            connection.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+
+
+def prefix_bounds(prefix: str) -> Tuple[str, str]:
+    """Return the key range matching a prefix, usable with the index on the key."""
+    return prefix, prefix + "\U0010ffff"
+
+
+def match_query(text: str) -> str:
+    """Quote each term of a search text as an FTS5 string, matching all of them."""
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in text.split())
+
+
+class NoteStorage(ABC):
+    """Interface implemented by the `GermanDeckDatabase` storage backends."""
+
+    @abstractmethod
+    def add_notes(
+        self,
+        notes: Iterable[NoteRow],
+        chunk_size: int = 1000,
+        checkpoint: Optional[Checkpoint] = None,
+        bulk: bool = False,
+    ) -> int:
+        """
+        Upsert many notes into the database in a single transaction.
+
+        Args:
+            notes (Iterable[NoteRow]): Note rows prepared with `note_row`.
+            chunk_size (int): Number of rows sent per executemany call.
+            checkpoint (Optional[Checkpoint]): Checkpoint saved in the same
+                transaction, so it is committed exactly when the notes are.
+            bulk (bool): Update the search index once per chunk rather than
+                once per row, see `INDEX_NEW_ROWS_SQL`. Backends that cannot
+                change the schema within the write's transaction ignore it.
+
+        Returns:
+            int: The number of notes inserted or updated.
+        """
+
+    @abstractmethod
+    def iter_notes(self, batch_size: int = 1000) -> Iterator[NoteRecord]:
+        """
+        Stream all notes from the database in insertion order.
+
+        Args:
+            batch_size (int): Number of rows fetched from the cursor at a time.
+
+        Yields:
+            NoteRecord: The note fields of the next row.
+        """
+
+    @abstractmethod
+    def load_notes(self) -> List[StoredNote]:
+        """
+        Load all notes from the database.
+
+        Returns:
+            List[StoredNote]: All stored notes, exposing every column as an attribute.
+        """
+
+    @abstractmethod
+    def count_notes(self) -> int:
+        """
+        Count the notes stored in the database.
+
+        Returns:
+            int: The number of rows in the `notes` table.
+        """
+
+    @abstractmethod
+    def find_lemma_keys(self, keys: Iterable[str]) -> Set[str]:
+        """
+        Return the subset of the given lemma keys that are stored in the database.
+
+        Args:
+            keys (Iterable[str]): Lemma keys computed with `anki.normalize.lemma_key`.
+
+        Returns:
+            Set[str]: The keys that have a stored note.
+        """
+
+    @abstractmethod
+    def find_by_key(self, key: str) -> Optional[StoredNote]:
+        """
+        Return the note stored under a natural key.
+
+        Args:
+            key (str): A key computed with `anki.normalize.normalize_word`.
+
+        Returns:
+            Optional[StoredNote]: The note, or None if there is none.
+        """
+
+    @abstractmethod
+    def find_by_key_prefix(
+        self, prefix: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        """
+        Return the notes whose natural key starts with a prefix, in key order.
+
+        Args:
+            prefix (str): A normalized prefix of the natural key.
+            limit (int): Maximum number of notes returned.
+
+        Returns:
+            List[StoredNote]: The matching notes.
+        """
+
+    @abstractmethod
+    def find_by_translation(
+        self, translation: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        """
+        Return the notes with the given translation, ignoring ASCII case.
+
+        Args:
+            translation (str): The English translation.
+            limit (int): Maximum number of notes returned.
+
+        Returns:
+            List[StoredNote]: The matching notes.
+        """
+
+    @abstractmethod
+    def search_sentences(
+        self, query: str, limit: int = LOOKUP_LIMIT
+    ) -> List[StoredNote]:
+        """
+        Return the notes whose example sentences match a full-text query.
+
+        Args:
+            query (str): An FTS5 query, e.g. built with `match_query`.
+            limit (int): Maximum number of notes returned.
+
+        Returns:
+            List[StoredNote]: The matching notes, in insertion order.
+        """
+
+    @abstractmethod
+    def get_checkpoint(self, name: str) -> int:
+        """
+        Return the position saved for a checkpoint.
+
+        Args:
+            name (str): The checkpoint name.
+
+        Returns:
+            int: The saved position, or 0 if there is no such checkpoint.
+        """
+
+    @abstractmethod
+    def clear_checkpoint(self, name: str) -> None:
+        """
+        Delete a checkpoint.
+
+        Args:
+            name (str): The checkpoint name.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Release the connections held by the backend."""
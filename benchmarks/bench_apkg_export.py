@@ -0,0 +1,64 @@
+"""Benchmark full vs incremental .apkg export after a small edit.
+
+The notes are added through `GermanDeck`, so they have GUIDs derived from
+their German word and an edited note is counted as an update.
+
+Usage:
+    python -m benchmarks.bench_apkg_export --notes 50000 --edits 10
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import genanki
+
+from anki.apkg_export import write_incremental_package
+from anki.german_deck import GermanDeck
+from benchmarks.synthetic import synthetic_notes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=50_000)
+    parser.add_argument("--edits", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        deck = GermanDeck(2059400110, 1607392319, str(Path(tmp_dir) / "deck"))
+        for row in synthetic_notes(args.notes):
+            deck.add_note(**row)
+
+        start = time.perf_counter()
+        genanki.Package(deck.deck).write_to_file(deck.apkg_path)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        write_incremental_package(deck.deck, deck.apkg_path, deck.build_cache_path)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        write_incremental_package(deck.deck, deck.apkg_path, deck.build_cache_path)
+        unchanged = time.perf_counter() - start
+
+        for row in synthetic_notes(args.edits):
+            row["german_sentence"] += " (bearbeitet)"
+            deck.add_note(**row)
+        start = time.perf_counter()
+        counts = write_incremental_package(
+            deck.deck, deck.apkg_path, deck.build_cache_path
+        )
+        warm = time.perf_counter() - start
+
+    print(f"notes: {args.notes}, edited: {args.edits}")
+    print(f"genanki full export:          {full:8.3f} s")
+    print(f"incremental, cold cache:      {cold:8.3f} s")
+    print(f"incremental, no changes:      {unchanged:8.3f} s")
+    print(
+        f"incremental, after edit:      {warm:8.3f} s  (inserted, updated, deleted = {counts})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark the GermanDeckDatabase storage backends against each other.
+
+For each backend this measures the startup time of a fresh interpreter that
+imports the database module and opens a database, bulk upsert throughput and
+streaming read throughput.
+
+Usage:
+    python -m benchmarks.bench_backends --rows 50000
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from anki.german_deck_db import BACKENDS, GermanDeckDatabase
+from benchmarks.synthetic import synthetic_notes
+
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from anki.german_deck_db import GermanDeckDatabase
+GermanDeckDatabase(sys.argv[1], backend=sys.argv[2]).close()
+print(time.perf_counter() - start)
+"""
+
+
+def bench_startup(db_file: Path, backend: str, repeat: int = 3) -> float:
+    """Return the best import-and-open time in seconds over `repeat` fresh interpreters."""
+    return min(
+        float(
+            subprocess.check_output(
+                [sys.executable, "-c", STARTUP_SCRIPT, str(db_file), backend],
+                text=True,
+            )
+        )
+        for _ in range(repeat)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"rows: {args.rows}")
+    print(f"{'backend':12} {'startup':>10} {'insert rows/s':>15} {'read rows/s':>15}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in BACKENDS:
+            db_file = Path(tmp_dir) / f"{backend}.db"
+            startup = bench_startup(db_file, backend)
+
+            db = GermanDeckDatabase(str(db_file), backend=backend)
+            start = time.perf_counter()
+            db.add_notes(synthetic_notes(args.rows))
+            insert_rate = args.rows / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            read = sum(1 for _ in db.iter_notes())
+            read_rate = read / (time.perf_counter() - start)
+            db.close()
+
+            print(
+                f"{backend:12} {startup * 1000:8.1f}ms {insert_rate:15,.0f} {read_rate:15,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark bulk export and import of the notes table as JSONL, CSV and Parquet.
+
+Fills a deck database with `--rows` synthetic notes, then exports them the way
+the table could be read before, with `load_notes` and one JSON document, and
+streamed in batches with `anki.bulk_io.export_notes` to every format, and
+imports each file into an empty database with `anki.bulk_io.import_notes`,
+also once with the search index updated per row. Per-row `add_note` calls are
+timed on `--sample` rows only. Peak memory is measured with tracemalloc in a
+separate run from the timing. Parquet is skipped without pyarrow.
+
+Usage:
+    python -m benchmarks.bench_bulk_io --rows 1000000
+"""
+
+import argparse
+import importlib.util
+import json
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Tuple
+
+from anki.bulk_io import export_notes, import_notes, read_notes
+from anki.german_deck_db import GermanDeckDatabase
+from benchmarks.synthetic import synthetic_notes
+
+
+def peak_mib(func: Callable[[], object]) -> float:
+    """Return the peak traced memory of `func` in MiB."""
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def measure(func: Callable[[], object]) -> Tuple[float, float]:
+    """Return the run time of `func` in seconds and its peak memory in MiB."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return elapsed, peak_mib(func)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--sample", type=int, default=2_000)
+    args = parser.parse_args()
+    formats = ["jsonl", "csv"]
+    if importlib.util.find_spec("pyarrow") is not None:
+        formats.append("parquet")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        db = GermanDeckDatabase(tmp / "source.db", "sqlite3")
+        db.add_notes(synthetic_notes(args.rows), chunk_size=10_000, bulk=True)
+        print(f"rows: {args.rows}")
+
+        def report(name: str, elapsed: float, peak: float, rows: int) -> None:
+            print(
+                f"{name:>24}: {elapsed:7.2f}s, {rows / elapsed:9.0f} rows/s, "
+                f"peak {peak:7.1f} MiB"
+            )
+
+        def export_whole() -> None:
+            notes = [
+                {field: getattr(note, field) for field in note._fields}
+                for note in db.load_notes()
+            ]
+            (tmp / "whole.json").write_text(json.dumps(notes), encoding="utf-8")
+
+        report("export load_notes", *measure(export_whole), args.rows)
+        for format in formats:
+            path = str(tmp / f"notes.{format}")
+            elapsed, peak = measure(lambda: export_notes(db, path))
+            size = Path(path).stat().st_size / 2**20
+            report(f"export {format} ({size:.0f} MiB)", elapsed, peak, args.rows)
+        db.close()
+
+        databases = iter(range(1_000_000))
+
+        def target() -> GermanDeckDatabase:
+            return GermanDeckDatabase(tmp / f"target{next(databases)}.db", "sqlite3")
+
+        def import_per_row() -> None:
+            target_db = target()
+            for note in islice(read_notes(str(tmp / "notes.jsonl")), args.sample):
+                target_db.add_note(**note)
+            target_db.close()
+
+        report("import add_note", *measure(import_per_row), args.sample)
+
+        def import_per_row_index() -> None:
+            target_db = target()
+            target_db.add_notes(read_notes(str(tmp / "notes.jsonl")), 10_000)
+            target_db.close()
+
+        report("import jsonl, row index", *measure(import_per_row_index), args.rows)
+        for format in formats:
+
+            def import_bulk() -> None:
+                target_db = target()
+                import_notes(target_db, str(tmp / f"notes.{format}"))
+                target_db.close()
+
+            report(f"import {format}", *measure(import_bulk), args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark bulk vs per-row note ingestion in GermanDeckDatabase.
+
+Usage:
+    python -m benchmarks.bench_db_insert --rows 5000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from anki.german_deck_db import GermanDeckDatabase
+from benchmarks.synthetic import synthetic_notes
+
+
+def bench_add_note(db_file: Path, rows: int) -> float:
+    """Insert `rows` notes one transaction at a time and return rows per second."""
+    db = GermanDeckDatabase(str(db_file))
+    start = time.perf_counter()
+    for row in synthetic_notes(rows):
+        db.add_note(**row)
+    return rows / (time.perf_counter() - start)
+
+
+def bench_add_notes(db_file: Path, rows: int, chunk_size: int) -> float:
+    """Insert `rows` notes in one bulk transaction and return rows per second."""
+    db = GermanDeckDatabase(str(db_file))
+    start = time.perf_counter()
+    db.add_notes(synthetic_notes(rows), chunk_size=chunk_size)
+    return rows / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        per_row = bench_add_note(Path(tmp_dir) / "per_row.db", args.rows)
+        bulk = bench_add_notes(Path(tmp_dir) / "bulk.db", args.rows, args.chunk_size)
+
+    print(f"rows:               {args.rows}")
+    print(f"add_note  (per row): {per_row:12,.0f} rows/s")
+    print(f"add_notes (bulk):    {bulk:12,.0f} rows/s")
+    print(f"speedup:             {bulk / per_row:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark peak memory and throughput of reading a large vocabulary dump.
+
+Writes an input file of `--lines` lines drawn from `--unique` distinct words
+with Zipf-like frequencies, as in chat exports, and a deck database with
+`--known` of the words, then reads the new lines twice: the way the notebook
+used to, reading the whole file, joining its sorted set of lines back into
+one string and passing its lines to `filter_new_words`, and with the
+streaming `anki.ingest.iter_new_batches` over `read_lines`. Peak memory is
+measured with tracemalloc in a separate run from the timing.
+
+Usage:
+    python -m benchmarks.bench_ingest --lines 2000000 --unique 500000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from anki.german_deck_db import GermanDeckDatabase
+from anki.ingest import iter_new_batches, read_lines
+from anki.prefilter import filter_new_words
+from anki.storage import NOTE_FIELDS
+
+
+def read_whole(path: Path, db: GermanDeckDatabase) -> int:
+    """Read the new lines the way the notebook did before streaming."""
+    with open(path, "r") as file:
+        text_input = "\n".join(sorted(list(set(list(file.read().split("\n"))))))
+    new_lines, _ = filter_new_words(text_input.splitlines(), db)
+    return len(new_lines)
+
+
+def read_streaming(path: Path, db: GermanDeckDatabase) -> int:
+    """Read the new lines with the streaming ingestion stage."""
+    return sum(len(batch) for batch in iter_new_batches(read_lines([str(path)]), db))
+
+
+def peak_mib(func: Callable[[], object]) -> float:
+    """Return the peak traced memory of `func` in MiB."""
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--unique", type=int, default=500_000)
+    parser.add_argument("--known", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "input.txt"
+        with open(path, "w", encoding="utf-8") as file:
+            for _ in range(args.lines):
+                # Log-uniform ranks: a few words are very frequent, most rare
+                file.write(f"das Wort{int(args.unique ** rng.random())}\n")
+        db = GermanDeckDatabase(Path(tmp_dir) / "deck.db", "sqlite3")
+        db.add_notes(
+            dict.fromkeys(NOTE_FIELDS, "-") | {"german_word": f"das Wort{i}"}
+            for i in range(args.known)
+        )
+        size = path.stat().st_size / 2**20
+        print(f"lines: {args.lines}, unique: {args.unique}, file: {size:.1f} MiB")
+
+        for name, func in (("whole file", read_whole), ("streaming", read_streaming)):
+            start = time.perf_counter()
+            count = func(path, db)
+            elapsed = time.perf_counter() - start
+            peak = peak_mib(lambda: func(path, db))
+            print(
+                f"{name:>10}: {count} new lines, {elapsed:6.2f}s, "
+                f"{args.lines / elapsed:9.0f} lines/s, peak {peak:7.1f} MiB"
+            )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
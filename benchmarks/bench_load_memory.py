@@ -0,0 +1,92 @@
+"""Benchmark peak memory of loading a deck from the database.
+
+Compares the previous `load_notes()`-based path, which materializes every ORM
+object before building the deck, with the streaming `iter_notes()` path used
+by `GermanDeck.load_deck`. Peak memory is measured with tracemalloc.
+
+Usage:
+    python -m benchmarks.bench_load_memory --rows 100000
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Tuple
+
+import genanki
+
+from anki.german_deck import GermanDeck
+from anki.german_deck_db import GermanDeckDatabase
+from benchmarks.synthetic import synthetic_notes
+
+DECK_ID = 2059400110
+MODEL_ID = 1607392319
+
+
+def measure(func: Callable[[], object]) -> Tuple[float, float]:
+    """Run `func` and return its wall time in seconds and peak traced memory in MiB."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def load_deck_materialized(base_path: Path) -> GermanDeck:
+    """Load a deck the way `load_deck` did before streaming was introduced."""
+    deck = GermanDeck(DECK_ID, MODEL_ID, str(base_path))
+    for note_model in GermanDeckDatabase(deck.db_path).load_notes():
+        deck.deck.add_note(
+            genanki.Note(
+                model=deck.model,
+                fields=[
+                    note_model.german_word,
+                    note_model.translation,
+                    note_model.german_sentence,
+                    note_model.english_sentence,
+                    note_model.other_forms,
+                ],
+            )
+        )
+    return deck
+
+
+def load_deck_streaming(base_path: Path) -> GermanDeck:
+    """Load a deck through the streaming `GermanDeck.load_deck`."""
+    deck = GermanDeck(DECK_ID, MODEL_ID, str(base_path))
+    deck.load_deck()
+    return deck
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = Path(tmp_dir) / "deck"
+        db = GermanDeckDatabase(base_path.with_suffix(".db"))
+        db.add_notes(synthetic_notes(args.rows))
+
+        results = {
+            "load_notes (all ORM rows)": measure(db.load_notes),
+            "iter_notes (streamed rows)": measure(
+                lambda: sum(1 for _ in db.iter_notes())
+            ),
+            "load_deck (materialized)": measure(
+                lambda: load_deck_materialized(base_path)
+            ),
+            "load_deck (streaming)": measure(lambda: load_deck_streaming(base_path)),
+        }
+
+    print(f"rows: {args.rows}")
+    for name, (elapsed, peak) in results.items():
+        print(f"{name:28} {elapsed:8.2f} s  peak {peak:9.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
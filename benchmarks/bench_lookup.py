@@ -0,0 +1,59 @@
+"""Benchmark the indexed lookups and sentence search of GermanDeckDatabase.
+
+For each backend this fills a database with synthetic notes and reports the
+mean time of an exact word lookup, a prefix lookup, a reverse lookup by
+translation and a full-text search over the example sentences.
+
+Usage:
+    python -m benchmarks.bench_lookup --rows 100000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from anki.german_deck_db import BACKENDS, GermanDeckDatabase
+from benchmarks.synthetic import synthetic_notes
+
+
+def mean_time(lookup: Callable[[int], List], samples: List[int]) -> float:
+    """Return the mean time in seconds of one lookup over the sample ids."""
+    start = time.perf_counter()
+    for i in samples:
+        assert lookup(i)
+    return (time.perf_counter() - start) / len(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    samples = random.Random(0).choices(range(args.rows), k=args.lookups)
+    lookups = {
+        "word": lambda db, i: [db.find_word(f"Das Wort{i}")],
+        "prefix": lambda db, i: db.find_prefix(f"das wort{i}", limit=10),
+        "translation": lambda db, i: db.find_translation(f"The Word {i}"),
+        "sentence": lambda db, i: db.search_sentences(f"wort{i} einfachen", limit=10),
+    }
+
+    print(f"rows: {args.rows}, mean time per lookup")
+    print(f"{'backend':12}" + "".join(f"{name:>13}" for name in lookups))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in BACKENDS:
+            db = GermanDeckDatabase(str(Path(tmp_dir) / f"{backend}.db"), backend)
+            db.add_notes(synthetic_notes(args.rows))
+            times = [
+                mean_time(lambda i: lookup(db, i), samples)
+                for lookup in lookups.values()
+            ]
+            db.close()
+            print(f"{backend:12}" + "".join(f"{t * 1e6:11.0f}us" for t in times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark exporting several decks from one database, serially and in parallel.
+
+This fills a database with synthetic notes and exports `--decks` decks, each
+selecting an equal share of the notes by id range, once with a single
+process and once with `--workers` processes (one per CPU by default).
+
+Usage:
+    python -m benchmarks.bench_multi_export --rows 100000 --decks 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from anki.german_deck_db import GermanDeckDatabase
+from anki.multi_export import DeckSpec, export_decks
+from benchmarks.synthetic import synthetic_notes
+
+MODEL_ID = 1607392319
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--decks", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = Path(tmp_dir) / "deck.db"
+        db = GermanDeckDatabase(db_file, "sqlite3")
+        db.add_notes(synthetic_notes(args.rows))
+        db.close()
+
+        share = -(-args.rows // args.decks)
+        specs = [
+            DeckSpec(
+                2059400110 + i,
+                f"Part {i + 1}",
+                str(Path(tmp_dir) / f"part{i + 1}.apkg"),
+                "id > ? AND id <= ?",
+                (i * share, (i + 1) * share),
+            )
+            for i in range(args.decks)
+        ]
+
+        print(f"rows: {args.rows}, decks: {args.decks}")
+        timings = {}
+        for workers in (1, args.workers):
+            start = time.perf_counter()
+            export_decks(db_file, specs, MODEL_ID, max_workers=workers)
+            timings[workers] = time.perf_counter() - start
+            print(f"{workers:3} workers: {timings[workers]:8.2f}s")
+        print(f"speedup: {timings[1] / timings[args.workers]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
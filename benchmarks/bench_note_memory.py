@@ -0,0 +1,96 @@
+"""Benchmark the memory held by a deck of compact note records vs genanki notes.
+
+Measures the memory retained after adding notes to a deck, once as the
+`genanki.Note` objects `GermanDeck` used to hold and once through
+`GermanDeck.add_note`, which keeps compact `DeckNote` records. The note
+strings are allocated before measuring, so only the per-note overhead is
+compared. The time and peak memory of exporting the compact deck to an
+.apkg file, which builds the `genanki.Note` objects one at a time, are
+reported as well.
+
+Usage:
+    python -m benchmarks.bench_note_memory --rows 100000
+"""
+
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Tuple
+
+import genanki
+
+from anki.german_deck import GermanDeck
+from anki.german_model import GermanModel
+from anki.normalize import note_guid
+from benchmarks.synthetic import synthetic_notes
+
+DECK_ID = 2059400110
+MODEL_ID = 1607392319
+
+
+def retained(build: Callable[[], object]) -> Tuple[object, float]:
+    """Run `build` and return its result and the memory it retains in MiB."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / 2**20
+
+
+def genanki_deck(notes, model: GermanModel) -> genanki.Deck:
+    """Hold the notes as `genanki.Note` objects, as the deck did before."""
+    deck = genanki.Deck(DECK_ID, "German Vocabulary")
+    for note in notes:
+        deck.add_note(
+            genanki.Note(
+                model=model,
+                fields=list(note.values()),
+                guid=note_guid(note["german_word"]),
+            )
+        )
+    return deck
+
+
+def compact_deck(notes, base_path: Path) -> GermanDeck:
+    """Hold the notes as `DeckNote` records through `GermanDeck.add_note`."""
+    deck = GermanDeck(DECK_ID, MODEL_ID, str(base_path))
+    for note in notes:
+        deck.add_note(**note)
+    return deck
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    notes = list(synthetic_notes(args.rows))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = Path(tmp_dir) / "deck"
+        _, before = retained(lambda: genanki_deck(notes, GermanModel(MODEL_ID)))
+        deck, after = retained(lambda: compact_deck(notes, base_path))
+
+        start = time.perf_counter()
+        deck.save_to_apkg()
+        export_time = time.perf_counter() - start
+        tracemalloc.start()
+        deck.save_to_apkg()
+        _, export_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    per_note = 2**20 / args.rows
+    print(f"rows: {args.rows}")
+    print(f"genanki.Note objects: {before:8.1f} MiB  ({before * per_note:.0f} B/note)")
+    print(f"DeckNote records:     {after:8.1f} MiB  ({after * per_note:.0f} B/note)")
+    print(
+        f"export:               {export_time:8.2f} s    peak {export_peak / 2**10:.0f} KiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark the five-stage template chain against the single-call combined prompt.
+
+Both pipeline modes run on the same words against a replay LLM answering from
+recorded note records, so no API calls are made. For each mode this reports
+the LLM calls, prompt and completion tokens and the modeled latency per 100
+words. Latency is modeled as a fixed time per call plus a time per completion
+token, and the sleeps are scaled down by `--time-scale` to keep the run short.
+
+Records are replayed from `--fixture`, a JSON Lines file with one note per
+line (for example exported from the vocabulary database), or synthesized.
+
+Usage:
+    python -m benchmarks.bench_prompt_modes --words 100
+    python -m benchmarks.bench_prompt_modes --fixture data/notes.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from typing import Dict, List
+
+from langchain_core.runnables import RunnableLambda
+
+from anki.batching import approximate_tokens
+from anki.normalize import normalize_word
+from anki.pipeline import MODES, Pipeline, outputs_to_notes
+from anki.response_schema import KEY_FIELD, Record
+from benchmarks.synthetic import synthetic_notes
+
+# Field names listed in a prompt's format instructions
+FIELD_PATTERN = re.compile(r'^- "(\w+)":', re.MULTILINE)
+
+
+class ReplayLLM:
+    """Fake chat model answering any template from recorded note records."""
+
+    def __init__(
+        self,
+        notes: List[Record],
+        call_latency: float,
+        token_latency: float,
+        time_scale: float,
+    ) -> None:
+        self.notes = {normalize_word(note[KEY_FIELD]): note for note in notes}
+        self.call_latency = call_latency
+        self.token_latency = token_latency
+        self.time_scale = time_scale
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @staticmethod
+    def _words(prompt: str) -> List[str]:
+        """Return the words in the payload at the end of the prompt."""
+        prompt = prompt.strip()
+        if prompt.endswith("```"):
+            payload = prompt[:-3].rsplit("```", 1)[-1]
+        else:
+            payload = prompt.splitlines()[-1]
+        words = []
+        for line in payload.splitlines():
+            if line.strip().startswith("{"):
+                words.append(json.loads(line)[KEY_FIELD])
+            else:
+                words.extend(word.strip() for word in line.split(";") if word.strip())
+        return words
+
+    def answer(self, prompt: str) -> str:
+        fields = FIELD_PATTERN.findall(prompt)
+        rows = (
+            {field: self.notes[normalize_word(word)][field] for field in fields}
+            for word in self._words(prompt)
+        )
+        return "\n".join(json.dumps(row, ensure_ascii=False) for row in rows)
+
+    async def __call__(self, prompt_value) -> str:
+        prompt = prompt_value.to_string()
+        answer = self.answer(prompt)
+        completion_tokens = approximate_tokens(answer)
+        self.calls += 1
+        self.prompt_tokens += approximate_tokens(prompt)
+        self.completion_tokens += completion_tokens
+        latency = self.call_latency + completion_tokens * self.token_latency
+        await asyncio.sleep(latency * self.time_scale)
+        return answer
+
+
+def load_notes(args: argparse.Namespace) -> List[Record]:
+    if args.fixture:
+        with open(args.fixture, encoding="utf-8") as file:
+            notes = [json.loads(line) for line in file if line.strip()]
+        return notes[: args.words]
+    return [
+        {key: value or "NONE" for key, value in note.items()}
+        for note in synthetic_notes(args.words)
+    ]
+
+
+def bench_mode(mode: str, notes: List[Record], args: argparse.Namespace) -> Dict:
+    llm = ReplayLLM(notes, args.call_latency, args.token_latency, args.time_scale)
+    pipeline = Pipeline(RunnableLambda(llm), stages=MODES[mode], stream=False)
+    start = time.perf_counter()
+    outputs = pipeline.run({"input_text": "\n".join(n[KEY_FIELD] for n in notes)})
+    elapsed = (time.perf_counter() - start) / args.time_scale
+    assert len(outputs_to_notes(outputs)) == len(notes)
+    per_100 = 100 / len(notes)
+    return {
+        "calls": llm.calls * per_100,
+        "prompt_tokens": llm.prompt_tokens * per_100,
+        "completion_tokens": llm.completion_tokens * per_100,
+        "latency": elapsed * per_100,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=100)
+    parser.add_argument("--fixture", help="JSON Lines file of recorded notes")
+    parser.add_argument("--call-latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.0125)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    args = parser.parse_args()
+
+    notes = load_notes(args)
+    print(f"words: {len(notes)}, figures per 100 words")
+    print(
+        f"{'mode':10} {'calls':>6} {'prompt tok':>11} {'output tok':>11} {'latency':>9}"
+    )
+    for mode in MODES:
+        result = bench_mode(mode, notes, args)
+        print(
+            f"{mode:10} {result['calls']:6.1f} {result['prompt_tokens']:11,.0f} "
+            f"{result['completion_tokens']:11,.0f} {result['latency']:8.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
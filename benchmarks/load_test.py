@@ -0,0 +1,104 @@
+"""Load test of the whole generation flow against the deterministic fake LLM.
+
+Pushes `--words` synthetic words through extraction and note generation with
+`BatchRunner` and a `FakeChatModel`, merges the notes into a `GermanDeck` and
+saves it to the database and .apkg file, then reports words per second for
+each phase and overall. The fake model's latency, error and malformed-row
+rates are configurable, so the same run measures the local parsing, retry
+and persistence overhead (the default, no latency) or a modeled API.
+
+Usage:
+    python -m benchmarks.load_test --words 100000
+    python -m benchmarks.load_test --words 10000 --latency 0.5 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from anki import instrumentation
+from anki.batching import BatchRunner, merge_into_deck
+from anki.fake_llm import FakeChatModel
+from anki.german_deck import GermanDeck
+from anki.pipeline import MODES, Pipeline
+
+DECK_ID = 2059400110
+MODEL_ID = 1607392319
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--mode", choices=list(MODES), default="chain")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--chunk-size", type=int, default=64, help="characters per streamed chunk"
+    )
+    parser.add_argument("--no-stream", action="store_true")
+    args = parser.parse_args()
+
+    words = [f"das Wort{i}" for i in range(args.words)]
+    llm = FakeChatModel(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        chunk_size=args.chunk_size,
+    )
+    runner = BatchRunner(
+        Pipeline(
+            llm,
+            stages=MODES[args.mode],
+            max_concurrency=args.concurrency,
+            stream=not args.no_stream,
+        ),
+        max_workers=args.workers,
+        max_tokens=args.max_tokens,
+        backoff_base=0.01,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir, instrumentation.recording() as rec:
+        deck = GermanDeck(DECK_ID, MODEL_ID, str(Path(tmp_dir) / "deck"), "sqlite3")
+        timings = {}
+        start = time.perf_counter()
+        results = asyncio.run(runner.arun(words))
+        timings["llm pipeline"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        notes = merge_into_deck(results, deck)
+        timings["merge into deck"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        deck.save_deck()
+        timings["save_deck"] = time.perf_counter() - start
+
+    spans = rec.summary()["spans"]
+    parse_s = sum(
+        stats.get("parse_s", 0)
+        for name, stats in spans.items()
+        if name.startswith("stage.")
+    )
+    failed = sum(not result.ok for result in results)
+    missing = sum(len(result.missing) for result in results)
+    print(
+        f"words: {args.words}, mode: {args.mode}, chunks: {len(results)}, "
+        f"LLM calls: {llm.calls}"
+    )
+    print(f"notes: {notes}, failed chunks: {failed}, words without a note: {missing}")
+    for name, seconds in timings.items():
+        print(f"{name:16} {seconds:8.2f}s {args.words / seconds:12,.0f} words/s")
+    total = sum(timings.values())
+    print(f"{'total':16} {total:8.2f}s {args.words / total:12,.0f} words/s")
+    print(f"of which parsing LLM answers: {parse_s:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
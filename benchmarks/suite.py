@@ -0,0 +1,212 @@
+"""Benchmark suite for the deck, database and export hot paths, with baselines.
+
+Every case runs at each of the `--sizes` synthetic note counts. Its time is
+the best of several runs for fast cases (see `MIN_TIME`), and its peak memory
+is traced with tracemalloc in a separate run, so the tracing overhead does not
+distort the timings. Setup such as filling the database is not measured. The
+default `sqlite3` backend is the one the command line uses; per-row inserts
+through SQLAlchemy take minutes at 100k notes.
+
+Results are compared with a JSON baseline file holding the results of each
+backend keyed by case and size, e.g. "db.load_notes@10000". A case fails when
+its time exceeds the baseline by more than `--time-threshold` or its peak memory by
+more than `--memory-threshold` (fractions of the baseline), and the runner
+then exits with status 1. Baselines depend on the machine, so record one
+before changing the code and compare against it afterwards:
+
+Usage:
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite
+    python -m benchmarks.suite --sizes 1000 10000 --cases db.load_notes
+"""
+
+import argparse
+import gc
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from anki.german_deck import GermanDeck
+from anki.german_deck_db import BACKENDS, GermanDeckDatabase
+from benchmarks.synthetic import synthetic_notes
+
+DECK_ID = 2059400110
+MODEL_ID = 1607392319
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# Timed runs of a case are repeated until they took this many seconds in total
+MIN_TIME = 1.0
+MAX_RUNS = 5
+# Time differences below this many seconds are noise, never a regression
+MIN_TIME_DELTA = 0.01
+
+# A case prepares its inputs in a directory and returns the function to measure
+Case = Callable[[Path, int, str], Callable[[], object]]
+
+
+def _deck(tmp_dir: Path, backend: str) -> GermanDeck:
+    return GermanDeck(DECK_ID, MODEL_ID, str(tmp_dir / "deck"), backend)
+
+
+def _filled_db(tmp_dir: Path, size: int, backend: str) -> None:
+    db = GermanDeckDatabase(str(tmp_dir / "deck.db"), backend)
+    db.add_notes(synthetic_notes(size))
+    db.close()
+
+
+def deck_add_note(tmp_dir: Path, size: int, backend: str) -> Callable[[], object]:
+    deck = _deck(tmp_dir, backend)
+    notes = list(synthetic_notes(size))
+    return lambda: [deck.add_note(**note) for note in notes]
+
+
+def deck_save_deck(tmp_dir: Path, size: int, backend: str) -> Callable[[], object]:
+    deck = _deck(tmp_dir, backend)
+    for note in synthetic_notes(size):
+        deck.add_note(**note)
+    return deck.save_deck
+
+
+def deck_load_deck(tmp_dir: Path, size: int, backend: str) -> Callable[[], object]:
+    _filled_db(tmp_dir, size, backend)
+    return _deck(tmp_dir, backend).load_deck
+
+
+def deck_save_to_apkg(tmp_dir: Path, size: int, backend: str) -> Callable[[], object]:
+    _filled_db(tmp_dir, size, backend)
+    deck = _deck(tmp_dir, backend)
+    deck.load_deck()
+    return deck.save_to_apkg
+
+
+def db_add_note(tmp_dir: Path, size: int, backend: str) -> Callable[[], object]:
+    db = GermanDeckDatabase(str(tmp_dir / "deck.db"), backend)
+    notes = list(synthetic_notes(size))
+    return lambda: [db.add_note(**note) for note in notes]
+
+
+def db_load_notes(tmp_dir: Path, size: int, backend: str) -> Callable[[], object]:
+    _filled_db(tmp_dir, size, backend)
+    return GermanDeckDatabase(str(tmp_dir / "deck.db"), backend).load_notes
+
+
+CASES: Dict[str, Case] = {
+    "deck.add_note": deck_add_note,
+    "deck.save_deck": deck_save_deck,
+    "deck.load_deck": deck_load_deck,
+    "deck.save_to_apkg": deck_save_to_apkg,
+    "db.add_note": db_add_note,
+    "db.load_notes": db_load_notes,
+}
+
+
+def measure(case: Case, size: int, backend: str) -> Dict[str, float]:
+    """Return the best wall time in seconds and the peak traced memory in MiB."""
+    times: List[float] = []
+    while len(times) < MAX_RUNS and sum(times) < MIN_TIME:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            func = case(Path(tmp_dir), size, backend)
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    seconds = min(times)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        func = case(Path(tmp_dir), size, backend)
+        gc.collect()
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"seconds": round(seconds, 4), "peak_mib": round(peak / 2**20, 2)}
+
+
+def regressions(
+    result: Dict[str, float],
+    baseline: Dict[str, float],
+    time_threshold: float,
+    memory_threshold: float,
+) -> List[str]:
+    """Describe each metric of a result exceeding its baseline by the threshold."""
+    found = []
+    for metric, threshold in (
+        ("seconds", time_threshold),
+        ("peak_mib", memory_threshold),
+    ):
+        if result[metric] > baseline[metric] * (1 + threshold) and not (
+            metric == "seconds" and result[metric] - baseline[metric] < MIN_TIME_DELTA
+        ):
+            change = result[metric] / baseline[metric] - 1
+            found.append(
+                f"{metric} {baseline[metric]} -> {result[metric]} (+{change:.0%})"
+            )
+    return found
+
+
+def run(args: argparse.Namespace) -> Tuple[Dict[str, Dict[str, float]], List[str]]:
+    """Run the selected cases, printing each result next to its baseline."""
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()).get(args.backend, {})
+
+    results: Dict[str, Dict[str, float]] = {}
+    failures: List[str] = []
+    print(f"backend: {args.backend}")
+    print(f"{'case':28} {'time':>10} {'peak':>12}   baseline")
+    for name in args.cases:
+        for size in args.sizes:
+            key = f"{name}@{size}"
+            result = results[key] = measure(CASES[name], size, args.backend)
+            line = f"{key:28} {result['seconds']:9.3f}s {result['peak_mib']:8.1f} MiB"
+            if key in baseline:
+                found = regressions(
+                    result, baseline[key], args.time_threshold, args.memory_threshold
+                )
+                failures.extend(f"{key}: {regression}" for regression in found)
+                line += "   REGRESSION" if found else "   ok"
+            print(line)
+    return results, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--backend", choices=list(BACKENDS), default="sqlite3")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="record the results as the new baseline instead of comparing",
+    )
+    parser.add_argument("--time-threshold", type=float, default=0.25)
+    parser.add_argument("--memory-threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results, failures = run(args)
+    if args.save_baseline:
+        # Keep the baselines of backends, cases and sizes not run this time
+        baseline = {}
+        if args.baseline.exists():
+            baseline = json.loads(args.baseline.read_text())
+        baseline.setdefault(args.backend, {}).update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"baseline saved to {args.baseline}")
+    elif not args.baseline.exists():
+        print(f"no baseline at {args.baseline}, run with --save-baseline first")
+
+    if failures:
+        print("regressions:", *failures, sep="\n  ")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""Module with synthetic vocabulary data for benchmarks"""
+
+from typing import Dict, Iterator, Optional
+
+
+def synthetic_notes(count: int) -> Iterator[Dict[str, Optional[str]]]:
+    """Generate `count` distinct note rows shaped like real vocabulary notes.
+
+    Args:
+        count (int): The number of notes to generate.
+
+    Yields:
+        Dict[str, Optional[str]]: A note row keyed by `notes` table column name.
+    """
+    for i in range(count):
+        yield {
+            "german_word": f"das Wort{i}",
+            "translation": f"the word {i}",
+            "german_sentence": f"Das Wort{i} steht in einem einfachen Satz.",
+            "english_sentence": f"The word {i} is in a simple sentence.",
+            "other_forms": f"die Wörter{i}",
+        }
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+# Text identifying each template in a rendered prompt
+STAGE_MARKERS = {
+    "notes": "create one flashcard",
+    "german_words": "extract all German words",
+    "english_words": "translate the following German text into English",
+    "german_sentences": "generate exactly one simple",
+    "english_sentences": "into simple and clear English",
+    "other_forms": "past forms",
+}
+
+
+def _payload(text):
+    """Return the variable part of a rendered prompt."""
+    text = text.strip()
+    if text.endswith("```"):
+        return text[:-3].rsplit("```", 1)[1]
+    return text.splitlines()[-1]
+
+
+def _words(payload):
+    """Return the words of a prompt payload: a word list or JSON Lines records."""
+    words = []
+    for line in payload.splitlines():
+        if line.strip().startswith("{"):
+            words.append(json.loads(line)["german_word"])
+        else:
+            words.extend(word.strip() for word in line.split(";") if word.strip())
+    return words
+
+
+class FakeLLM:
+    """Async fake LLM answering each template with records derived from its input."""
+
+    def __init__(self, delay=0.0, failures=0, malformed=()):
+        self.delay = delay
+        self.failures = failures
+        # Words whose row is broken the first time each stage answers for them
+        self.malformed = {
+            (stage, word) for stage in STAGE_MARKERS for word in malformed
+        }
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def record(self, stage, word):
+        if stage == "german_words":
+            return {"german_word": word}
+        if stage == "english_words":
+            return {"german_word": word, "translation": f"en {word}"}
+        if stage == "german_sentences":
+            return {"german_word": word, "german_sentence": f"Satz mit {word}."}
+        if stage == "english_sentences":
+            return {"german_word": word, "english_sentence": f"Sentence with {word}."}
+        if stage == "other_forms":
+            return {"german_word": word, "other_forms": "NONE"}
+        return {
+            key: value
+            for name in ("english_words", "german_sentences", "english_sentences")
+            for key, value in self.record(name, word).items()
+        } | {"other_forms": "NONE"}
+
+    def answer(self, stage, payload):
+        rows = []
+        for word in _words(payload):
+            row = json.dumps(self.record(stage, word), ensure_ascii=False)
+            if (stage, word) in self.malformed:
+                self.malformed.discard((stage, word))
+                row = row.replace('", "', '" "')
+            rows.append(row)
+        return "\n".join(rows)
+
+    async def __call__(self, prompt):
+        text = prompt.to_string()
+        stage = next(key for key, marker in STAGE_MARKERS.items() if marker in text)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        self.calls.append(stage)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("rate limited")
+        return self.answer(stage, _payload(text))
+
+    def runnable(self):
+        return RunnableLambda(self.__call__)
+
+
+@pytest.fixture
+def fake_llm():
+    """Fixture returning a factory for fake LLMs."""
+    return FakeLLM
@@ -0,0 +1,133 @@
+import sqlite3
+import zipfile
+
+import genanki
+import pytest
+
+from anki.apkg_export import write_incremental_package
+from anki.german_model import GermanModel
+
+
+def make_note(model, word, sentence="Ein Satz."):
+    return genanki.Note(
+        model=model,
+        fields=[word, f"{word} (en)", sentence, "A sentence.", ""],
+    )
+
+
+def read_package(apkg_path, tmp_path):
+    """Return {guid: (note id, fields)} and the card note ids of an .apkg file."""
+    with zipfile.ZipFile(apkg_path) as package:
+        assert sorted(package.namelist()) == ["collection.anki2", "media"]
+        package.extract("collection.anki2", tmp_path / "extracted")
+    connection = sqlite3.connect(tmp_path / "extracted" / "collection.anki2")
+    notes = {
+        guid: (note_id, fields.split("\x1f"))
+        for note_id, guid, fields in connection.execute(
+            "SELECT id, guid, flds FROM notes"
+        )
+    }
+    card_nids = [nid for (nid,) in connection.execute("SELECT nid FROM cards")]
+    tables = {name for (name,) in connection.execute("SELECT name FROM sqlite_master")}
+    connection.close()
+    return notes, card_nids, tables
+
+
+@pytest.fixture
+def deck():
+    deck = genanki.Deck(2059400110, "German Vocabulary")
+    model = GermanModel(1607392319)
+    for word in ["lernen", "lesen", "schreiben"]:
+        deck.add_note(make_note(model, word))
+    return deck
+
+
+def test_first_export_builds_full_collection(deck, tmp_path):
+    """Test that the first incremental export writes every note."""
+    apkg_path = tmp_path / "deck.apkg"
+
+    counts = write_incremental_package(deck, apkg_path, tmp_path / "deck.build.anki2")
+
+    assert counts == (3, 0, 0)
+    notes, card_nids, tables = read_package(apkg_path, tmp_path)
+    assert {fields[0] for _, fields in notes.values()} == {
+        "lernen",
+        "lesen",
+        "schreiben",
+    }
+    assert len(card_nids) == 6
+    assert "build_index" not in tables
+
+
+def test_export_applies_only_changes(deck, tmp_path):
+    """Test that a re-export inserts, updates and deletes only the changed notes."""
+    apkg_path = tmp_path / "deck.apkg"
+    cache_path = tmp_path / "deck.build.anki2"
+    write_incremental_package(deck, apkg_path, cache_path)
+    before, _, _ = read_package(apkg_path, tmp_path / "before")
+
+    model = deck.notes[0].model
+    lernen, lesen, schreiben = deck.notes
+    edited = make_note(model, "lesen", "Ich lese ein Buch.")
+    edited.guid = lesen.guid
+    deck.notes = [lernen, edited, make_note(model, "sprechen")]
+
+    counts = write_incremental_package(deck, apkg_path, cache_path)
+
+    assert counts == (1, 1, 1)
+    after, card_nids, _ = read_package(apkg_path, tmp_path / "after")
+    assert set(after) == {lernen.guid, lesen.guid, deck.notes[2].guid}
+    assert after[lernen.guid] == before[lernen.guid]
+    assert after[lesen.guid][1][2] == "Ich lese ein Buch."
+    assert sorted(card_nids) == sorted(
+        note_id for note_id, _ in after.values() for _ in range(2)
+    )
+
+
+def test_unchanged_export_writes_nothing(deck, tmp_path):
+    """Test that re-exporting an unchanged deck touches no notes."""
+    apkg_path = tmp_path / "deck.apkg"
+    cache_path = tmp_path / "deck.build.anki2"
+    write_incremental_package(deck, apkg_path, cache_path)
+
+    assert write_incremental_package(deck, apkg_path, cache_path) == (0, 0, 0)
+
+
+def test_model_change_forces_rebuild(deck, tmp_path):
+    """Test that the cache is discarded when the deck definition changes."""
+    apkg_path = tmp_path / "deck.apkg"
+    cache_path = tmp_path / "deck.build.anki2"
+    write_incremental_package(deck, apkg_path, cache_path)
+
+    deck.name = "German Vocabulary B1"
+
+    assert write_incremental_package(deck, apkg_path, cache_path) == (3, 0, 0)
+
+
+class CountingNotes(list):
+    """Note list that counts how often it is iterated."""
+
+    passes = 0
+
+    def __iter__(self):
+        self.passes += 1
+        return super().__iter__()
+
+
+@pytest.mark.parametrize("max_kept_notes", [10_000, 0])
+def test_export_reads_notes_once(deck, tmp_path, monkeypatch, max_kept_notes):
+    """Test that a warm export reads the notes once, unless many changed."""
+    monkeypatch.setattr("anki.apkg_export.MAX_KEPT_NOTES", max_kept_notes)
+    apkg_path = tmp_path / "deck.apkg"
+    cache_path = tmp_path / "deck.build.anki2"
+    write_incremental_package(deck, apkg_path, cache_path)
+
+    lernen, lesen, schreiben = deck.notes
+    edited = make_note(lesen.model, "lesen", "Ich lese ein Buch.")
+    edited.guid = lesen.guid
+    deck.notes = CountingNotes([lernen, edited, schreiben])
+
+    assert write_incremental_package(deck, apkg_path, cache_path) == (0, 1, 0)
+    assert deck.notes.passes == (1 if max_kept_notes else 2)
+    notes, _, _ = read_package(apkg_path, tmp_path)
+    assert notes[lesen.guid][1][2] == "Ich lese ein Buch."
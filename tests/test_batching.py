@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+from anki.batching import BatchResult, BatchRunner, chunk_lines, merge_into_deck
+from anki.german_deck import GermanDeck
+from anki.pipeline import Pipeline
+
+WORDS = [f"Wort{i}" for i in range(16)]
+
+
+def test_chunk_lines_respects_token_budget():
+    """Test that lines are packed in order without exceeding the budget."""
+    chunks = chunk_lines(["a" * 8, "", "b" * 8, "c" * 8, "d" * 40], max_tokens=6)
+
+    assert chunks == [["a" * 8, "b" * 8], ["c" * 8], ["d" * 40]]
+
+
+def test_chunk_lines_with_custom_token_counter():
+    """Test that a custom token counter decides the chunk boundaries."""
+    chunks = chunk_lines(WORDS[:6], max_tokens=4, count_tokens=lambda text: 1)
+
+    assert chunks == [WORDS[0:2], WORDS[2:4], WORDS[4:6]]
+
+
+def test_failed_chunk_is_retried(fake_llm):
+    """Test that a chunk succeeds after transient LLM errors."""
+    llm = fake_llm(failures=2)
+    runner = BatchRunner(Pipeline(llm.runnable()), max_retries=3, backoff_base=0)
+
+    (result,) = runner.run(["der Hund"])
+
+    assert result.ok
+    assert result.attempts == 3
+    assert result.notes[0]["german_word"] == "der Hund"
+
+
+def test_chunk_failure_is_recorded_after_retries(fake_llm):
+    """Test that a chunk gives up after max_retries and keeps its error."""
+    llm = fake_llm(failures=100)
+    runner = BatchRunner(Pipeline(llm.runnable()), max_retries=2, backoff_base=0)
+
+    (result,) = runner.run(["der Hund"])
+
+    assert not result.ok
+    assert result.attempts == 3
+    assert isinstance(result.error, RuntimeError)
+
+
+def test_merge_is_deterministic(fake_llm):
+    """Test that notes are merged in input order and repeated words only once."""
+    runner = BatchRunner(
+        Pipeline(fake_llm(delay=0.01).runnable()),
+        max_workers=4,
+        max_tokens=6,
+        input_key="german_words",
+    )
+    results = runner.run([*WORDS, "wort3"])
+    deck = GermanDeck(1, 2, "unused")
+
+    added = merge_into_deck(reversed(results), deck)
+
+    assert added == len(WORDS)
+    assert [note.fields[0] for note in deck.deck.notes] == WORDS
+    assert deck.deck.notes[0].fields[2] == "Satz mit Wort0."
+
+
+def test_merge_keeps_words_differing_in_article_or_umlaut():
+    """Test that only words with the same normalized form are merged."""
+
+    def note(word):
+        return {
+            "german_word": word,
+            "translation": "-",
+            "german_sentence": "-",
+            "english_sentence": "-",
+            "other_forms": "",
+        }
+
+    results = [
+        BatchResult(0, [], notes=[note("der See"), note("Mutter")]),
+        BatchResult(1, [], notes=[note("die See"), note("Mütter"), note("Der  see")]),
+    ]
+    deck = GermanDeck(1, 2, "unused")
+
+    assert merge_into_deck(results, deck) == 4
+    assert [note.fields[0] for note in deck.deck.notes] == [
+        "der See",
+        "Mutter",
+        "die See",
+        "Mütter",
+    ]
+
+
+def test_throughput_scales_with_workers(fake_llm):
+    """Test that more workers process the same chunks faster."""
+
+    def elapsed(workers):
+        runner = BatchRunner(
+            Pipeline(fake_llm(delay=0.1).runnable()),
+            max_workers=workers,
+            max_tokens=6,
+            input_key="german_words",
+        )
+        start = time.perf_counter()
+        results = runner.run(WORDS)
+        assert len(results) == 8 and all(result.ok for result in results)
+        return time.perf_counter() - start
+
+    assert elapsed(8) < elapsed(1) / 2
+
+
+def test_astream_reads_input_lazily(fake_llm):
+    """Test that only a bounded number of chunks is read ahead of the results."""
+    read = []
+
+    def lines():
+        for i in range(1000):
+            read.append(i)
+            yield f"Wort{i}"
+
+    async def first_results():
+        stream = runner.astream(lines())
+        results = [await stream.__anext__() for _ in range(2)]
+        await stream.aclose()
+        return results
+
+    runner = BatchRunner(
+        Pipeline(fake_llm().runnable()),
+        max_workers=2,
+        max_tokens=6,
+        input_key="german_words",
+    )
+    results = asyncio.run(first_results())
+
+    assert [result.lines for result in results] == [WORDS[0:2], WORDS[2:4]]
+    # Two chunks ahead per worker, refilled as results are taken
+    assert len(read) < 20
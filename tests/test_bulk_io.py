@@ -0,0 +1,161 @@
+import json
+
+import pytest
+
+from anki.bulk_io import export_notes, import_notes, read_notes, validate_note
+from anki.german_deck_db import GermanDeckDatabase, NoteModel
+from anki.storage import NOTE_FIELDS, OPTIONAL_FIELDS
+
+NOTES = [
+    {
+        "german_word": "der Hund",
+        "translation": "the dog",
+        "german_sentence": 'Der Hund sagt "wau", dann schläft er.',
+        "english_sentence": "The dog says\n'woof', then sleeps.",
+        "other_forms": "die Hunde",
+    },
+    {
+        "german_word": "schnell",
+        "translation": "fast",
+        "german_sentence": "Er läuft schnell.",
+        "english_sentence": "He runs fast.",
+        "other_forms": None,
+    },
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Fixture for a database with the test notes."""
+    db = GermanDeckDatabase(tmp_path / "source.db", backend="sqlite3")
+    db.add_notes(NOTES)
+    yield db
+    db.close()
+
+
+def _fields(db):
+    return [note._asdict() for note in db.iter_notes()]
+
+
+@pytest.mark.parametrize("format", ["jsonl", "csv", "parquet"])
+@pytest.mark.parametrize("backend", ["sqlite3", "sqlalchemy"])
+def test_notes_round_trip(db, tmp_path, format, backend):
+    """Test that exported notes import into another database unchanged."""
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"notes.{format}")
+
+    assert export_notes(db, path, batch_size=1) == 2
+
+    target = GermanDeckDatabase(tmp_path / "target.db", backend=backend)
+    stats = import_notes(target, path, batch_size=1)
+    assert (stats.rows, stats.stored, stats.invalid) == (2, 2, 0)
+    assert _fields(target) == NOTES
+    assert [note.german_word for note in target.search_sentences("schlaft")] == [
+        "der Hund"
+    ]
+    target.close()
+
+
+def test_invalid_rows_store_nothing_unless_skipped(db, tmp_path):
+    """Test that an invalid row fails the import, or is counted and skipped."""
+    path = tmp_path / "notes.jsonl"
+    rows = [
+        json.dumps({**NOTES[1], "german_word": "langsam"}),
+        "",
+        json.dumps({**NOTES[1], "translation": " "}),
+        "{not json",
+        json.dumps({**NOTES[1], "german_word": "leise", "extra": 1}),
+    ]
+    path.write_text("\n".join(rows), encoding="utf-8")
+
+    with pytest.raises(ValueError, match=r"notes.jsonl:3: field 'translation'"):
+        import_notes(db, str(path))
+    assert db.count_notes() == 2
+
+    stats = import_notes(db, str(path), skip_invalid=True)
+    assert (stats.rows, stats.stored, stats.invalid) == (4, 2, 2)
+    assert stats.errors[1].startswith(f"{path}:4: invalid JSON: ")
+    assert db.count_notes() == 4
+
+
+def test_csv_checks_columns(tmp_path):
+    """Test that CSV files need the NOT NULL columns and well-formed rows."""
+    path = tmp_path / "notes.csv"
+    path.write_text("german_word,translation\nHund,dog\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="no column 'german_sentence'"):
+        list(read_notes(str(path)))
+
+    path.write_text(
+        "german_word,translation,german_sentence,english_sentence\n"
+        "Hund,dog,Der Hund.,The dog.\n"
+        "Katze,cat\n",
+        encoding="utf-8",
+    )
+    with pytest.raises(ValueError, match="notes.csv:3: expected 4 columns, got 2"):
+        list(read_notes(str(path)))
+
+
+def test_csv_with_byte_order_mark(tmp_path):
+    """Test that a CSV file starting with a UTF-8 byte order mark is read."""
+    path = tmp_path / "notes.csv"
+    path.write_text(
+        "german_word,translation,german_sentence,english_sentence\n"
+        "Hund,dog,Der Hund.,The dog.\n",
+        encoding="utf-8-sig",
+    )
+    (note,) = read_notes(str(path))
+    assert note["german_word"] == "Hund"
+
+
+def test_validation_follows_note_model():
+    """Test that only the nullable columns of `NoteModel` may be missing."""
+    nullable = {
+        column.name
+        for column in NoteModel.__table__.columns
+        if column.nullable and not column.primary_key
+    }
+    assert nullable == set(OPTIONAL_FIELDS)
+
+    row = dict.fromkeys(NOTE_FIELDS, "x")
+    assert validate_note({**row, "other_forms": ""})["other_forms"] is None
+    for name in set(NOTE_FIELDS) - nullable:
+        for value in (None, "", 1):
+            with pytest.raises(ValueError, match=repr(name)):
+                validate_note({**row, name: value})
+    with pytest.raises(ValueError, match="expected an object, got list"):
+        validate_note([])
+
+
+def test_bulk_import_keeps_search_index_consistent(db, tmp_path):
+    """Test a new word repeated within and across batches of a bulk import."""
+    path = tmp_path / "notes.jsonl"
+    cat = {**NOTES[1], "german_word": "die Katze"}
+    rows = [
+        {**cat, "german_sentence": "Die Katze rennt."},
+        {**cat, "german_sentence": "Die Katze frisst."},
+        {**NOTES[0], "german_sentence": "Der Hund spielt."},
+        {**cat, "german_sentence": "Die Katze spielt."},
+    ]
+    path.write_text("\n".join(map(json.dumps, rows)), encoding="utf-8")
+
+    assert import_notes(db, str(path), batch_size=2).stored == 3
+
+    connection = db.backend.connection
+    connection.execute("INSERT INTO notes_fts (notes_fts) VALUES ('integrity-check')")
+    assert [note.german_word for note in db.search_sentences("spielt")] == [
+        "der Hund",
+        "die Katze",
+    ]
+    assert db.search_sentences("rennt") == db.search_sentences("frisst") == []
+    # The insert trigger is back for later writes
+    db.add_note("die Maus", "the mouse", "Die Maus schläft.", "The mouse sleeps.")
+    assert len(db.search_sentences("Maus")) == 1
+
+
+def test_unknown_format_is_rejected(db, tmp_path):
+    """Test that the format must be given when the suffix does not tell it."""
+    with pytest.raises(ValueError, match="Unknown format"):
+        export_notes(db, str(tmp_path / "notes.txt"))
+    assert not (tmp_path / "notes.txt").exists()
+    assert export_notes(db, str(tmp_path / "notes.txt"), format="csv") == 2
@@ -0,0 +1,234 @@
+import json
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from anki import cli
+from anki.german_deck_db import GermanDeckDatabase
+
+
+@pytest.fixture
+def deck(tmp_path):
+    """Fixture for a deck base path with one stored note."""
+    deck = tmp_path / "vocabulary"
+    db = GermanDeckDatabase(deck.with_suffix(".db"), backend="sqlite3")
+    db.add_note("der Hund", "the dog", "Der Hund bellt.", "The dog barks.", "die Hunde")
+    db.close()
+    return deck
+
+
+def test_stats_reports_stored_notes(deck, capsys):
+    """Test that stats prints the number of stored notes."""
+    assert cli.main(["stats", "--deck", str(deck)]) == 0
+
+    output = capsys.readouterr().out
+    assert "notes: 1" in output
+    assert "vocabulary.apkg: missing" in output
+
+
+def test_ingest_skips_known_and_repeated_lines(deck, tmp_path, capsys):
+    """Test that ingest prints only the new, unique input lines."""
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("Hund\nlernen\n\nLernen\nschnell\n", encoding="utf-8")
+
+    assert cli.main(["ingest", str(input_file), "--deck", str(deck)]) == 0
+
+    assert capsys.readouterr().out == "lernen\nschnell\n"
+
+
+def test_generate_stores_and_exports_notes(deck, tmp_path, fake_llm, monkeypatch):
+    """Test that generate runs new lines through the pipeline into the deck."""
+    monkeypatch.setattr(cli, "_chat_model", lambda args, cache: fake_llm().runnable())
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("der Hund\nlernen\nschnell\n", encoding="utf-8")
+
+    args = ["generate", str(input_file), "--deck", str(deck), "--no-cache"]
+    assert cli.main(args) == 0
+
+    db = GermanDeckDatabase(deck.with_suffix(".db"), backend="sqlite3")
+    assert [note.german_word for note in db.iter_notes()] == [
+        "der Hund",
+        "lernen",
+        "schnell",
+    ]
+    assert deck.with_suffix(".apkg").exists()
+
+
+def test_export_writes_package(deck):
+    """Test that export writes the stored notes to the .apkg file."""
+    assert cli.main(["export", "--deck", str(deck)]) == 0
+
+    assert deck.with_suffix(".apkg").exists()
+
+
+def test_stats_does_not_import_heavy_dependencies(deck):
+    """Test that stats runs without importing langchain, genanki or SQLAlchemy."""
+    code = (
+        "import sys; from anki.cli import main; "
+        f"main(['stats', '--deck', {str(deck)!r}]); "
+        "print(sorted(m for m in ('genanki', 'langchain_core', 'sqlalchemy') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.splitlines()[-1] == "[]"
+
+
+def test_generate_writes_metrics_summary(deck, tmp_path, fake_llm, monkeypatch):
+    """Test that --metrics writes per-stage and database timings as JSON."""
+    monkeypatch.setattr(cli, "_chat_model", lambda args, cache: fake_llm().runnable())
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("lernen\nschnell\n", encoding="utf-8")
+    metrics = tmp_path / "metrics.json"
+    trace = tmp_path / "trace.jsonl"
+
+    assert (
+        cli.main(
+            [
+                "generate",
+                str(input_file),
+                "--deck",
+                str(deck),
+                "--metrics",
+                str(metrics),
+                "--trace",
+                str(trace),
+                "--no-cache",
+            ]
+        )
+        == 0
+    )
+
+    spans = json.loads(metrics.read_text())["spans"]
+    assert spans["stage.english_words"]["records"] == 2
+    assert spans["db.flush"]["records"] == 2
+    assert spans["deck.save_to_apkg"]["count"] == 1
+    names = {json.loads(line)["name"] for line in trace.read_text().splitlines()}
+    assert {"stage.german_words", "batch.chunk", "deck.load_deck"} <= names
+
+
+def test_export_with_specs_writes_one_package_per_spec(deck, tmp_path, capsys):
+    """Test that export --specs writes the package of every deck spec."""
+    specs_file = tmp_path / "specs.json"
+    specs_file.write_text(
+        json.dumps(
+            [
+                {"deck_id": 1, "name": "All", "apkg_path": str(tmp_path / "all.apkg")},
+                {
+                    "deck_id": 2,
+                    "name": "None",
+                    "apkg_path": str(tmp_path / "none.apkg"),
+                    "where": "german_word = ?",
+                    "parameters": ["die Katze"],
+                },
+            ]
+        )
+    )
+
+    assert cli.main(["export", "--deck", str(deck), "--specs", str(specs_file)]) == 0
+
+    output = capsys.readouterr().out
+    assert f"1 notes exported to {tmp_path / 'all.apkg'}" in output
+    assert f"0 notes exported to {tmp_path / 'none.apkg'}" in output
+
+
+def test_export_with_audio_adds_media(deck, tmp_path):
+    """Test that export --audio packages a sound file per note."""
+    media_dir = tmp_path / "media"
+
+    assert (
+        cli.main(
+            ["export", "--deck", str(deck), "--audio", "stub"]
+            + ["--media-dir", str(media_dir)]
+        )
+        == 0
+    )
+
+    with zipfile.ZipFile(deck.with_suffix(".apkg")) as package:
+        (name,) = json.loads(package.read("media")).values()
+    assert (media_dir / name[:2] / name).exists()
+
+
+def test_generate_with_fake_model_runs_offline(deck, tmp_path):
+    """Test that --model fake generates notes without an API or cache."""
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("lernen\nschnell\n", encoding="utf-8")
+
+    args = ["generate", str(input_file), "--deck", str(deck), "--model", "fake"]
+    assert cli.main(args + ["--no-cache"]) == 0
+
+    db = GermanDeckDatabase(deck.with_suffix(".db"), backend="sqlite3")
+    assert db.find_word("schnell").translation == "schnell (en)"
+
+
+def test_ingest_skips_words_of_anki_collection(deck, tmp_path, capsys):
+    """Test that ingest also skips the words of a given Anki package."""
+    from anki.german_deck import GermanDeck
+
+    existing = GermanDeck(2059400111, 1607392319, str(tmp_path / "existing"))
+    existing.add_note("lernen", "to learn", "-", "-", "-")
+    existing.save_to_apkg()
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("Hund\nlernen\nschnell\n", encoding="utf-8")
+
+    args = ["ingest", str(input_file), "--deck", str(deck)]
+    args += ["--known-collection", str(existing.apkg_path)]
+    assert cli.main(args) == 0
+
+    assert capsys.readouterr().out == "schnell\n"
+
+
+def test_dump_and_load_move_notes_between_decks(deck, tmp_path, capsys):
+    """Test that load stores the notes written by dump, and rejects bad rows."""
+    dump_file = tmp_path / "notes.csv"
+    assert cli.main(["dump", str(dump_file), "--deck", str(deck)]) == 0
+    with dump_file.open("a", encoding="utf-8") as file:
+        file.write("Katze,,Die Katze.,The cat.,\n")
+
+    other = tmp_path / "other"
+    assert cli.main(["load", str(dump_file), "--deck", str(other)]) == 1
+    assert "notes.csv:3: field 'translation'" in capsys.readouterr().err
+
+    args = ["load", str(dump_file), "--deck", str(other), "--skip-invalid"]
+    assert cli.main(args) == 0
+    assert "2 rows read, 1 notes stored, 1 invalid rows" in capsys.readouterr().err
+    db = GermanDeckDatabase(other.with_suffix(".db"), backend="sqlite3")
+    assert db.find_word("der Hund").other_forms == "die Hunde"
+
+
+def test_load_reports_unreadable_input(deck, tmp_path, monkeypatch, capsys):
+    """Test that load exits with status 1 on a missing file or missing pyarrow."""
+    missing = tmp_path / "missing.jsonl"
+    assert cli.main(["load", str(missing), "--deck", str(deck)]) == 1
+    assert "missing.jsonl" in capsys.readouterr().err
+
+    def no_pyarrow():
+        raise RuntimeError("Install pyarrow to read and write Parquet files")
+
+    monkeypatch.setattr("anki.bulk_io._pyarrow", no_pyarrow)
+    parquet = tmp_path / "notes.parquet"
+    parquet.touch()
+    assert cli.main(["load", str(parquet), "--deck", str(deck)]) == 1
+    assert "Install pyarrow" in capsys.readouterr().err
+
+
+def test_generate_closes_response_cache(deck, tmp_path, monkeypatch):
+    """Test that generate closes the response cache it opened."""
+    from anki.llm_cache import ResponseCache
+
+    closed = []
+    close = ResponseCache.close
+    monkeypatch.setattr(
+        ResponseCache, "close", lambda cache: closed.append(cache) or close(cache)
+    )
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("lernen\n", encoding="utf-8")
+    args = ["generate", str(input_file), "--deck", str(deck), "--model", "fake"]
+    args += ["--cache", str(tmp_path / "cache.db")]
+
+    assert cli.main(args) == 0
+    assert len(closed) == 1
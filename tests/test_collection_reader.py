@@ -0,0 +1,107 @@
+import sqlite3
+import sys
+import zipfile
+
+import genanki
+import pytest
+
+from anki.collection_reader import (
+    KnownVocabulary,
+    clean_field,
+    iter_note_words,
+    open_collection,
+)
+from anki.german_deck import GermanDeck
+
+BASIC_MODEL = genanki.Model(
+    1607392320,
+    "Basic",
+    fields=[{"name": "Back"}, {"name": "Front"}],
+    templates=[{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}],
+)
+
+
+@pytest.fixture
+def apkg(tmp_path):
+    """Fixture for a package with a German vocabulary note and a Basic note."""
+    deck = genanki.Deck(2059400111, "Existing")
+    deck.add_note(
+        genanki.Note(
+            model=BASIC_MODEL,
+            fields=["the girl", "<b>das&nbsp;Mädchen</b>[sound:m.mp3]"],
+        )
+    )
+    german = GermanDeck(2059400110, 1607392319, str(tmp_path / "unused"))
+    german.add_note("der Käse", "the cheese", "-", "-", "-")
+    for note in german.deck.notes:
+        deck.add_note(note)
+    deck.add_model(german.model)
+    path = tmp_path / "existing.apkg"
+    genanki.Package(deck).write_to_file(path)
+    return path
+
+
+def test_clean_field_removes_markup():
+    """Test that HTML tags, entities and sound tags are removed from fields."""
+    assert clean_field("<div>der&nbsp;<i>Hund</i></div>[sound:hund.mp3]") == "der Hund"
+
+
+def test_iter_note_words_reads_word_field_of_package_and_collection(apkg, tmp_path):
+    """Test that the word field is found by name in packages and collections."""
+    assert sorted(iter_note_words(apkg)) == ["das Mädchen", "der Käse"]
+
+    with zipfile.ZipFile(apkg) as package:
+        package.extract("collection.anki2", tmp_path)
+    assert sorted(iter_note_words(tmp_path / "collection.anki2")) == [
+        "das Mädchen",
+        "der Käse",
+    ]
+
+
+def test_iter_note_words_reads_current_schema(tmp_path):
+    """Test that field names are read from the `fields` table of newer collections."""
+    path = tmp_path / "collection.anki2"
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE notes (id INTEGER PRIMARY KEY, mid INTEGER, flds TEXT);
+        CREATE TABLE fields (ntid INTEGER, ord INTEGER, name TEXT);
+        INSERT INTO fields VALUES (1, 0, 'English'), (1, 1, 'Deutsch');
+        INSERT INTO notes VALUES (1, 1, 'to learn' || char(31) || 'lernen');
+        INSERT INTO notes VALUES (2, 2, 'noch einmal' || char(31) || 'once more');
+        """)
+    connection.commit()
+    connection.close()
+
+    assert list(iter_note_words(path)) == ["lernen", "noch einmal"]
+
+
+def test_open_collection_without_zstandard_explains(tmp_path, monkeypatch):
+    """Test that a compressed package without zstandard fails with a clear error."""
+    path = tmp_path / "new.apkg"
+    with zipfile.ZipFile(path, "w") as package:
+        package.writestr("collection.anki21b", b"")
+        package.writestr("collection.anki2", b"")
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+
+    with pytest.raises(RuntimeError, match="zstandard"):
+        with open_collection(path):
+            pass
+
+
+def test_german_deck_skips_vocabulary_words(apkg, tmp_path):
+    """Test that the deck reports stored words and words of the vocabulary as known."""
+    deck = GermanDeck(
+        2059400110,
+        1607392319,
+        str(tmp_path / "deck"),
+        db_backend="sqlite3",
+        vocabulary=KnownVocabulary.from_collections([apkg]),
+    )
+    deck.add_note("der Hund", "the dog", "-", "-", "-")
+    deck.save_deck()
+
+    assert deck.known_words(["Maedchen", "Käse", "Hund", "lernen"]) == {
+        "Maedchen",
+        "Käse",
+        "Hund",
+    }
@@ -0,0 +1,106 @@
+import pytest
+
+from anki import instrumentation
+from anki.batching import BatchRunner
+from anki.fake_llm import (
+    FakeChatModel,
+    FakeLLMError,
+    RecordingCallback,
+    load_recordings,
+)
+from anki.pipeline import MODES, Pipeline, outputs_to_notes
+from anki.templates import translate_template
+
+
+@pytest.mark.parametrize("mode", list(MODES))
+@pytest.mark.parametrize("stream", [True, False])
+def test_synthesized_answers_produce_complete_notes(mode, stream):
+    """Test that every stage gets schema-valid records for every word."""
+    llm = FakeChatModel()
+    pipeline = Pipeline(llm, stages=MODES[mode], stream=stream)
+
+    notes = outputs_to_notes(pipeline.run({"input_text": "der Hund\nnoch einmal"}))
+
+    assert [note["german_word"] for note in notes] == ["der Hund", "noch einmal"]
+    assert notes[0]["german_sentence"] == "Hier steht der Hund in einem Satz."
+    assert llm.calls == len(MODES[mode])
+
+
+def test_known_notes_are_answered_from_their_records():
+    """Test that a model created from notes answers with their fields."""
+    llm = FakeChatModel.from_notes(
+        [{"german_word": "der Hund", "translation": "the dog"}]
+    )
+
+    answer = llm.invoke(translate_template.format_messages(german_words="Der Hund"))
+
+    assert answer.content == '{"german_word": "Der Hund", "translation": "the dog"}'
+    assert answer.usage_metadata["output_tokens"] > 0
+
+
+def test_recorded_answers_are_replayed(tmp_path):
+    """Test that answers recorded from one model are replayed by another."""
+    path = str(tmp_path / "recordings.jsonl")
+    prompt = translate_template.format_messages(german_words="der Hund")
+    live = FakeChatModel.from_notes(
+        [{"german_word": "der Hund", "translation": "the dog"}],
+        callbacks=[RecordingCallback(path)],
+    )
+    recorded = live.invoke(prompt).content
+
+    replay = FakeChatModel(recordings=load_recordings(path))
+
+    assert replay.invoke(prompt).content == recorded
+    assert "the dog" in recorded
+
+
+def test_failures_are_deterministic():
+    """Test that the same seed fails the same calls, whatever the call order."""
+    prompts = [
+        translate_template.format_messages(german_words=f"Wort{i}") for i in range(20)
+    ]
+
+    def failed(order):
+        llm = FakeChatModel(error_rate=0.5, seed=3)
+        failures = set()
+        for i in order:
+            try:
+                llm.invoke(prompts[i])
+            except FakeLLMError:
+                failures.add(i)
+        return failures
+
+    forward = failed(range(20))
+    assert forward == failed(reversed(range(20)))
+    assert 0 < len(forward) < 20
+
+
+def test_streaming_failure_keeps_rows_received_before_it():
+    """Test that a failing stream breaks off after delivering part of the answer."""
+    llm = FakeChatModel(error_rate=1.0, chunk_size=8)
+    chunks = []
+
+    with pytest.raises(FakeLLMError):
+        for chunk in llm.stream(
+            translate_template.format_messages(german_words="Hund")
+        ):
+            chunks.append(chunk.content)
+
+    assert len(chunks) > 1
+
+
+def test_batch_runner_recovers_from_errors_and_malformed_rows():
+    """Test that retries turn a flaky model's answers into complete notes."""
+    llm = FakeChatModel(error_rate=0.2, malformed_rate=0.3, seed=1)
+    runner = BatchRunner(
+        Pipeline(llm, row_retries=5), max_tokens=20, max_retries=10, backoff_base=0
+    )
+    words = [f"das Wort{i}" for i in range(12)]
+
+    with instrumentation.recording() as recorder:
+        results = runner.run(words)
+
+    assert all(result.ok for result in results)
+    assert sum(len(result.notes) for result in results) == 12
+    spans = recorder.summary()["spans"]
+    assert spans["stage.german_words"]["prompt_tokens"] > 0
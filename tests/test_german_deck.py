@@ -1,9 +1,13 @@
+import sqlite3
+import zipfile
 from unittest.mock import MagicMock, patch
 
 import genanki
 import pytest
 
-from anki.german_deck import GermanDeck
+from anki.german_deck import DeckNote, GermanDeck
+from anki.german_deck_db import GermanDeckDatabase
+from anki.normalize import note_guid
 
 
 # Mock classes for GermanDeckDatabase and GermanModel since they are not provided
@@ -87,7 +91,7 @@ def test_add_note_to_deck(german_deck):
 
 def test_save_deck(german_deck):
     """Test saving the GermanDeck to a SQLite database."""
-    with patch("anki.german_deck_db.GermanDeckDatabase.add_note") as mock_add_note:
+    with patch("anki.german_deck_db.GermanDeckDatabase.add_notes") as mock_add_notes:
         german_deck.add_note(
             german_word="lernen",
             translation="to learn",
@@ -98,21 +102,75 @@ def test_save_deck(german_deck):
 
         german_deck.save_deck()
 
-        # Check if the mock database's add_note method was called
-        assert mock_add_note.called
-        mock_add_note.assert_called_once_with(
-            german_word="lernen",
-            translation="to learn",
-            german_sentence="Ich lerne Deutsch.",
-            english_sentence="I am learning German.",
-            other_forms="lernte, gelernt",
+        # Check if the database's bulk add_notes method was called with all notes
+        mock_add_notes.assert_called_once()
+        assert list(mock_add_notes.call_args.args[0]) == [
+            {
+                "german_word": "lernen",
+                "translation": "to learn",
+                "german_sentence": "Ich lerne Deutsch.",
+                "english_sentence": "I am learning German.",
+                "other_forms": "lernte, gelernt",
+            }
+        ]
+
+
+def test_failed_save_keeps_unsaved_notes(german_deck):
+    """Test that a save retried after the database failed stores the notes."""
+    german_deck.add_note("lernen", "to learn", "Ich lerne.", "I learn.", "")
+    with patch(
+        "anki.german_deck_db.GermanDeckDatabase.add_notes",
+        side_effect=sqlite3.OperationalError("database is locked"),
+    ):
+        with pytest.raises(sqlite3.OperationalError):
+            german_deck.save_deck()
+
+    german_deck.save_deck()
+
+    db = GermanDeckDatabase(german_deck.db_path, backend=german_deck.db_backend)
+    assert db.find_word("lernen").translation == "to learn"
+    db.close()
+
+
+def test_save_deck_only_sends_unsaved_notes(german_deck):
+    """Test that repeated saves only send notes added since the last save or load."""
+    with patch(
+        "anki.german_deck_db.GermanDeckDatabase.add_notes"
+    ) as mock_add_notes, patch(
+        "anki.german_deck_db.GermanDeckDatabase.iter_notes"
+    ) as mock_iter_notes:
+        mock_iter_notes.return_value = [
+            MagicMock(
+                german_word="lernen",
+                translation="to learn",
+                german_sentence="Ich lerne Deutsch.",
+                english_sentence="I am learning German.",
+                other_forms="lernte, gelernt",
+            )
+        ]
+        german_deck.load_deck()
+        german_deck.add_note(
+            german_word="lesen",
+            translation="to read",
+            german_sentence="Ich lese ein Buch.",
+            english_sentence="I am reading a book.",
+            other_forms="las, gelesen",
         )
 
+        german_deck.save_deck()
+        german_deck.save_deck()
+
+        sent = [
+            [row["german_word"] for row in call.args[0]]
+            for call in mock_add_notes.call_args_list
+        ]
+        assert sent == [["lesen"], []]
+
 
 def test_load_deck(german_deck):
     """Test loading notes from the SQLite database into the GermanDeck."""
-    with patch("anki.german_deck_db.GermanDeckDatabase.load_notes") as mock_load_notes:
-        mock_load_notes.return_value = [
+    with patch("anki.german_deck_db.GermanDeckDatabase.iter_notes") as mock_iter_notes:
+        mock_iter_notes.return_value = [
             MagicMock(
                 german_word="lernen",
                 translation="to learn",
@@ -140,3 +198,118 @@ def test_save_to_apkg(german_deck):
     with patch("genanki.Package.write_to_file") as mock_write:
         german_deck.save_to_apkg()
         mock_write.assert_called_once_with(german_deck.apkg_path)
+
+
+def test_save_to_apkg_incremental(german_deck):
+    """Test that the incremental mode exports through the build cache."""
+    with patch("anki.german_deck.write_incremental_package") as mock_write:
+        german_deck.save_to_apkg(incremental=True)
+        mock_write.assert_called_once_with(
+            german_deck.deck, german_deck.apkg_path, german_deck.build_cache_path, []
+        )
+
+
+def test_write_notes_streams_to_database_without_keeping_notes(tmp_path):
+    """Test that streamed notes are stored but not held in the deck."""
+    deck = GermanDeck(1, 2, str(tmp_path / "deck"), db_backend="sqlite3")
+    notes = (
+        {
+            "german_word": f"wort{i}",
+            "translation": f"word{i}",
+            "german_sentence": f"Das ist Wort {i}.",
+            "english_sentence": f"This is word {i}.",
+            "other_forms": "",
+        }
+        for i in range(5)
+    )
+
+    assert deck.write_notes(notes, batch_size=2) == 5
+    assert len(deck.deck.notes) == 0
+
+    deck.load_deck()
+    assert len(deck.deck.notes) == 5
+
+
+def test_add_note_merges_notes_of_the_same_word(german_deck):
+    """Test that re-adding a word updates its note under a deterministic GUID."""
+    german_deck.add_note("der Hund", "the dog", "Der Hund bellt.", "The dog barks.", "")
+    german_deck.add_note(
+        "Der  Hund", "the dog", "Der Hund schläft.", "The dog sleeps.", "die Hunde"
+    )
+    german_deck.add_note("der Hund", "", "", "", "")
+
+    assert len(german_deck.deck.notes) == 1
+    note = german_deck.deck.notes[0]
+    assert note.guid == note_guid("der hund")
+    assert note.fields == [
+        "der Hund",
+        "the dog",
+        "Der Hund schläft.",
+        "The dog sleeps.",
+        "die Hunde",
+    ]
+
+
+def test_load_deck_does_not_duplicate_notes(tmp_path):
+    """Test that loading twice keeps one note per word and unsaved edits win."""
+    deck = GermanDeck(1, 2, str(tmp_path / "deck"), db_backend="sqlite3")
+    deck.add_note("lernen", "to learn", "Ich lerne.", "I learn.", "lernte")
+    deck.add_note("lesen", "to read", "Ich lese.", "I read.", "las")
+    deck.save_deck()
+
+    deck.add_note("lesen", "to read", "Ich lese gern.", "I like reading.", "las")
+    deck.load_deck()
+    deck.load_deck()
+
+    db = GermanDeckDatabase(deck.db_path, backend="sqlite3")
+    stored_guids = {note.guid for note in db.load_notes()}
+    db.close()
+    assert [note.fields[2] for note in deck.deck.notes] == [
+        "Ich lerne.",
+        "Ich lese gern.",
+    ]
+    assert {note.guid for note in deck.deck.notes} == stored_guids
+
+
+def test_notes_are_held_as_compact_records(tmp_path):
+    """Test that genanki notes are only built from the records on export."""
+    deck = GermanDeck(1, 2, str(tmp_path / "deck"), db_backend="sqlite3")
+    deck.add_note("lernen", "to learn", "Ich lerne.", "I learn.", "lernte")
+    deck.add_note("lesen", "to read", "Ich lese.", "I read.", "las")
+
+    record, _ = deck._notes.values()
+    assert isinstance(record, DeckNote)
+    assert not hasattr(record, "__dict__")
+    notes = list(deck.deck.notes)
+    assert all(isinstance(note, genanki.Note) for note in notes)
+    assert [note.guid for note in notes] == [note_guid("lernen"), note_guid("lesen")]
+    assert deck.deck.notes[-1].fields[0] == "lesen"
+
+    deck.save_to_apkg()
+    with zipfile.ZipFile(deck.apkg_path) as package:
+        package.extract("collection.anki2", tmp_path)
+    connection = sqlite3.connect(tmp_path / "collection.anki2")
+    guids = [guid for (guid,) in connection.execute("SELECT guid FROM notes")]
+    connection.close()
+    assert sorted(guids) == sorted(note.guid for note in notes)
+
+
+def test_known_words_reuses_one_database(tmp_path):
+    """Test that repeated lookups share one database until the deck is closed."""
+    deck = GermanDeck(1, 2, str(tmp_path / "deck"), db_backend="sqlite3")
+    deck.add_note("der Hund", "the dog", "Der Hund bellt.", "The dog barks.", "")
+    deck.save_deck()
+
+    with patch(
+        "anki.german_deck.GermanDeckDatabase", wraps=GermanDeckDatabase
+    ) as mock_database:
+        assert deck.known_words(["Hund", "Katze"]) == {"Hund"}
+        deck.add_note("die Katze", "the cat", "Die Katze.", "The cat.", "")
+        deck.save_deck()
+        assert deck.known_words(["Katze"]) == {"Katze"}
+        deck.close()
+        assert deck.known_words(["Maus"]) == set()
+        deck.close()
+
+    # One database for the two lookups, one for the save, one after closing
+    assert mock_database.call_count == 3
@@ -1,24 +1,39 @@
+import asyncio
+import sqlite3
+
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 
-from anki.german_deck_db import Base, GermanDeckDatabase, NoteModel
+from anki.german_deck_db import BACKENDS, GermanDeckDatabase, NoteModel
+from anki.normalize import note_guid
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request):
+    """Fixture running each test against every storage backend."""
+    return request.param
 
 
 @pytest.fixture(scope="function")
-def test_db():
-    """Fixture for setting up an in-memory SQLite database for testing."""
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    return Session
+def db(tmp_path, backend):
+    """Fixture for setting up a temporary database with the selected backend."""
+    database = GermanDeckDatabase(str(tmp_path / "test.db"), backend=backend)
+    yield database
+    database.close()
 
 
-def test_add_note_success(test_db):
-    """Test that a note can be added successfully to the database."""
-    db = GermanDeckDatabase(":memory:")  # Use in-memory database for testing
-    db.Session = test_db  # Override Session for testing
+@pytest.fixture(scope="function")
+def test_db(db, tmp_path):
+    """Fixture for a SQLAlchemy session on the test database, independent of the backend."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
 
+def test_add_note_success(db, test_db):
+    """Test that a note can be added successfully to the database."""
     db.add_note(
         german_word="lernen",
         translation="to learn",
@@ -38,11 +53,8 @@ def test_add_note_success(test_db):
     session.close()
 
 
-def test_load_notes(test_db):
+def test_load_notes(db, test_db):
     """Test that all notes can be loaded from the database."""
-    db = GermanDeckDatabase(":memory:")
-    db.Session = test_db
-
     db.add_note(
         german_word="lesen",
         translation="to read",
@@ -66,11 +78,179 @@ def test_load_notes(test_db):
     assert notes[1].german_word == "schreiben"
 
 
-def test_note_with_no_other_forms(test_db):
-    """Test adding a note with no other forms."""
-    db = GermanDeckDatabase(":memory:")
-    db.Session = test_db
+def test_add_notes_bulk(db, test_db):
+    """Test that many notes can be added in one call, across several chunks."""
+    rows = [
+        {
+            "german_word": f"wort{i}",
+            "translation": f"word{i}",
+            "german_sentence": f"Das ist Wort {i}.",
+            "english_sentence": f"This is word {i}.",
+        }
+        for i in range(25)
+    ]
+
+    assert db.add_notes(iter(rows), chunk_size=10) == 25
+
+    notes = db.load_notes()
+    assert [note.german_word for note in notes] == [f"wort{i}" for i in range(25)]
+    assert all(note.other_forms is None for note in notes)
+
+
+def _rows(count, fail_after=None):
+    """Yield note rows, raising after `fail_after` rows if given."""
+    for i in range(count):
+        if i == fail_after:
+            raise RuntimeError("producer crashed")
+        yield {
+            "german_word": f"wort{i}",
+            "translation": f"word{i}",
+            "german_sentence": f"Das ist Wort {i}.",
+            "english_sentence": f"This is word {i}.",
+        }
+
+
+def test_write_notes_resumes_from_checkpoint(db):
+    """Test that an interrupted stream keeps its committed batches and resumes."""
+    with pytest.raises(RuntimeError, match="producer crashed"):
+        db.write_notes(_rows(30, fail_after=25), batch_size=10, checkpoint="job")
+
+    # The two full batches are stored, the partial third batch is lost
+    assert db.count_notes() == 20
+    assert db.backend.get_checkpoint("job") == 20
+
+    assert db.write_notes(_rows(30), batch_size=10, checkpoint="job") == 10
+    assert [note.german_word for note in db.iter_notes()] == [
+        f"wort{i}" for i in range(30)
+    ]
+    assert db.backend.get_checkpoint("job") == 0
+
+
+def test_awrite_notes_consumes_async_iterator(db):
+    """Test that notes from an async iterator are committed in micro-batches."""
+
+    async def notes():
+        for row in _rows(25):
+            yield row
+
+    assert asyncio.run(db.awrite_notes(notes(), batch_size=10)) == 25
+    assert db.count_notes() == 25
+
+
+def test_add_notes_is_atomic(db, test_db):
+    """Test that a failing row rolls back the whole bulk insert."""
+    rows = [
+        {
+            "german_word": "gehen",
+            "translation": "to go",
+            "german_sentence": "Ich gehe nach Hause.",
+            "english_sentence": "I am going home.",
+        },
+        {
+            "german_word": "kommen",
+            "translation": None,
+            "german_sentence": "Er kommt morgen.",
+            "english_sentence": "He is coming tomorrow.",
+        },
+    ]
+
+    with pytest.raises((IntegrityError, sqlite3.IntegrityError)):
+        db.add_notes(rows, chunk_size=1)
+
+    assert db.load_notes() == []
+
+
+def test_add_notes_upserts_by_normalized_word(db, test_db):
+    """Test that saving the same word again updates it only when its content changed."""
+    row = {
+        "german_word": "der Hund",
+        "translation": "the dog",
+        "german_sentence": "Der Hund bellt.",
+        "english_sentence": "The dog barks.",
+        "other_forms": "die Hunde",
+    }
+
+    assert db.add_notes([row]) == 1
+    assert db.add_notes([row]) == 0
+    assert db.add_notes([dict(row, german_word="Der  Hund", translation="dog")]) == 1
+
+    notes = db.load_notes()
+    assert len(notes) == 1
+    assert notes[0].german_word == "Der  Hund"
+    assert notes[0].translation == "dog"
+    assert notes[0].note_key == "der hund"
+
+
+def test_legacy_schema_is_migrated(tmp_path, backend):
+    """Test that a notes table without a natural key gets one and is deduplicated."""
+    db_file = tmp_path / "legacy.db"
+    with sqlite3.connect(db_file) as connection:
+        connection.execute(
+            "CREATE TABLE notes (id INTEGER PRIMARY KEY, german_word VARCHAR NOT NULL, "
+            "translation VARCHAR NOT NULL, german_sentence TEXT NOT NULL, "
+            "english_sentence TEXT NOT NULL, other_forms VARCHAR)"
+        )
+        connection.executemany(
+            "INSERT INTO notes (german_word, translation, german_sentence, "
+            "english_sentence) VALUES (?, ?, ?, ?)",
+            [
+                ("lernen", "to learn", "Ich lerne.", "I learn."),
+                ("lernen", "to study", "Ich lerne.", "I study."),
+            ],
+        )
+    connection.close()
+
+    db = GermanDeckDatabase(str(db_file), backend=backend)
+
+    notes = db.load_notes()
+    assert [(note.german_word, note.translation) for note in notes] == [
+        ("lernen", "to study")
+    ]
+    assert notes[0].guid == note_guid("lernen")
+    assert (
+        db.add_notes(
+            [
+                {
+                    "german_word": "Lernen",
+                    "translation": "to study",
+                    "german_sentence": "Ich lerne.",
+                    "english_sentence": "I study.",
+                }
+            ]
+        )
+        == 1
+    )
+    assert len(db.load_notes()) == 1
+
 
+def test_iter_notes_streams_rows_in_order(db, test_db):
+    """Test that iter_notes yields plain rows in insertion order across batches."""
+    db.add_notes(
+        {
+            "german_word": f"wort{i}",
+            "translation": f"word{i}",
+            "german_sentence": f"Das ist Wort {i}.",
+            "english_sentence": f"This is word {i}.",
+        }
+        for i in range(7)
+    )
+
+    rows = db.iter_notes(batch_size=3)
+
+    assert not isinstance(rows, list)
+    rows = list(rows)
+    assert [row.german_word for row in rows] == [f"wort{i}" for i in range(7)]
+    assert tuple(rows[0]) == (
+        "wort0",
+        "word0",
+        "Das ist Wort 0.",
+        "This is word 0.",
+        None,
+    )
+
+
+def test_note_with_no_other_forms(db, test_db):
+    """Test adding a note with no other forms."""
     db.add_note(
         german_word="sprechen",
         translation="to speak",
@@ -87,11 +267,8 @@ def test_note_with_no_other_forms(test_db):
     session.close()
 
 
-def test_database_persistence(test_db):
+def test_database_persistence(db, test_db):
     """Test that notes are correctly persisted in the database."""
-    db = GermanDeckDatabase(":memory:")
-    db.Session = test_db
-
     db.add_note(
         german_word="fahren",
         translation="to drive",
@@ -111,3 +288,66 @@ def test_database_persistence(test_db):
     assert len(persisted_notes) == 1
     assert persisted_notes[0].german_word == "fahren"
     new_session.close()
+
+
+def test_lookups_by_word_prefix_and_translation(db):
+    """Test exact, prefix and reverse lookups on the indexed columns."""
+    db.add_notes(_rows(12))
+    db.add_note("der Hund", "the dog", "Der Hund bellt.", "The dog barks.")
+
+    assert db.find_word("Der  HUND").translation == "the dog"
+    assert db.find_word("die Katze") is None
+    assert [note.german_word for note in db.find_prefix("WORT1")] == [
+        "wort1",
+        "wort10",
+        "wort11",
+    ]
+    assert len(db.find_prefix("wort", limit=5)) == 5
+    assert [note.german_word for note in db.find_translation("The Dog")] == ["der Hund"]
+
+
+def test_search_sentences_stays_in_sync(db):
+    """Test that the sentence search index follows inserts and updates."""
+    row = {
+        "german_word": "die Küche",
+        "translation": "the kitchen",
+        "german_sentence": "Die Küche ist groß.",
+        "english_sentence": "The kitchen is big.",
+    }
+    db.add_notes([row])
+
+    assert [note.german_word for note in db.search_sentences("kuche")] == ["die Küche"]
+    assert db.search_sentences("kitchen big")[0].translation == "the kitchen"
+    assert db.search_sentences('"') == []
+
+    db.add_notes([dict(row, german_sentence="Wir kochen zusammen.")])
+
+    assert db.search_sentences("groß") == []
+    assert len(db.search_sentences("kochen")) == 1
+
+
+def test_search_index_is_built_for_existing_notes(tmp_path, backend):
+    """Test that opening a database without the search index fills it."""
+    db_file = tmp_path / "old.db"
+    db = GermanDeckDatabase(str(db_file), backend=backend)
+    db.add_notes(_rows(3))
+    db.close()
+    with sqlite3.connect(db_file) as connection:
+        connection.executescript(
+            "DROP TRIGGER notes_fts_insert; DROP TRIGGER notes_fts_delete; "
+            "DROP TRIGGER notes_fts_update; DROP TABLE notes_fts;"
+        )
+    connection.close()
+
+    db = GermanDeckDatabase(str(db_file), backend=backend)
+
+    assert [note.german_word for note in db.search_sentences("Wort 2")] == ["wort2"]
+    db.close()
+
+
+def test_notes_are_stored_with_their_anki_guid(db):
+    """Test that the stored GUID is the one the deck exports the note with."""
+    db.add_note("Das  Mädchen", "the girl", "Das Mädchen lacht.", "The girl laughs.")
+
+    (note,) = db.load_notes()
+    assert note.guid == note_guid("das mädchen")
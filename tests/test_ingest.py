@@ -0,0 +1,65 @@
+import pytest
+
+from anki.german_deck_db import GermanDeckDatabase
+from anki.ingest import (
+    IngestStats,
+    SpillingSet,
+    iter_new_batches,
+    normalize_line,
+    read_lines,
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = GermanDeckDatabase(str(tmp_path / "test.db"), backend="sqlite3")
+    database.add_note("das Mädchen", "the girl", "-", "-")
+    database.add_note("lernen", "to learn", "-", "-")
+    yield database
+    database.close()
+
+
+def test_read_lines_normalizes_and_skips_blank_lines(tmp_path):
+    """Test that lines are NFC-normalized, whitespace-collapsed and non-empty."""
+    first = tmp_path / "first.txt"
+    first.write_text("  der\tHund \n\n   \nMädchen\n", encoding="utf-8")
+    second = tmp_path / "second.txt"
+    second.write_bytes(b"lernen\r\nKa\xffse")
+
+    lines = read_lines([str(first), str(second)])
+
+    assert next(lines) == "der Hund"
+    assert list(lines) == ["Mädchen", "lernen", "Ka�se"]
+    assert normalize_line(" noch   einmal ") == "noch einmal"
+
+
+def test_spilling_set_keeps_keys_after_spilling():
+    """Test that keys moved to the SQLite table are still found."""
+    seen = SpillingSet(max_memory_keys=3)
+
+    assert [seen.add(key) for key in ["a", "b", "c", "d", "a", "d"]] == [
+        True,
+        True,
+        True,
+        True,
+        False,
+        False,
+    ]
+    assert len(seen) == 4
+    assert "c" in seen and "e" not in seen
+    seen.close()
+
+
+def test_iter_new_batches_skips_known_and_repeated_lines(db):
+    """Test that only unseen lines are yielded, in input order and in batches."""
+    stats = IngestStats()
+    lines = ["Maedchen", "der Hund", "Lernen", "die Hunde", "der hund", "Katze"]
+
+    batches = list(
+        iter_new_batches(
+            lines, db, batch_size=2, seen=SpillingSet(max_memory_keys=2), stats=stats
+        )
+    )
+
+    assert batches == [["der Hund"], ["die Hunde"], ["Katze"]]
+    assert stats == IngestStats(lines=6, repeated=1, known=2, new=3)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from anki import instrumentation
+from anki.german_deck import GermanDeck
+from anki.pipeline import TokenUsageCallback
+
+
+def test_spans_are_aggregated_by_name():
+    """Test that spans are timed and their numeric attributes summed."""
+    spans = []
+    with instrumentation.recording(spans.append) as recorder:
+        for records in (3, 5):
+            with instrumentation.span("work", records=records, label="x"):
+                pass
+        instrumentation.count("items", 2)
+        instrumentation.count("items")
+
+    summary = json.loads(json.dumps(recorder.summary()))
+    assert summary["spans"]["work"]["count"] == 2
+    assert summary["spans"]["work"]["records"] == 8
+    assert "label" not in summary["spans"]["work"]
+    assert summary["counters"] == {"items": 3}
+    assert [span.attributes["records"] for span in spans] == [3, 5]
+    assert instrumentation.active() is None
+
+
+def test_instrumented_functions_record_errors():
+    """Test that decorated sync and async functions run in spans, failing or not."""
+
+    @instrumentation.instrumented("sync")
+    def sync(fail):
+        if fail:
+            raise KeyError("boom")
+        return 1
+
+    @instrumentation.instrumented("async")
+    async def run_async():
+        return 2
+
+    assert sync(False) == 1  # not recorded while instrumentation is off
+    with instrumentation.recording() as recorder:
+        assert sync(False) == 1
+        with pytest.raises(KeyError):
+            sync(True)
+        assert asyncio.run(run_async()) == 2
+
+    spans = recorder.summary()["spans"]
+    assert (spans["sync"]["count"], spans["sync"]["errors"]) == (2, 1)
+    assert spans["async"]["count"] == 1
+
+
+def test_deck_operations_are_instrumented(tmp_path):
+    """Test that deck and database operations report their record counts."""
+    deck = GermanDeck(1, 2, str(tmp_path / "deck"), "sqlite3")
+    with instrumentation.recording() as recorder:
+        deck.add_note("der Hund", "the dog", "Der Hund bellt.", "The dog barks.", "")
+        deck.save_deck()
+        GermanDeck(1, 2, str(tmp_path / "deck"), "sqlite3").load_deck()
+
+    spans = recorder.summary()["spans"]
+    assert spans["deck.add_note"]["count"] == 1
+    assert spans["db.add_notes"]["records"] == 1
+    assert spans["deck.save_to_apkg"]["records"] == 1
+    assert spans["deck.load_deck"]["records"] == 1
+    assert "records_per_s" in spans["deck.load_deck"]
+
+
+def test_token_usage_callback_reads_usage_metadata_and_llm_output():
+    """Test that token counts are taken from the messages or the LLM output."""
+    attributes = {}
+    callback = TokenUsageCallback(attributes)
+    message = AIMessage(
+        "{}",
+        usage_metadata={
+            "input_tokens": 10,
+            "output_tokens": 4,
+            "total_tokens": 14,
+            "input_token_details": {"cache_read": 8},
+        },
+    )
+    callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+    token_usage = {
+        "prompt_tokens": 7,
+        "completion_tokens": 2,
+        "prompt_tokens_details": {"cached_tokens": 4},
+    }
+    callback.on_llm_end(
+        LLMResult(
+            generations=[[ChatGeneration(message=AIMessage("{}"))]],
+            llm_output={"token_usage": token_usage},
+        )
+    )
+
+    assert attributes == {
+        "prompt_tokens": 17,
+        "cached_prompt_tokens": 12,
+        "uncached_prompt_tokens": 5,
+        "completion_tokens": 6,
+    }
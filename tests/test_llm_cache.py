@@ -0,0 +1,48 @@
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.outputs import Generation
+
+from anki.llm_cache import ResponseCache
+from anki.templates import translate_template
+
+
+def test_repeated_prompts_skip_the_llm(tmp_path):
+    """Test that a cached chat model answers repeated prompts without the LLM."""
+    cache = ResponseCache(tmp_path / "cache.db")
+    # A second real call to the fake model would return the other response
+    llm = FakeListChatModel(responses=["to learn ; to read", "uncached"], cache=cache)
+    chain = translate_template | llm
+
+    first = chain.invoke({"german_words": "lernen ; lesen"})
+    second = chain.invoke({"german_words": "lernen ;   lesen"})
+
+    assert first.content == second.content == "to learn ; to read"
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+    assert stats.hit_rate == 0.5
+
+
+def test_cache_persists_across_instances(tmp_path):
+    """Test that entries survive reopening the cache file."""
+    ResponseCache(tmp_path / "cache.db").update(
+        "prompt", "llm", [Generation(text="answer")]
+    )
+
+    cache = ResponseCache(tmp_path / "cache.db")
+
+    assert cache.lookup("prompt", "llm")[0].text == "answer"
+    assert cache.lookup("prompt", "other llm") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """Test that the cache evicts the least recently used entries beyond its limit."""
+    cache = ResponseCache(tmp_path / "cache.db", max_entries=2)
+    for prompt in ["a", "b"]:
+        cache.update(prompt, "llm", [Generation(text=prompt)])
+    cache.lookup("a", "llm")
+
+    cache.update("c", "llm", [Generation(text="c")])
+
+    assert cache.lookup("a", "llm") is not None
+    assert cache.lookup("b", "llm") is None
+    assert cache.lookup("c", "llm") is not None
+    assert cache.stats().entries == 2
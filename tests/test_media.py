@@ -0,0 +1,114 @@
+import json
+import zipfile
+
+import pytest
+
+from anki.german_deck import GermanDeck
+from anki.media import (
+    MediaGenerator,
+    MediaStore,
+    NoteMedia,
+    StubAudioGenerator,
+    SvgTextGenerator,
+)
+
+
+class CountingGenerator(MediaGenerator):
+    """Generator writing the text's length, counting its calls."""
+
+    name = "counting"
+    extension = ".txt"
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, text, path):
+        self.calls.append(text)
+        path.write_text(str(len(text)))
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture for a media store in a temporary directory."""
+    store = MediaStore(tmp_path / "media")
+    yield store
+    store.close()
+
+
+def test_store_generates_each_text_once(store):
+    """Test that a stored file is reused instead of being generated again."""
+    generator = CountingGenerator()
+
+    first = store.get(generator, "Hund")
+    second = store.get(generator, "Hund")
+
+    assert first == second
+    assert first.read_text() == "4"
+    assert generator.calls == ["Hund"]
+    assert (store.stats.generated, store.stats.reused) == (1, 1)
+
+
+def test_store_deduplicates_identical_content(store):
+    """Test that texts with identical files share one content-addressed file."""
+    generator = CountingGenerator()
+
+    # Both texts have four characters, so the generated files are identical
+    assert store.get(generator, "Hund") == store.get(generator, "Haus")
+    assert store.stats.deduplicated == 1
+    assert len(list(store.root.glob("*/*.txt"))) == 1
+
+
+def test_store_regenerates_after_text_or_version_changes(tmp_path):
+    """Test that the index survives reopening and keys on text and version."""
+    generator = CountingGenerator()
+    store = MediaStore(tmp_path / "media")
+    store.get(generator, "Hund")
+    store.close()
+
+    store = MediaStore(tmp_path / "media")
+    store.get(generator, "Hund")
+    store.get(generator, "Hunde")
+    generator.version = "2"
+    store.get(generator, "Hund")
+    store.close()
+
+    assert generator.calls == ["Hund", "Hunde", "Hund"]
+
+
+def test_deck_exports_referenced_media(tmp_path, store):
+    """Test that the package holds each referenced media file once."""
+    media = NoteMedia(store, audio=StubAudioGenerator(), image=SvgTextGenerator())
+    deck = GermanDeck(1, 2, str(tmp_path / "deck"), media=media)
+    deck.add_note("der Hund", "the dog", "Der Hund bellt.", "The dog barks.", "")
+    deck.add_note("die Hunde", "the dog", "Die Hunde bellen.", "The dogs bark.", "")
+    store.get(SvgTextGenerator(), "unused")
+
+    deck.save_to_apkg()
+
+    with zipfile.ZipFile(deck.apkg_path) as package:
+        names = json.loads(package.read("media"))
+        files = {name: package.read(index) for index, name in names.items()}
+    fields = [note.fields for note in deck.deck.notes]
+    audio_names = [field[5][len("[sound:") : -1] for field in fields]
+    (image_name,) = {field[6][len('<img src="') : -2] for field in fields}
+    assert sorted(files) == sorted([*audio_names, image_name])
+    assert files[image_name] == store.path(image_name).read_bytes()
+    assert b"the dog" in files[image_name]
+    assert len(deck.model.fields) == 7
+
+
+def test_incremental_export_includes_media(tmp_path, store):
+    """Test that the incremental export packages the media files too."""
+    deck = GermanDeck(
+        1, 2, str(tmp_path / "deck"), media=NoteMedia(store, audio=StubAudioGenerator())
+    )
+    deck.add_note("der Hund", "the dog", "Der Hund bellt.", "The dog barks.", "")
+
+    deck.save_to_apkg(incremental=True)
+
+    with zipfile.ZipFile(deck.apkg_path) as package:
+        names = json.loads(package.read("media"))
+        assert list(names.values()) == [
+            store.get(StubAudioGenerator(), "der Hund").name
+        ]
+        assert package.read("0")[:4] == b"RIFF"
@@ -0,0 +1,92 @@
+import sqlite3
+import zipfile
+
+import pytest
+
+from anki.german_deck_db import GermanDeckDatabase
+from anki.multi_export import DeckSpec, export_decks
+from anki.normalize import note_guid
+
+
+def read_package(apkg_path, tmp_path):
+    """Return the deck names and the sorted German words of an .apkg file."""
+    with zipfile.ZipFile(apkg_path) as package:
+        package.extract("collection.anki2", tmp_path)
+    connection = sqlite3.connect(tmp_path / "collection.anki2")
+    try:
+        decks = connection.execute("SELECT decks FROM col").fetchone()[0]
+        rows = connection.execute("SELECT guid, flds FROM notes").fetchall()
+    finally:
+        connection.close()
+    return decks, sorted((guid, fields.split("\x1f")[0]) for guid, fields in rows)
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    """Fixture for a deck database with three stored notes."""
+    db_file = tmp_path / "vocabulary.db"
+    db = GermanDeckDatabase(db_file, backend="sqlite3")
+    for german_word, german_sentence in (
+        ("der Hund", "Der Hund bellt."),
+        ("kochen", "Wir kochen in der Küche."),
+        ("die Küche", "Die Küche ist groß."),
+    ):
+        db.add_note(german_word, "-", german_sentence, "-", "-")
+    db.close()
+    return db_file
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_export_decks_writes_one_package_per_spec(db_file, tmp_path, max_workers):
+    """Test that every spec gets a package with the notes its filter selects."""
+    specs = [
+        DeckSpec(1, "Everything", str(tmp_path / "all.apkg")),
+        DeckSpec(
+            2,
+            "Nouns",
+            str(tmp_path / "decks" / "nouns.apkg"),
+            "german_word LIKE ?",
+            ("d%",),
+        ),
+        DeckSpec(
+            3,
+            "Kitchen",
+            str(tmp_path / "kitchen.apkg"),
+            "id IN (SELECT rowid FROM notes_fts WHERE notes_fts MATCH ?)",
+            ('"küche"',),
+        ),
+    ]
+
+    counts = export_decks(db_file, specs, max_workers=max_workers)
+
+    assert list(counts.values()) == [3, 2, 2]
+    decks, notes = read_package(tmp_path / "decks" / "nouns.apkg", tmp_path / "nouns")
+    assert "Nouns" in decks
+    assert notes == sorted(
+        (note_guid(word), word) for word in ("der Hund", "die Küche")
+    )
+    _, notes = read_package(tmp_path / "kitchen.apkg", tmp_path / "kitchen")
+    assert sorted(word for _, word in notes) == ["die Küche", "kochen"]
+
+
+def test_export_decks_reads_a_snapshot(db_file, tmp_path):
+    """Test that the export leaves the database unchanged and removes the snapshot."""
+    before = db_file.read_bytes()
+
+    export_decks(db_file, [DeckSpec(1, "All", str(tmp_path / "all.apkg"))])
+
+    assert db_file.read_bytes() == before
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "all.apkg",
+        "vocabulary.db",
+    ]
+
+
+def test_export_decks_rejects_shared_package_paths(db_file, tmp_path):
+    """Test that two specs writing the same package are rejected."""
+    specs = [
+        DeckSpec(deck_id, "Deck", str(tmp_path / "deck.apkg")) for deck_id in (1, 2)
+    ]
+
+    with pytest.raises(ValueError):
+        export_decks(db_file, specs)
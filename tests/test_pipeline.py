@@ -0,0 +1,227 @@
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableGenerator
+
+from anki.pipeline import MODES, STAGES, Pipeline, Stage, outputs_to_notes
+from anki.response_schema import WORD_SCHEMA
+
+
+def test_default_graph_dependencies():
+    """Test that only the sentence translation waits for generated sentences."""
+    order = [stage.output_key for stage in Pipeline(None).stages_for(["input_text"])]
+
+    assert order[0] == "german_words"
+    assert order[-1] == "english_sentences"
+    assert set(order[1:4]) == {"english_words", "german_sentences", "other_forms"}
+
+
+def test_run_produces_all_outputs_and_runs_independent_stages_concurrently(fake_llm):
+    """Test that the run produces every output and overlaps independent stages."""
+    llm = fake_llm(delay=0.05)
+    pipeline = Pipeline(llm.runnable(), max_concurrency=3)
+
+    outputs = pipeline.run({"input_text": "der Hund\nlernen"})
+
+    assert outputs["input_text"] == "der Hund\nlernen"
+    assert outputs["german_words"] == [
+        {"german_word": "der Hund"},
+        {"german_word": "lernen"},
+    ]
+    assert outputs["english_words"][1] == {
+        "german_word": "lernen",
+        "translation": "en lernen",
+    }
+    assert outputs["english_sentences"][0] == {
+        "german_word": "der Hund",
+        "english_sentence": "Sentence with der Hund.",
+    }
+    assert [record["other_forms"] for record in outputs["other_forms"]] == [
+        "NONE",
+        "NONE",
+    ]
+    # Translation, sentence and other-forms stages overlap after the extraction
+    assert llm.max_in_flight == 3
+
+
+def test_concurrency_limit_is_respected(fake_llm):
+    """Test that no more than max_concurrency calls are in flight."""
+    llm = fake_llm(delay=0.01)
+
+    Pipeline(llm.runnable(), max_concurrency=1).run({"input_text": "Hund"})
+
+    assert llm.max_in_flight == 1
+    assert len(llm.calls) == 5
+
+
+def test_run_can_start_from_intermediate_outputs(fake_llm):
+    """Test that stages whose outputs are given as inputs are skipped."""
+    llm = fake_llm()
+
+    outputs = Pipeline(llm.runnable()).run({"german_words": "der Hund"})
+
+    assert "german_words" not in llm.calls
+    assert outputs["english_sentences"] == [
+        {"german_word": "der Hund", "english_sentence": "Sentence with der Hund."}
+    ]
+
+
+def test_unresolvable_stage_raises():
+    """Test that a stage with an input nobody provides is rejected."""
+    stage = Stage(
+        "summary",
+        ChatPromptTemplate.from_messages([("user", "{missing_input}")]),
+        WORD_SCHEMA,
+    )
+
+    with pytest.raises(ValueError, match="missing_input"):
+        Pipeline(None, stages=[*STAGES, stage]).stages_for(["input_text"])
+
+
+def test_stage_failure_propagates(fake_llm):
+    """Test that an LLM error fails the run."""
+    llm = fake_llm(failures=1)
+
+    with pytest.raises(RuntimeError, match="rate limited"):
+        Pipeline(llm.runnable()).run({"input_text": "Hund"})
+
+
+def test_malformed_row_is_asked_for_again(fake_llm):
+    """Test that only the words with a malformed row are sent again."""
+    llm = fake_llm(malformed=["lernen"])
+
+    outputs = Pipeline(llm.runnable()).run({"german_words": "der Hund ; lernen"})
+
+    assert [record["german_word"] for record in outputs["english_words"]] == [
+        "der Hund",
+        "lernen",
+    ]
+    # One follow-up call for each of the four stages answering per word
+    assert len(llm.calls) == 8
+    assert len(outputs_to_notes(outputs)) == 2
+
+
+def test_rows_streamed_before_an_error_are_kept():
+    """Test that a broken stream only costs a follow-up call for the rest."""
+    prompts = []
+
+    async def flaky_llm(inputs):
+        async for prompt in inputs:
+            prompts.append(prompt.to_string())
+        yield '{"german_word": "der Hund", "translation": "the dog"}\n'
+        if len(prompts) == 1:
+            raise ConnectionError("stream reset")
+        yield '{"german_word": "lernen", "translation": "to learn"}\n'
+
+    pipeline = Pipeline(RunnableGenerator(flaky_llm), stages=STAGES[1:2])
+    outputs = pipeline.run({"german_words": "der Hund ; lernen"})
+
+    assert [record["translation"] for record in outputs["english_words"]] == [
+        "the dog",
+        "to learn",
+    ]
+    assert prompts[1].rstrip().endswith("```lernen```")
+
+
+def test_row_missing_after_retries_is_dropped(fake_llm):
+    """Test that a word still malformed after the row retries gets no note."""
+    llm = fake_llm(malformed=["lernen"])
+
+    outputs = Pipeline(llm.runnable(), row_retries=0).run(
+        {"german_words": "der Hund ; lernen"}
+    )
+
+    assert [note["german_word"] for note in outputs_to_notes(outputs)] == ["der Hund"]
+
+
+def test_combined_mode_returns_notes_in_one_call(fake_llm):
+    """Test that the combined mode makes one call producing complete notes."""
+    llm = fake_llm()
+
+    outputs = Pipeline(llm.runnable(), stages=MODES["combined"]).run(
+        {"input_text": "der Hund\nlernen"}
+    )
+
+    assert llm.calls == ["notes"]
+    assert outputs_to_notes(outputs) == [
+        {
+            "german_word": "der Hund",
+            "translation": "en der Hund",
+            "german_sentence": "Satz mit der Hund.",
+            "english_sentence": "Sentence with der Hund.",
+            "other_forms": "",
+        },
+        {
+            "german_word": "lernen",
+            "translation": "en lernen",
+            "german_sentence": "Satz mit lernen.",
+            "english_sentence": "Sentence with lernen.",
+            "other_forms": "",
+        },
+    ]
+
+
+def test_outputs_to_notes_matches_records_by_word():
+    """Test that records are joined on the normalized German word."""
+    outputs = {
+        "german_words": [{"german_word": "der Hund"}, {"german_word": "schnell"}],
+        "english_words": [
+            {"german_word": "schnell", "translation": "fast"},
+            {"german_word": "Der Hund", "translation": "the dog"},
+        ],
+        "german_sentences": [
+            {"german_word": "der Hund", "german_sentence": "Der Hund bellt."},
+            {"german_word": "schnell", "german_sentence": "Er läuft schnell."},
+        ],
+        "english_sentences": [
+            {"german_word": "der Hund", "english_sentence": "The dog barks."},
+            {"german_word": "schnell", "english_sentence": "He runs fast."},
+        ],
+        "other_forms": [
+            {"german_word": "der Hund", "other_forms": "die Hunde"},
+            {"german_word": "schnell", "other_forms": "NONE"},
+        ],
+    }
+
+    assert outputs_to_notes(outputs) == [
+        {
+            "german_word": "der Hund",
+            "translation": "the dog",
+            "german_sentence": "Der Hund bellt.",
+            "english_sentence": "The dog barks.",
+            "other_forms": "die Hunde",
+        },
+        {
+            "german_word": "schnell",
+            "translation": "fast",
+            "german_sentence": "Er läuft schnell.",
+            "english_sentence": "He runs fast.",
+            "other_forms": "",
+        },
+    ]
+
+
+def test_outputs_to_notes_skips_incomplete_words():
+    """Test that a word without a translation gets no note, and others keep theirs."""
+    outputs = {
+        "german_words": [{"german_word": "der Hund"}, {"german_word": "schnell"}],
+        "english_words": [{"german_word": "schnell", "translation": "fast"}],
+        "german_sentences": [
+            {"german_word": "der Hund", "german_sentence": "Der Hund bellt."},
+            {"german_word": "schnell", "german_sentence": "Er läuft schnell."},
+        ],
+        "english_sentences": [
+            {"german_word": "der Hund", "english_sentence": "The dog barks."},
+            {"german_word": "schnell", "english_sentence": "He runs fast."},
+        ],
+        "other_forms": [],
+    }
+
+    assert outputs_to_notes(outputs) == [
+        {
+            "german_word": "schnell",
+            "translation": "fast",
+            "german_sentence": "Er läuft schnell.",
+            "english_sentence": "He runs fast.",
+            "other_forms": "",
+        },
+    ]
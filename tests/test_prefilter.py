@@ -0,0 +1,70 @@
+import pytest
+
+from anki.german_deck_db import GermanDeckDatabase
+from anki.normalize import lemma_key
+from anki.prefilter import filter_new_words, split_words
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = GermanDeckDatabase(str(tmp_path / "test.db"), backend="sqlite3")
+    database.add_notes(
+        {
+            "german_word": word,
+            "translation": "-",
+            "german_sentence": "-",
+            "english_sentence": "-",
+        }
+        for word in ["das Mädchen", "lernen", "noch einmal"]
+    )
+    yield database
+    database.close()
+
+
+@pytest.mark.parametrize(
+    "word",
+    ["das Mädchen", "Mädchen", "die maedchen", "MÄDCHEN,", "das  Mädchen"],
+)
+def test_lemma_key_ignores_article_case_and_umlaut_spelling(word):
+    """Test that spelling variants of a word share one lemma key."""
+    assert lemma_key(word) == "maedchen"
+
+
+def test_split_words():
+    """Test splitting the semicolon-separated LLM output."""
+    assert split_words(" der Hund ; lernen ;; noch einmal ;") == [
+        "der Hund",
+        "lernen",
+        "noch einmal",
+    ]
+
+
+def test_filter_new_words_skips_known_and_repeated_words(db):
+    """Test that only unseen words are left for the generation templates."""
+    new_words, skipped = filter_new_words(
+        ["Maedchen", "der Hund", "Lernen", "die Hunde", "der hund", "Noch einmal"],
+        db,
+    )
+
+    assert new_words == ["der Hund", "die Hunde"]
+    assert skipped == ["Maedchen", "Lernen", "der hund", "Noch einmal"]
+
+
+def test_filter_new_words_keeps_input_order(db):
+    """Test that known and repeated words are skipped in the order they came in."""
+    new_words, skipped = filter_new_words(
+        ["Lernen", "Hund", "lernen", "Mädchen", "hund", "Katze", "Maedchen"], db
+    )
+
+    assert new_words == ["Hund", "Katze"]
+    assert skipped == ["Lernen", "lernen", "Mädchen", "hund", "Maedchen"]
+
+
+@pytest.mark.parametrize("backend", ["sqlalchemy", "sqlite3"])
+def test_known_words(tmp_path, backend):
+    """Test that both backends find stored words through the lemma key index."""
+    db = GermanDeckDatabase(str(tmp_path / "known.db"), backend=backend)
+    db.add_note("der Käse", "the cheese", "Der Käse ist gut.", "The cheese is good.")
+
+    assert db.known_words(["Kaese", "die Käse", "der Kuchen"]) == {"Kaese", "die Käse"}
+    db.close()
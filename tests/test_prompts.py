@@ -0,0 +1,73 @@
+import pytest
+
+from anki import instrumentation, prompts
+from anki.fake_llm import FakeChatModel
+from anki.pipeline import MODES, Pipeline
+from anki.prompts import (
+    approximate_tokens,
+    cacheable_template,
+    count_message_tokens,
+    prompt_prefix,
+)
+
+TEMPLATES = {
+    stage.output_key: stage.template for stages in MODES.values() for stage in stages
+}
+
+
+@pytest.mark.parametrize("name", sorted(TEMPLATES))
+def test_templates_keep_variable_content_last(name):
+    """Test that two inputs render the same static prefix, followed by the input."""
+    template = TEMPLATES[name]
+    prefix = [message.content for message in prompt_prefix(template)]
+    for value in ("der Hund", "noch einmal\ngehen"):
+        messages = template.format_messages(
+            **{key: value for key in template.input_variables}
+        )
+        contents = [message.content for message in messages]
+        assert contents[: len(prefix) - 1] == prefix[:-1]
+        assert contents[len(prefix) - 1].startswith(prefix[-1])
+        assert contents[-1].endswith(f"```{value}```")
+    assert sum(len(content) for content in prefix) > 1000
+
+
+def test_cacheable_template_escapes_static_text():
+    """Test that braces of the static text are not template variables."""
+    template = cacheable_template(
+        "  Role.", "\n    Answer {x}.\n", '{"a": 1}', "Input: {text}"
+    )
+
+    assert template.input_variables == ["text"]
+    system, user = template.format_messages(text="Haus")
+    assert system.content == "Role."
+    assert user.content.startswith("Answer {x}.\n\n- Read the entire")
+    assert user.content.endswith('{"a": 1}\n\nInput: Haus')
+
+
+def test_message_tokens_are_estimated_without_tiktoken(monkeypatch):
+    """Test the fallback token count when no tokenizer is available."""
+    monkeypatch.setattr(prompts, "_tokenizer", lambda encoding: None)
+    messages = cacheable_template("Role.", "Do.", "", "{text}").format_messages(
+        text="Haus"
+    )
+
+    expected = sum(approximate_tokens(message.content) + 3 for message in messages)
+    assert count_message_tokens(messages) == expected + 3
+
+
+def test_repeated_prefixes_are_reported_as_cached():
+    """Test that the stage spans report the prompt tokens the model cached."""
+    pipeline = Pipeline(FakeChatModel(cache_min_tokens=0), stages=MODES["combined"])
+    with instrumentation.recording() as recorder:
+        pipeline.run({"input_text": "der Hund"})
+        first = dict(recorder.summary()["spans"]["stage.notes"])
+        pipeline.run({"input_text": "noch einmal"})
+    second = recorder.summary()["spans"]["stage.notes"]
+
+    assert first["cached_prompt_tokens"] == 0
+    assert second["cached_prompt_tokens"] > 0
+    assert (
+        second["cached_prompt_tokens"] + second["uncached_prompt_tokens"]
+        == second["prompt_tokens"]
+    )
+    assert 0 < second["local_prefix_tokens"] < second["local_prompt_tokens"]
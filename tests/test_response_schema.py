@@ -0,0 +1,81 @@
+import pytest
+
+from anki.response_schema import (
+    OTHER_FORMS_SCHEMA,
+    TRANSLATION_SCHEMA,
+    RecordParser,
+    parse_records,
+)
+
+ROWS = [
+    {"german_word": "der Hund", "translation": "the dog"},
+    {"german_word": "sagen", "translation": 'to say "hello" {politely}'},
+]
+
+
+def test_parse_json_lines():
+    """Test that JSON Lines answers are parsed into records."""
+    text = '{"german_word": "der Hund", "translation": "the dog"}\n' + (
+        '{"german_word": "sagen", "translation": "to say \\"hello\\" {politely}"}'
+    )
+
+    assert parse_records(text, TRANSLATION_SCHEMA) == ROWS
+
+
+def test_parse_fenced_json_array():
+    """Test that a JSON array in a Markdown code fence is parsed the same way."""
+    text = (
+        "```json\n[\n"
+        '  {"german_word": "der Hund", "translation": "the dog", "extra": 1},\n'
+        '  {"german_word": "sagen", "translation": "to say \\"hello\\" {politely}"}\n'
+        "]\n```"
+    )
+
+    assert parse_records(text, TRANSLATION_SCHEMA) == ROWS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7])
+def test_parser_emits_records_as_chunks_arrive(chunk_size):
+    """Test that records are emitted as soon as their object is complete."""
+    text = (
+        '{"german_word": "der Hund", "translation": "the dog"}\n'
+        '{"german_word": "sagen", "translation": "to say \\"hello\\" {politely}"}'
+    )
+    parser = RecordParser(TRANSLATION_SCHEMA)
+
+    emitted = []
+    for start in range(0, len(text), chunk_size):
+        emitted.append(parser.feed(text[start : start + chunk_size]))
+
+    assert [record for records in emitted for record in records] == ROWS
+    # The first record is out before the second one has been read
+    first = next(i for i, records in enumerate(emitted) if records)
+    assert first * chunk_size < text.index("sagen")
+    assert parser.close() == ROWS
+
+
+def test_malformed_rows_are_skipped_and_recorded():
+    """Test that a bad row only loses itself, with the reason recorded."""
+    text = (
+        '{"german_word": "der Hund" "translation": "the dog"}\n'
+        '{"german_word": "lernen"}\n'
+        '{"german_word": "sagen", "translation": "to say"}\n'
+        '{"german_word": "gehen", "transl'
+    )
+    parser = RecordParser(TRANSLATION_SCHEMA)
+    parser.feed(text)
+
+    assert parser.close() == [{"german_word": "sagen", "translation": "to say"}]
+    assert [error.reason for error in parser.errors][1:] == [
+        "field 'translation' must be a non-empty string",
+        "truncated object",
+    ]
+
+
+def test_optional_field_may_be_missing():
+    """Test that optional fields default to an empty string."""
+    text = '{"german_word": "schnell", "other_forms": null}'
+
+    assert parse_records(text, OTHER_FORMS_SCHEMA) == [
+        {"german_word": "schnell", "other_forms": ""}
+    ]